@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Blue_Archive_Gacha_Simulator.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Public images under /image/ are answered before Django's middleware stack;
+# every other request (and any image it cannot find) goes to Django as usual.
+from app_web.util.ImageServer import ImageASGIApp  # noqa: E402 (needs the app registry loaded above)
+
+application = ImageASGIApp(django_application)
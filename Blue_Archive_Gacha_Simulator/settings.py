@@ -55,6 +55,7 @@ if DEBUG:
 # ==============================================================================
 
 MIDDLEWARE = [
+    'app_web.util.Profiler.ProfilingMiddleware', # Outermost, to time the whole request; removed unless PROFILING_ENABLED
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # WhiteNoise
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -112,12 +113,26 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # CACHES
 # ==============================================================================
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-gacha-simulator-snowflake', # Can be any unique string
+# CACHE_BACKEND=sqlite shares one cache between every worker process on the host
+# (a WAL-mode SQLite file, see app_web/util/SQLiteCache.py); the default 'locmem'
+# gives each process its own. Compare them with `manage.py bench_cache`.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+
+if CACHE_BACKEND == 'sqlite':
+    CACHES = {
+        'default': {
+            'BACKEND': 'app_web.util.SQLiteCache.SQLiteCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', BASE_DIR / 'cache.sqlite3'),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-gacha-simulator-snowflake', # Can be any unique string
+        }
     }
-}
 
 # ==============================================================================
 # AUTHENTICATION & SECURITY
@@ -172,6 +187,45 @@ STATICFILES_DIRS = [
 
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
+# Student portrait sprite sheets built by `manage.py build_atlas` (and at the end of `unpack`).
+SPRITE_ATLAS_DIR = BASE_DIR / 'atlas'
+
+# Every catalog image in one memory-mapped file, built by `manage.py build_image_pack` (and at the end of `unpack`).
+IMAGE_PACK_PATH = BASE_DIR / 'images.pack'
+
+# JSON telemetry (per-stage timing, bytes, rows, errors) written at the end of `unpack`.
+IMPORT_SUMMARY_PATH = BASE_DIR / 'import_summary.json'
+
+# Import-time image optimization (`unpack`): WebP quality for student images and
+# the number of worker processes (None = one per CPU core).
+IMAGE_WEBP_QUALITY = 80
+IMAGE_OPTIMIZER_WORKERS = None
+
+# Evaluate achievements off the pull request path: pulls queue an AchievementTask
+# that `manage.py process_achievements` handles, and the gacha page polls for the unlocks.
+ACHIEVEMENTS_ASYNC = os.environ.get('ACHIEVEMENTS_ASYNC', '0') == '1'
+
+# Where every worker process writes its metrics snapshot, merged by the staff-only
+# `/metrics/` view (see app_web/util/Metrics.py). Cleared by the gunicorn master on
+# start (gunicorn.conf.py); clear it by hand when restarting another server.
+METRICS_DIR = os.environ.get('METRICS_DIR', BASE_DIR / '.metrics')
+
+# Per-request profiling (app_web/util/Profiler.py): Server-Timing headers, a sampled
+# JSON log line, and slow requests saved with their queries and EXPLAIN output.
+# When off, the middleware is left out of the stack entirely.
+PROFILING_ENABLED = os.environ.get('PROFILING', '0') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0.01'))
+PROFILING_SLOW_MS = float(os.environ.get('PROFILING_SLOW_MS', '500'))
+PROFILING_SLOW_DIR = BASE_DIR / 'slow_requests'
+PROFILING_SLOW_KEEP = 200
+# Save query parameters in slow request captures. They include session keys and
+# usernames, so only turn this on while debugging, and delete the captures after.
+PROFILING_CAPTURE_PARAMS = os.environ.get('PROFILING_CAPTURE_PARAMS', '0') == '1'
+
+# Per-process memory budget of the standalone image server (wsgi.py / asgi.py)
+# for images that are not in the image pack yet.
+IMAGE_SERVER_CACHE_BYTES = 64 * 1024 * 1024
+
 # ==============================================================================
 # THIRD-PARTY & DEVELOPMENT-ONLY SETTINGS
 # ==============================================================================
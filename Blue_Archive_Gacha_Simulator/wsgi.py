@@ -13,4 +13,10 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Blue_Archive_Gacha_Simulator.settings')
 
-application = get_wsgi_application()
+django_application = get_wsgi_application()
+
+# Public images under /image/ are answered before Django's middleware stack;
+# every other request (and any image it cannot find) goes to Django as usual.
+from app_web.util.ImageServer import ImageWSGIApp  # noqa: E402 (needs the app registry loaded above)
+
+application = ImageWSGIApp(django_application)
@@ -0,0 +1,163 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from app_web.models import UnlockAchievement, UserInventory
+from app_web.util.AchievementEngine import AchievementCatalog, AchievementRules, Rollup
+from .utils.ImportTelemetry import ImportTelemetry
+
+SHARD_SIZE = 5000
+BULK_BATCH_SIZE = 500
+
+# Set by the pool initializer in each worker: unlock key -> (kind, requirement, achievement id).
+_rules: Dict[str, tuple] = {}
+
+def _init_worker(rules):
+    global _rules
+    _rules = rules
+    # Never share the parent's database connection with a forked worker.
+    connections.close_all()
+
+def _evaluate_shard(shard: Tuple[int, int]) -> Tuple[int, List[Tuple[int, int]]]:
+    """
+    Runs in a worker process: evaluates the rules for every user with an id in
+    the shard's range, reading inventories, transactions and existing unlocks
+    with one query each. Returns the number of users and the (user id,
+    achievement id) pairs to unlock.
+    """
+    first_id, last_id = shard
+    user_ids = list(User.objects.filter(id__gte=first_id, id__lte=last_id).values_list('id', flat=True))
+
+    collections = {unlock_key: rule for unlock_key, rule in _rules.items() if rule[0] == 'collection'}
+    counters = {unlock_key: rule for unlock_key, rule in _rules.items() if rule[0] == 'counter'}
+
+    owned: Dict[int, set] = {}
+    if collections:
+        required = set().union(*(students for _, students, _ in collections.values()))
+        rows = UserInventory.objects.filter(
+            inventory_user_id__gte=first_id, inventory_user_id__lte=last_id, student_id__in=required
+        ).values_list('inventory_user_id', 'student_id')
+        for user_id, student_id in rows.iterator(chunk_size=BULK_BATCH_SIZE * 10):
+            owned.setdefault(user_id, set()).add(student_id)
+
+    rollups: Dict[int, Dict[str, int]] = {}
+    if counters:
+        # The same fold as the live rollups, over each user's whole history.
+        for user_id, _, banner_id, rarity in Rollup.transactions(
+            transaction_user_id__gte=first_id, transaction_user_id__lte=last_id
+        ).iterator(chunk_size=BULK_BATCH_SIZE * 10):
+            Rollup.fold(rollups.setdefault(user_id, {}), banner_id, rarity)
+
+    unlocked = set(UnlockAchievement.objects.filter(
+        unlock_user_id__gte=first_id, unlock_user_id__lte=last_id,
+        achievement_id__in=[achievement_id for _, _, achievement_id in _rules.values()],
+    ).values_list('unlock_user_id', 'achievement_id'))
+
+    unlocks = []
+    for user_id in user_ids:
+        for kind, requirement, achievement_id in _rules.values():
+            if (user_id, achievement_id) in unlocked:
+                continue
+            if kind == 'collection':
+                earned = requirement <= owned.get(user_id, set())
+            else:
+                counter, at_least = requirement
+                earned = rollups.get(user_id, {}).get(counter, 0) >= at_least
+            if earned:
+                unlocks.append((user_id, achievement_id))
+    return len(user_ids), unlocks
+
+class Command(BaseCommand):
+    """
+    Re-evaluates collection, counter and streak achievements for every user, so a
+    newly added achievement reaches existing users without waiting for their
+    next pull.
+
+    Users are split into id-range shards that a process pool evaluates in
+    parallel, each with a handful of bulk reads. The workers only read; this
+    process writes each shard's unlocks with one short bulk insert, so the live
+    tables are never locked for longer than that.
+    """
+    help = 'Award collection, counter and streak achievements that existing users already qualify for.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('keys', nargs='*', help='Achievement keys to evaluate (default: every collection, counter and streak achievement).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes.')
+        parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='Users per shard.')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be unlocked without writing it.')
+
+    def handle(self, *args, **options):
+        rules = self._rules(options['keys'])
+        if not rules:
+            self.stdout.write(self.style.WARNING('No achievements to evaluate.'))
+            return
+        shards = self._shards(options['shard_size'])
+        user_count = sum(count for _, _, count in shards)
+        self.stdout.write(self.style.NOTICE(
+            f"Evaluating {len(rules)} achievements for {user_count} users "
+            f"in {len(shards)} shards with {options['workers']} workers..."
+        ))
+
+        catalog = {achievement.achievement_id: achievement for achievement in AchievementCatalog.get().values()}
+        unlocked_per_achievement: Dict[int, int] = {}
+        telemetry = ImportTelemetry('backfill_achievements', stream=self.stdout, dry_run=options['dry_run'])
+        connections.close_all()
+        with telemetry.stage('users', total=user_count) as stage, ProcessPoolExecutor(
+            max_workers=options['workers'], initializer=_init_worker, initargs=(rules,)
+        ) as executor:
+            for users, unlocks in executor.map(_evaluate_shard, [(first_id, last_id) for first_id, last_id, _ in shards]):
+                if unlocks and not options['dry_run']:
+                    with transaction.atomic():
+                        UnlockAchievement.objects.bulk_create(
+                            [UnlockAchievement(unlock_user_id=user_id, achievement_id_id=achievement_id) for user_id, achievement_id in unlocks],
+                            batch_size=BULK_BATCH_SIZE, ignore_conflicts=True,
+                        )
+                for _, achievement_id in unlocks:
+                    unlocked_per_achievement[achievement_id] = unlocked_per_achievement.get(achievement_id, 0) + 1
+                stage.add(items=users, rows=len(unlocks))
+
+        for achievement_id, count in sorted(unlocked_per_achievement.items()):
+            self.stdout.write(f'  {catalog[achievement_id].achievement_key:<30} {count:>9} users')
+        summary = stage.summary()
+        verb = 'Would unlock' if options['dry_run'] else 'Unlocked'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {summary['rows']} achievements for {summary['items']} users in {summary['seconds']:.2f}s "
+            f"({summary['items_per_second']:.0f} users/s)"
+        ))
+
+    def _rules(self, keys: List[str]) -> Dict[str, tuple]:
+        """The rules to evaluate, in a picklable form: unlock key -> (kind, requirement, achievement id)."""
+        catalog = AchievementCatalog.get()
+        compiled = AchievementRules.get()
+        rules = {
+            unlock_key: ('collection', students, compiled.collections.achievement_ids[unlock_key])
+            for unlock_key, students in compiled.collections.sets.items()
+        }
+        rules.update({
+            unlock_key: ('counter', (counter, at_least), catalog[unlock_key].achievement_id)
+            for unlock_key, counter, at_least in compiled.counters if unlock_key in catalog
+        })
+        if not keys:
+            return rules
+
+        unknown = [unlock_key for unlock_key in keys if unlock_key not in rules]
+        if unknown:
+            raise CommandError(
+                f"Cannot backfill {', '.join(unknown)}: only collection, counter and streak achievements can be re-evaluated "
+                f"(available: {', '.join(sorted(rules))})."
+            )
+        return {unlock_key: rules[unlock_key] for unlock_key in keys}
+
+    def _shards(self, shard_size: int) -> List[Tuple[int, int, int]]:
+        """Splits the user ids into (first id, last id, user count) ranges of `shard_size` users."""
+        shards, shard = [], []
+        for user_id in User.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=shard_size):
+            shard.append(user_id)
+            if len(shard) == shard_size:
+                shards.append((shard[0], shard[-1], len(shard)))
+                shard = []
+        if shard:
+            shards.append((shard[0], shard[-1], len(shard)))
+        return shards
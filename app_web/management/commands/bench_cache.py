@@ -0,0 +1,175 @@
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.core.management.commands.createcachetable import Command as CreateCacheTable
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from app_web.util.SQLiteCache import SQLiteCache
+
+BACKENDS = ('locmem', 'file', 'db', 'sqlite')
+DB_TABLE = 'bench_cache_table'
+COUNTER_KEY = 'bench:pulls'
+
+def _backend(name: str, directory: str):
+    """A fresh instance of one of the compared backends; every process gets the same storage for a name."""
+    params = {'TIMEOUT': 300, 'OPTIONS': {'MAX_ENTRIES': 100_000}}
+    if name == 'locmem':
+        return LocMemCache('bench-cache', params)
+    if name == 'file':
+        return FileBasedCache(os.path.join(directory, 'file'), params)
+    if name == 'db':
+        return DatabaseCache(DB_TABLE, params)
+    return SQLiteCache(os.path.join(directory, 'cache.sqlite3'), params)
+
+def _init_worker():
+    # Never share the parent's database connection with a forked worker.
+    connections.close_all()
+
+def _simulate_worker(job: Tuple[str, str, int, int, int, int]) -> Tuple[int, int, int]:
+    """
+    Runs in a worker process, like one gunicorn worker: reads skewed keys,
+    filling misses, and counts every read in a shared counter. Returns
+    (hits, reads, the counter value this worker saw last).
+    """
+    name, directory, seed, operations, key_count, value_size = job
+    backend = _backend(name, directory)
+    rng = random.Random(seed)
+    value = os.urandom(value_size)
+    hits, last_count = 0, 0
+    for _ in range(operations):
+        # Skewed towards low ids: a few popular keys (banner images, the catalog) and a long tail of users.
+        key = f'bench:key:{int(key_count * rng.random() ** 2)}'
+        if backend.get(key) is None:
+            backend.set(key, value)
+        else:
+            hits += 1
+        backend.add(COUNTER_KEY, 0)
+        try:
+            last_count = backend.incr(COUNTER_KEY)
+        except ValueError:
+            # A non-atomic incr can read the counter while another worker rewrites it: a lost increment.
+            pass
+    return hits, operations, last_count
+
+class Command(BaseCommand):
+    """
+    Compares the cache backends this project can run on: the per-process
+    LocMemCache, Django's file and database caches, and the shared SQLiteCache.
+
+    1. Latency: get (hit and miss), set and incr from this process, in µs.
+    2. Sharing: `--workers` processes (default 3, like gunicorn) read the same
+       skewed key set, filling misses, and increment one shared counter. A
+       per-process cache shows a lower hit rate and counters that only see
+       their own worker; a backend without an atomic incr loses increments.
+
+    Each backend gets throwaway storage in a temporary directory (the `db`
+    backend a temporary table in the default database), so the configured
+    cache is never touched.
+    """
+    help = 'Benchmark get/set/incr latency and cross-worker hit rate of the available cache backends.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', action='append', dest='backends', choices=BACKENDS, help='Backend to compare; may be repeated (default: all).')
+        parser.add_argument('--operations', type=int, default=2000, help='Operations per measurement and per worker (default: 2000).')
+        parser.add_argument('--workers', type=int, default=3, help='Worker processes sharing the cache (default: 3).')
+        parser.add_argument('--keys', type=int, default=500, help='Distinct keys the workers read (default: 500).')
+        parser.add_argument('--value-size', type=int, default=2048, help='Bytes per cached value (default: 2048).')
+
+    def handle(self, *args, **options):
+        backends = options['backends'] or list(BACKENDS)
+        directory = tempfile.mkdtemp(prefix='bench_cache_')
+        if 'db' in backends:
+            create_cache_table = CreateCacheTable()
+            create_cache_table.verbosity = 0
+            create_cache_table.create_table(DEFAULT_DB_ALIAS, DB_TABLE, dry_run=False)
+        try:
+            self.stdout.write(self.style.NOTICE(
+                f"Latency over {options['operations']} operations, {options['value_size']}-byte values (µs, p50 / p99)"
+            ))
+            for name in backends:
+                self._report_latency(name, self._latency(_backend(name, directory), options['operations'], options['value_size']))
+
+            self.stdout.write(self.style.NOTICE(
+                f"\n{options['workers']} workers x {options['operations']} reads over {options['keys']} keys"
+            ))
+            for name in backends:
+                self._report_sharing(name, self._sharing(name, directory, options))
+        finally:
+            if 'db' in backends:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {connection.ops.quote_name(DB_TABLE)}')
+            shutil.rmtree(directory, ignore_errors=True)
+
+    # ===================================================================
+    # --- MEASUREMENTS ---
+    # ===================================================================
+    @staticmethod
+    def _latency(backend, operations: int, value_size: int) -> Dict[str, List[float]]:
+        backend.clear()
+        value = os.urandom(value_size)
+        timings = {'set': [], 'get hit': [], 'get miss': [], 'incr': []}
+        backend.set(COUNTER_KEY, 0)
+        for i in range(operations):
+            for label, call in (
+                ('set', lambda: backend.set(f'bench:latency:{i}', value)),
+                ('get hit', lambda: backend.get(f'bench:latency:{i}')),
+                ('get miss', lambda: backend.get(f'bench:missing:{i}')),
+                ('incr', lambda: backend.incr(COUNTER_KEY)),
+            ):
+                start = time.perf_counter()
+                call()
+                timings[label].append(time.perf_counter() - start)
+        backend.clear()
+        return timings
+
+    @staticmethod
+    def _sharing(name: str, directory: str, options) -> Dict[str, float]:
+        _backend(name, directory).clear()
+        jobs = [
+            (name, directory, seed, options['operations'], options['keys'], options['value_size'])
+            for seed in range(options['workers'])
+        ]
+        connections.close_all()
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as executor:
+            results = list(executor.map(_simulate_worker, jobs))
+        seconds = time.perf_counter() - start
+        final_count = _backend(name, directory).get(COUNTER_KEY)
+        _backend(name, directory).clear()
+
+        reads = sum(reads for _, reads, _ in results)
+        return {
+            'hit_rate': sum(hits for hits, _, _ in results) / reads,
+            'ops_per_second': reads / seconds,
+            'expected': reads,
+            # A per-process cache has one counter per worker; the best any of them saw.
+            'counted': max(final_count or 0, *(count for _, _, count in results)),
+        }
+
+    # ===================================================================
+    # --- OUTPUT ---
+    # ===================================================================
+    def _report_latency(self, name: str, timings: Dict[str, List[float]]) -> None:
+        columns = []
+        for label, samples in timings.items():
+            samples.sort()
+            columns.append(
+                f"{label} {statistics.median(samples) * 1e6:7.1f} / {samples[int(len(samples) * 0.99)] * 1e6:7.1f}"
+            )
+        self.stdout.write(f"  {name:<7} " + '   '.join(columns))
+
+    def _report_sharing(self, name: str, result: Dict[str, float]) -> None:
+        counted, expected = result['counted'], result['expected']
+        line = (
+            f"  {name:<7} hit rate {result['hit_rate']:6.1%}   {result['ops_per_second']:8.0f} reads/s   "
+            f"shared counter {counted}/{expected}"
+        )
+        self.stdout.write(line if counted == expected else self.style.WARNING(f"{line}  ({expected - counted} increments lost or not shared)"))
@@ -0,0 +1,96 @@
+import io
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from app_web.models import School, Student
+from app_web.util.ImageServer import ImageWSGIApp
+
+class Command(BaseCommand):
+    """
+    Compares the standalone image server mounted in `wsgi.py` with the regular
+    Django image views by calling both WSGI applications in-process with the
+    same requests, so only the per-request server overhead is measured.
+    """
+    help = 'Benchmark the standalone image server against the Django image views.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per path and application (default: 2000).')
+        parser.add_argument('--path', action='append', dest='paths', help='Image path to request; may be repeated.')
+        parser.add_argument('--accept', default='image/webp,image/*,*/*;q=0.8', help='Accept header sent with each request.')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or self._default_paths()
+        if not paths:
+            self.stdout.write(self.style.WARNING('No images in the database. Run `unpack` first.'))
+            return
+
+        django_app = get_wsgi_application()
+        applications = {
+            'django views': django_app,
+            'image server': ImageWSGIApp(django_app),
+        }
+
+        for path in paths:
+            self.stdout.write(self.style.NOTICE(f'\n{path}  ({options["requests"]} requests)'))
+            bodies = {}
+            for label, app in applications.items():
+                status, body, timings = self._run(app, path, options['accept'], options['requests'])
+                bodies[label] = body
+                timings.sort()
+                self.stdout.write(
+                    f"  {label:<13} {status:<7} {len(body) / 1024:8.1f} KB  "
+                    f"{len(timings) / sum(timings):9.0f} req/s  "
+                    f"mean {statistics.fmean(timings) * 1e6:8.1f} µs  "
+                    f"p50 {timings[len(timings) // 2] * 1e6:8.1f} µs  "
+                    f"p99 {timings[int(len(timings) * 0.99)] * 1e6:8.1f} µs"
+                )
+            if len(set(bodies.values())) != 1:
+                self.stdout.write(self.style.WARNING('  Response bodies differ between applications.'))
+
+    @staticmethod
+    def _default_paths():
+        paths = []
+        school_id = School.objects.values_list('school_id', flat=True).first()
+        if school_id:
+            paths.append(f'/image/school/{school_id}/')
+        student_id = Student.objects.filter(asset_id__isnull=False).values_list('student_id', flat=True).first()
+        if student_id:
+            paths.append(f'/image/student/{student_id}/portrait/')
+        return paths
+
+    @staticmethod
+    def _run(app, path, accept, count):
+        """Calls a WSGI application `count` times, returning (status, last body, per-request seconds)."""
+        captured = {}
+
+        def start_response(status, headers, exc_info=None):
+            captured['status'] = status.split(' ', 1)[0]
+
+        timings, body = [], b''
+        for _ in range(count):
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': path,
+                'SCRIPT_NAME': '',
+                'QUERY_STRING': '',
+                'SERVER_NAME': 'localhost',
+                'SERVER_PORT': '80',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'localhost',
+                'HTTP_ACCEPT': accept,
+                'wsgi.version': (1, 0),
+                'wsgi.url_scheme': 'http',
+                'wsgi.input': io.BytesIO(),
+                'wsgi.errors': io.StringIO(),
+                'wsgi.multithread': False,
+                'wsgi.multiprocess': True,
+                'wsgi.run_once': False,
+            }
+            start = time.perf_counter()
+            result = app(environ, start_response)
+            body = b''.join(result)
+            if hasattr(result, 'close'):
+                result.close()
+            timings.append(time.perf_counter() - start)
+        return captured.get('status', '?'), body, timings
@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from app_web.util.SpriteAtlas import SpriteAtlas
+
+class Command(BaseCommand):
+    """
+    Packs all student portraits into versioned sprite sheets (per school, per
+    rarity and for the whole catalog) together with a JSON coordinate map.
+    Runs automatically at the end of `unpack` and whenever the catalog changes.
+    """
+    help = 'Build the student portrait sprite atlas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild even if the catalog has not changed.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('Building sprite atlas...'))
+        start = time.perf_counter()
+        manifest = SpriteAtlas.build(force=options['force'])
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Sprite atlas {manifest['version']} ready: {len(manifest['sheets'])} sheets, "
+            f"{len(manifest['students'])} students ({elapsed:.2f}s) in {SpriteAtlas.ATLAS_DIR}"
+        ))
@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from app_web.util.ImagePack import ImagePack
+
+class Command(BaseCommand):
+    """
+    Writes every catalog image into a single memory-mappable pack file that
+    all workers share through the OS page cache.
+    Runs automatically at the end of `unpack` and whenever an image changes.
+    """
+    help = 'Build the shared, memory-mapped image pack.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help=f'Pack file path (default: {ImagePack.PACK_PATH}).')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('Building image pack...'))
+        start = time.perf_counter()
+        summary = ImagePack.build(options['output'])
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Packed {summary['images']} images ({summary['bytes'] / 1024 / 1024:.1f} MB) "
+            f"into {summary['path']} in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,193 @@
+import datetime
+import time
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from app_web.models import GachaBanner, GachaTransaction, UserInventory
+from app_web.util.GachaEngine import GachaEngine
+from .utils.ImportTelemetry import ImportTelemetry
+
+CHUNK_SIZE = 200_000 # transactions generated and inserted at a time
+USER_BATCH_SIZE = 5000
+BANNER_PREFERENCE = 0.5 # Dirichlet concentration: lower means users stick to fewer banners
+
+class Command(BaseCommand):
+    """
+    Fills the database with synthetic users and their pull history, at a
+    production-like scale, for capacity and index testing.
+
+    - Pull counts: each user makes a log-normal number of ten pulls with a
+      median of `--median-pulls` pulls (a few whales, a long tail of light
+      players), capped at `--max-pulls`.
+    - Pulls: each user favours a few banners; every banner's ten pulls are
+      sampled at once with `GachaEngine.sample_ten_pulls()`, with the live
+      odds and guarantee.
+    - Times: a user joins within the last `--days` days and pulls at random
+      times since, in order, so pull ids, dates and rollups agree.
+    - Inventories follow from the pulls (count and first pull date). Then
+      `backfill_achievements` awards the collection, counter and streak
+      achievements the histories earned.
+
+    Rows are written with raw executemany() inserts, about `--chunk-size`
+    transactions per database transaction: the ORM would build a model
+    instance per row and overwrite the historical dates with now. Users are
+    named `<prefix><n>`, continuing after the highest existing n, so the command
+    can be run again to grow the dataset.
+
+        ```
+        python manage.py generate_dataset --users 10000 --median-pulls 500 --seed 1
+        ```
+    """
+    help = 'Generate synthetic users with realistic pull histories, inventories and achievements.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Users to create (default: 1000).')
+        parser.add_argument('--median-pulls', type=int, default=300, help='Median pulls per user (default: 300).')
+        parser.add_argument('--spread', type=float, default=1.0, help='Sigma of the log-normal pull count; higher means more whales (default: 1.0).')
+        parser.add_argument('--max-pulls', type=int, default=100_000, help='Most pulls a user makes (default: 100000).')
+        parser.add_argument('--days', type=int, default=365, help='How far back the histories go (default: 365).')
+        parser.add_argument('--prefix', default='synthetic_', help="Username prefix (default: 'synthetic_').")
+        parser.add_argument('--password', help='Password for every generated user (default: none, they cannot log in).')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help=f'Transactions per insert (default: {CHUNK_SIZE}).')
+        parser.add_argument('--seed', type=int, help='Random seed, for a repeatable dataset.')
+        parser.add_argument('--skip-achievements', action='store_true', help='Do not run backfill_achievements afterwards.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['median_pulls'] < 1:
+            raise CommandError('--users and --median-pulls must be at least 1.')
+        engines = {
+            banner.banner_id: GachaEngine(banner)
+            for banner in GachaBanner.objects.select_related('preset_id').defer('banner_image').prefetch_related('banner_pickup')
+            if banner.preset_id_id
+        }
+        if not engines:
+            raise CommandError('No banners with a rate preset. Run `unpack` first.')
+
+        rng = np.random.default_rng(options['seed'])
+        ten_pulls = self._ten_pull_counts(rng, options)
+        self.stdout.write(self.style.NOTICE(
+            f"Generating {options['users']} users with {int(ten_pulls.sum()) * 10} pulls "
+            f"(median {int(np.median(ten_pulls)) * 10}, max {int(ten_pulls.max()) * 10}) on {len(engines)} banners..."
+        ))
+
+        telemetry = ImportTelemetry('generate_dataset', stream=self.stdout, seed=options['seed'])
+        password = make_password(options['password']) if options['password'] else make_password(None)
+        next_number = self._last_number(options['prefix']) + 1
+        now = time.time()
+        with telemetry.stage('users', total=len(ten_pulls)) as stage:
+            for start, end in self._chunks(ten_pulls, options['chunk_size']):
+                counts = ten_pulls[start:end]
+                joined = now - rng.random(len(counts)) * options['days'] * 86400
+                user_ids = self._create_users(options['prefix'], next_number + start, joined, password)
+                rows = self._create_history(rng, engines, user_ids, counts, joined, now)
+                stage.add(items=len(counts), rows=rows)
+
+        for line in telemetry.summary_lines():
+            self.stdout.write(line)
+        summary = stage.summary()
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {summary['items']} users and {summary['rows']} rows in {summary['seconds']:.2f}s "
+            f"({summary['rows'] / summary['seconds']:.0f} rows/s)"
+        ))
+        if not options['skip_achievements']:
+            call_command('backfill_achievements', stdout=self.stdout, stderr=self.stderr)
+
+    # ===================================================================
+    # --- DISTRIBUTIONS ---
+    # ===================================================================
+    @staticmethod
+    def _ten_pull_counts(rng: np.random.Generator, options) -> np.ndarray:
+        pulls = rng.lognormal(np.log(options['median_pulls']), options['spread'], options['users'])
+        return np.clip(np.rint(pulls / 10), 1, max(options['max_pulls'] // 10, 1)).astype(np.int64)
+
+    @staticmethod
+    def _chunks(ten_pulls: np.ndarray, chunk_size: int) -> Iterator[Tuple[int, int]]:
+        """Consecutive user ranges of about `chunk_size` transactions (at least one user each)."""
+        start, pulls = 0, 0
+        for index, count in enumerate(ten_pulls.tolist()):
+            pulls += count * 10
+            if pulls >= chunk_size:
+                yield start, index + 1
+                start, pulls = index + 1, 0
+        if start < len(ten_pulls):
+            yield start, len(ten_pulls)
+
+    # ===================================================================
+    # --- WRITING ---
+    # ===================================================================
+    @staticmethod
+    def _last_number(prefix: str) -> int:
+        """The largest n of the existing `<prefix><n>` users (0 if none), so gaps and other names don't clash."""
+        names = User.objects.filter(username__startswith=prefix).values_list('username', flat=True)
+        return max((int(name[len(prefix):]) for name in names.iterator() if name[len(prefix):].isdigit()), default=0)
+
+    @staticmethod
+    def _create_users(prefix: str, first_number: int, joined: np.ndarray, password: str) -> List[int]:
+        users = [
+            User(username=f'{prefix}{first_number + i}', password=password, date_joined=datetime.datetime.fromtimestamp(at, datetime.timezone.utc))
+            for i, at in enumerate(joined.tolist())
+        ]
+        created = User.objects.bulk_create(users, batch_size=USER_BATCH_SIZE)
+        if any(user.pk is None for user in created):
+            # Backends that cannot return ids from a bulk insert.
+            by_name = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'id'))
+            return [by_name[user.username] for user in users]
+        return [user.pk for user in created]
+
+    def _create_history(
+        self, rng: np.random.Generator, engines: Dict[int, GachaEngine], user_ids: List[int],
+        counts: np.ndarray, joined: np.ndarray, now: float,
+    ) -> int:
+        """Samples and inserts the ten pulls and inventories of a chunk of users. Returns the rows written."""
+        banner_ids = np.fromiter(engines.keys(), dtype=np.int64, count=len(engines))
+        owner = np.repeat(np.arange(len(counts)), counts) # user position of each ten pull
+
+        # Each user's banner preference, then a banner for each of their ten pulls by inverse CDF.
+        preference = np.cumsum(rng.dirichlet(np.full(len(banner_ids), BANNER_PREFERENCE), len(counts)), axis=1)
+        banner_index = (rng.random(len(owner))[:, None] > preference[owner]).sum(axis=1).clip(max=len(banner_ids) - 1)
+        students = np.empty((len(owner), 10), dtype=np.int64)
+        for index, banner_id in enumerate(banner_ids.tolist()):
+            selected = banner_index == index
+            if selected.any():
+                students[selected] = engines[banner_id].sample_ten_pulls(int(selected.sum()), rng)
+
+        # Random times between joining and now, then everything ordered by user and time.
+        pulled_at = joined[owner] + rng.random(len(owner)) * (now - joined[owner])
+        order = np.lexsort((pulled_at, owner))
+        owner, pulled_at, students = owner[order], pulled_at[order], students[order]
+        banners = banner_ids[banner_index[order]]
+
+        adapt = connection.ops.adapt_datetimefield_value
+        stamps = [adapt(datetime.datetime.fromtimestamp(at, datetime.timezone.utc)) for at in pulled_at.tolist()]
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        row_owner = np.repeat(owner, 10)
+        transactions = zip(
+            user_ids[row_owner].tolist(), np.repeat(banners, 10).tolist(), students.ravel().tolist(),
+            (stamps[index // 10] for index in range(students.size)),
+        )
+
+        # One inventory row per (user, student): its count and the time of its first pull.
+        keys = row_owner * (int(students.max()) + 1) + students.ravel()
+        unique_keys, first_row, obtained = np.unique(keys, return_index=True, return_counts=True)
+        inventory = zip(
+            user_ids[row_owner[first_row]].tolist(), students.ravel()[first_row].tolist(), obtained.tolist(),
+            (stamps[index // 10] for index in first_row.tolist()),
+        )
+
+        with transaction.atomic():
+            self._insert(GachaTransaction, ('transaction_user', 'banner_id', 'student_id', 'transaction_create_on'), transactions)
+            self._insert(UserInventory, ('inventory_user', 'student_id', 'inventory_num_obtained', 'inventory_first_obtained_on'), inventory)
+        return students.size + len(unique_keys)
+
+    @staticmethod
+    def _insert(model, field_names: Tuple[str, ...], rows) -> None:
+        """A raw executemany insert: no model instances, and the given dates instead of auto_now_add."""
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(model._meta.get_field(name).column) for name in field_names)
+        placeholders = ', '.join(['%s'] * len(field_names))
+        with connection.cursor() as cursor:
+            cursor.executemany(f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})', rows)
@@ -0,0 +1,298 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from typing import Callable, Dict, List, Optional
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from app_web.models import GachaBanner, Student
+
+USERNAME_PREFIX = 'loadtest_'
+DEFAULT_MIX = 'guest_pull=3,ten_pull=2,dashboard=1,history=2,images=4'
+HISTORY_PAGES = 50 # pages past the last one are served as the last page
+BATCH_IMAGE_COUNT = 10 # students per batch request, like a 10-pull reveal
+DASHBOARD_WIDGETS = (
+    'dashboard_widget_kpis', 'dashboard_widget_top_students', 'dashboard_widget_first_r3_pull',
+    'dashboard_widget_chart_overall_rarity', 'dashboard_widget_chart_banner_breakdown',
+    'dashboard_widget_chart_banner_activity', 'dashboard_widget_performance_table',
+    'dashboard_widget_milestone_timeline',
+)
+
+class Results:
+    """Per-endpoint latencies and errors, shared by the worker threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+        self.recording = False
+
+    def record(self, label: str, seconds: float, error: Optional[str] = None) -> None:
+        if not self.recording:
+            return
+        with self.lock:
+            if error is None:
+                self.timings.setdefault(label, []).append(seconds)
+            else:
+                errors = self.errors.setdefault(label, {})
+                errors[error] = errors.get(error, 0) + 1
+
+class VirtualUser:
+    """
+    One simulated browser: its own cookies (session and CSRF token), logged in
+    as a synthetic user or browsing as a guest. Every request is timed into
+    `results` under its endpoint label.
+    """
+
+    def __init__(self, base_url: str, results: Results, timeout: float):
+        self.base_url = base_url.rstrip('/')
+        self.results = results
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+    @property
+    def csrf_token(self) -> str:
+        return next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+
+    def start(self, username: Optional[str] = None, password: Optional[str] = None) -> None:
+        """Gets a CSRF cookie from the login page, then logs in when given credentials."""
+        if self.request('login', 'GET', reverse('login')) is None:
+            raise CommandError(f"Could not load {self.base_url}{reverse('login')}; is the server running?")
+        if username:
+            self.request('login', 'POST', reverse('login'), {'username': username, 'password': password})
+            if not any(cookie.name == 'sessionid' for cookie in self.cookies):
+                raise CommandError(f"Could not log in as {username}; create the users with --create-users.")
+
+    def request(self, label: str, method: str, path: str, data: Optional[dict] = None) -> Optional[bytes]:
+        url = f'{self.base_url}{path}'
+        headers = {'Accept': 'text/html,application/json,image/webp,*/*', 'Referer': url}
+        body = None
+        if method == 'POST':
+            data = {**(data or {}), 'csrfmiddlewaretoken': self.csrf_token}
+            body = urllib.parse.urlencode(data).encode()
+            headers['X-CSRFToken'] = self.csrf_token
+        request = urllib.request.Request(url, data=body, headers=headers, method=method)
+
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                content = response.read()
+        except urllib.error.HTTPError as e:
+            self.results.record(label, time.perf_counter() - start, f'HTTP {e.code}')
+            return None
+        except (urllib.error.URLError, OSError) as e:
+            self.results.record(label, time.perf_counter() - start, type(getattr(e, 'reason', e)).__name__)
+            return None
+        self.results.record(label, time.perf_counter() - start)
+        return content
+
+class Command(BaseCommand):
+    """
+    Drives a running server with simulated users and reports throughput and
+    p50/p95/p99 latency per endpoint, e.g. to size a hosting tier or to
+    compare a change against the numbers before it.
+
+    Each of `--concurrency` threads is one browser, logged in as one of the
+    `--users` synthetic users (`loadtest_<n>`), with a guest session next to
+    it. In a loop it picks a scenario by the `--mix` weights:
+
+    - guest_pull: a single or ten pull as a guest (nothing is saved)
+    - ten_pull:   a logged-in ten pull (saves pulls, inventory, achievements)
+    - dashboard:  the dashboard page, the summary tab and every widget
+    - history:    a random page of the pull history
+    - images:     a banner image, a student portrait and a 10-student batch
+
+    Banner and student ids are read from this project's database, so run it
+    with the same database as the server (as on localhost). Create the
+    synthetic users once with `--create-users`; `--warmup` seconds of traffic
+    run before anything is recorded.
+
+        ```
+        python manage.py load_test --create-users --users 20
+        python manage.py load_test --url http://127.0.0.1:8000 --duration 60 --concurrency 8 --mix ten_pull=1,dashboard=1
+        ```
+    """
+    help = 'Load-test a running server with a mix of simulated user traffic and report per-endpoint latency percentiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the running server (default: http://127.0.0.1:8000).')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds of recorded traffic (default: 30).')
+        parser.add_argument('--warmup', type=float, default=5, help='Seconds of unrecorded traffic first (default: 5).')
+        parser.add_argument('--concurrency', type=int, default=8, help='Simulated browsers, one thread each (default: 8).')
+        parser.add_argument('--users', type=int, default=20, help='Synthetic users the browsers log in as (default: 20).')
+        parser.add_argument('--password', default='loadtest-password', help='Password of the synthetic users.')
+        parser.add_argument('--create-users', action='store_true', help='Create the synthetic users (or reset their password) first.')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Scenario weights (default: {DEFAULT_MIX}).')
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds before a request counts as failed (default: 30).')
+        parser.add_argument('--seed', type=int, help='Random seed, for a repeatable sequence of scenarios.')
+        parser.add_argument('--output', help='Also write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        mix = self._parse_mix(options['mix'])
+        usernames = [f'{USERNAME_PREFIX}{i}' for i in range(1, options['users'] + 1)]
+        if options['create_users']:
+            self._create_users(usernames, options['password'])
+
+        self.banner_ids = list(GachaBanner.objects.order_by('banner_id').values_list('banner_id', flat=True))
+        self.student_ids = list(Student.objects.filter(asset_id__isnull=False).values_list('student_id', flat=True))
+        if not self.banner_ids or not self.student_ids:
+            raise CommandError('No banners or students in the database. Run `unpack` first.')
+        if ({'ten_pull', 'dashboard', 'history'} & set(mix)) and not usernames:
+            raise CommandError('The mix has logged-in scenarios; use --users 1 or more.')
+
+        results = Results()
+        stop = threading.Event()
+        self.stdout.write(self.style.NOTICE(
+            f"{options['concurrency']} browsers against {options['url']} for {options['warmup']:g}s warmup "
+            f"+ {options['duration']:g}s, mix {', '.join(f'{name}={weight:g}' for name, weight in mix.items())}"
+        ))
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            workers = [
+                executor.submit(
+                    self._browse, index, usernames[index % len(usernames)] if usernames else None,
+                    options, mix, results, stop,
+                )
+                for index in range(options['concurrency'])
+            ]
+            try:
+                time.sleep(options['warmup'])
+                results.recording = True
+                start = time.perf_counter()
+                time.sleep(options['duration'])
+            finally:
+                results.recording = False
+                stop.set()
+            elapsed = time.perf_counter() - start
+            for worker in workers:
+                worker.result()
+
+        report = self._report(results, elapsed)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({'options': {key: options[key] for key in ('url', 'duration', 'concurrency', 'users', 'mix')}, **report}, file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    # ===================================================================
+    # --- SETUP ---
+    # ===================================================================
+    @staticmethod
+    def _parse_mix(value: str) -> Dict[str, float]:
+        mix = {}
+        for part in filter(None, (part.strip() for part in value.split(','))):
+            name, _, weight = part.partition('=')
+            if name not in SCENARIOS:
+                raise CommandError(f"Unknown scenario '{name}'. Choose from: {', '.join(SCENARIOS)}.")
+            try:
+                mix[name] = float(weight or 1)
+            except ValueError:
+                raise CommandError(f"Invalid weight '{weight}' for scenario '{name}'.")
+        if not mix or sum(mix.values()) <= 0:
+            raise CommandError('The mix needs at least one scenario with a positive weight.')
+        return mix
+
+    def _create_users(self, usernames: List[str], password: str) -> None:
+        # One hash for all of them: hashing is deliberately slow.
+        hashed = make_password(password)
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        User.objects.bulk_create([User(username=username, password=hashed) for username in usernames if username not in existing])
+        User.objects.filter(username__in=existing).update(password=hashed)
+        self.stdout.write(f"{len(usernames) - len(existing)} synthetic users created, {len(existing)} updated.")
+
+    # ===================================================================
+    # --- TRAFFIC ---
+    # ===================================================================
+    def _browse(self, index: int, username: Optional[str], options, mix: Dict[str, float], results: Results, stop: threading.Event) -> None:
+        """One browser's loop: a logged-in and a guest session, running weighted scenarios until stopped."""
+        rng = random.Random(None if options['seed'] is None else options['seed'] + index)
+        guest = VirtualUser(options['url'], results, options['timeout'])
+        guest.start()
+        member = None
+        if username:
+            member = VirtualUser(options['url'], results, options['timeout'])
+            member.start(username, options['password'])
+
+        names, weights = list(mix), list(mix.values())
+        while not stop.is_set():
+            scenario = SCENARIOS[rng.choices(names, weights)[0]]
+            scenario(self, guest, member, rng)
+
+    def _guest_pull(self, guest: VirtualUser, member: VirtualUser, rng: random.Random) -> None:
+        draw = rng.choice(('draw_one_gacha', 'draw_ten_gacha'))
+        guest.request(f'guest {draw}', 'POST', reverse(draw, args=[rng.choice(self.banner_ids)]))
+
+    def _ten_pull(self, guest: VirtualUser, member: VirtualUser, rng: random.Random) -> None:
+        member.request('draw_ten_gacha', 'POST', reverse('draw_ten_gacha', args=[rng.choice(self.banner_ids)]))
+
+    def _dashboard(self, guest: VirtualUser, member: VirtualUser, rng: random.Random) -> None:
+        member.request('dashboard', 'GET', reverse('dashboard'))
+        member.request('dashboard summary', 'GET', reverse('get_dashboard_content', args=['summary']))
+        for name in DASHBOARD_WIDGETS:
+            member.request(name, 'GET', reverse(name))
+        rarity = rng.randint(1, 3)
+        member.request('get_top_students_by_rarity', 'GET', reverse('get_top_students_by_rarity', args=[rarity]))
+
+    def _history(self, guest: VirtualUser, member: VirtualUser, rng: random.Random) -> None:
+        page = rng.randint(1, HISTORY_PAGES)
+        member.request('dashboard history', 'GET', f"{reverse('get_dashboard_content', args=['history'])}?page={page}")
+
+    def _images(self, guest: VirtualUser, member: VirtualUser, rng: random.Random) -> None:
+        guest.request('serve_banner_image', 'GET', reverse('serve_banner_image', args=[rng.choice(self.banner_ids)]))
+        guest.request('serve_student_image', 'GET', reverse('serve_student_image', args=[rng.choice(self.student_ids), 'portrait']))
+        ids = rng.sample(self.student_ids, min(BATCH_IMAGE_COUNT, len(self.student_ids)))
+        guest.request(
+            'serve_student_image_batch', 'GET',
+            f"{reverse('serve_student_image_batch')}?ids={','.join(map(str, ids))}&types=portrait,artwork",
+        )
+
+    # ===================================================================
+    # --- OUTPUT ---
+    # ===================================================================
+    def _report(self, results: Results, elapsed: float) -> dict:
+        endpoints = {}
+        self.stdout.write(self.style.NOTICE(
+            f"\n{'endpoint':<40} {'requests':>8} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+        ))
+        for label in sorted(set(results.timings) | set(results.errors)):
+            timings = sorted(results.timings.get(label, []))
+            errors = results.errors.get(label, {})
+            stats = {
+                'requests': len(timings),
+                'errors': dict(errors),
+                'per_second': len(timings) / elapsed,
+                **{f'p{p}_ms': self._percentile(timings, p / 100) * 1000 for p in (50, 95, 99)},
+                'max_ms': timings[-1] * 1000 if timings else 0.0,
+            }
+            endpoints[label] = stats
+            line = (
+                f"{label:<40} {stats['requests']:>8} {sum(errors.values()):>7} {stats['per_second']:>8.1f} "
+                f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {stats['max_ms']:>8.1f}"
+            )
+            self.stdout.write(self.style.WARNING(f"{line}  {errors}") if errors else line)
+
+        total = sum(stats['requests'] for stats in endpoints.values())
+        failed = sum(sum(stats['errors'].values()) for stats in endpoints.values())
+        self.stdout.write(f"\n{total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s, {failed} errors.")
+        return {'elapsed_seconds': elapsed, 'requests': total, 'errors': failed, 'endpoints': endpoints}
+
+    @staticmethod
+    def _percentile(timings: List[float], fraction: float) -> float:
+        if not timings:
+            return 0.0
+        return timings[min(int(len(timings) * fraction), len(timings) - 1)]
+
+SCENARIOS: Dict[str, Callable[[Command, VirtualUser, Optional[VirtualUser], random.Random], None]] = {
+    'guest_pull': Command._guest_pull,
+    'ten_pull': Command._ten_pull,
+    'dashboard': Command._dashboard,
+    'history': Command._history,
+    'images': Command._images,
+}
@@ -0,0 +1,30 @@
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from .utils.SeedSource import JsonSeedSource, PackedSeedSource
+
+class Command(BaseCommand):
+    """
+    Converts the JSON seed data into the packed format read by `unpack`:
+    an index of every record plus one blob file with the raw image bytes,
+    so no base64 has to be decoded and no image is parsed twice on import.
+    `unpack --source pack` reads it; re-run this after editing the JSON files.
+    """
+    help = 'Convert the JSON seed data into the packed seed format.'
+
+    def add_arguments(self, parser):
+        data_dir = os.path.join(settings.BASE_DIR, 'app_web', 'management', 'data')
+        parser.add_argument('--source', default=os.path.join(data_dir, 'json'), help='JSON seed data directory.')
+        parser.add_argument('--output', default=os.path.join(data_dir, 'pack'), help='Directory to write the pack to.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE(f"Packing seed data from {options['source']}..."))
+        start = time.perf_counter()
+        summary = PackedSeedSource.convert(JsonSeedSource(options['source']), options['output'])
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Packed {summary['records']} records and {summary['blobs']} images "
+            f"({summary['bytes'] / 1024 / 1024:.1f} MB) into {options['output']} in {elapsed:.2f}s"
+        ))
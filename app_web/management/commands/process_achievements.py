@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from app_web.util.AchievementQueue import AchievementQueue
+
+class Command(BaseCommand):
+    """
+    The achievement worker for ACHIEVEMENTS_ASYNC: evaluates the pulls queued
+    by the pull view, a batch at a time, until stopped. Several workers can
+    run side by side.
+    """
+    help = 'Evaluate queued achievement tasks (run alongside the web server when ACHIEVEMENTS_ASYNC=1).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit instead of waiting for new tasks.')
+        parser.add_argument('--batch-size', type=int, default=AchievementQueue.BATCH_SIZE, help='Tasks claimed at a time.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('Processing achievement tasks...'))
+        processed = 0
+        try:
+            while True:
+                start = time.perf_counter()
+                count = AchievementQueue.process_batch(options['batch_size'])
+                if count:
+                    processed += count
+                    self.stdout.write(f'  {count} tasks in {time.perf_counter() - start:.2f}s')
+                    continue
+                if options['once']:
+                    break
+                # Don't hold a connection (or SQLite's file handle) while idle.
+                connection.close()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} achievement tasks.'))
@@ -0,0 +1,49 @@
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from app_web.util.ImagePack import ImagePack
+from app_web.util.SpriteAtlas import SpriteAtlas
+from .utils.Snapshot import Snapshot, SnapshotError
+
+class Command(BaseCommand):
+    """
+    Replaces the whole database with an archive written by `export_snapshot`.
+    Rows are bulk-loaded in one transaction with constraint checks deferred,
+    then the sprite atlas and image pack are rebuilt for the restored catalog.
+    """
+    help = 'Restore the whole database from a snapshot archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archive written by export_snapshot.')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive', help='Do not prompt for confirmation.')
+
+    def handle(self, *args, **options):
+        if options['interactive']:
+            confirm = input(
+                f"This will DELETE all data in the database {connection.settings_dict['NAME']!r} "
+                f"and replace it with {options['path']}.\nType 'yes' to continue, or 'no' to cancel: "
+            )
+            if confirm != 'yes':
+                self.stdout.write('Restore cancelled.')
+                return
+
+        self.stdout.write(self.style.NOTICE(f"Restoring snapshot from {options['path']}..."))
+        start = time.perf_counter()
+        try:
+            counts = Snapshot.restore(options['path'], progress=self._progress)
+        except (SnapshotError, OSError, ValueError) as e:
+            raise CommandError(f'Could not restore snapshot: {e}')
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Restored {sum(counts.values())} rows into {len(counts)} tables in {elapsed:.2f}s'))
+
+        # Cached pages and images describe the old data.
+        cache.clear()
+        manifest = SpriteAtlas.build()
+        summary = ImagePack.build()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt sprite atlas {manifest['version']} and image pack ({summary['images']} images)."
+        ))
+
+    def _progress(self, label, count):
+        self.stdout.write(f'  {label:<45} {count:>9} rows')
@@ -1,214 +1,554 @@
-import json
 import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from app_web.models import Version, School, Student, ImageAsset, GachaPreset, GachaBanner, Achievement
-from .utils.Converter import Converter
-from .utils.TextProgressBar import TextProgressBar
-from .utils.DirectoryProcessor import DirectoryProcessor
+from app_web.util.ImageOptimizer import ImageOptimizer
+from app_web.util.ImagePack import ImagePack
+from app_web.util.SpriteAtlas import SpriteAtlas
+from .utils.ImportTelemetry import ImportStage, ImportTelemetry
+from .utils.SeedSource import open_seed_source
+from .utils.SourceManifest import SourceManifest
+
+DATA_DIR = os.path.join(settings.BASE_DIR, 'app_web', 'management', 'data')
+JSON_DIR = os.path.join(DATA_DIR, 'json')
+PACK_DIR = os.path.join(DATA_DIR, 'pack')
+
+STUDENT_BATCH_SIZE = 50
+BULK_BATCH_SIZE = 500
+ASSET_IMAGE_FIELDS = [
+    'asset_pair_hash', 'asset_portrait_hash', 'asset_artwork_hash',
+    'asset_portrait_data', 'asset_artwork_data',
+    'asset_portrait_webp', 'asset_artwork_webp',
+    'asset_portrait_placeholder', 'asset_artwork_placeholder',
+]
+
+def _prepare_student(source, unit):
+    """
+    Runs in a worker process: loads one student record from the seed source,
+    then optimizes and hashes both images. Returns the record with
+    OptimizedImages in place of the raw bytes.
+    """
+    try:
+        data = source.load(unit)
+        data['unit'] = unit
+        ImportStage.report(bytes=data['size'])
+        data['images'] = {
+            image_type: ImageOptimizer.optimize(data.pop(image_type, None), lossy=True)
+            for image_type in ('portrait', 'artwork')
+        }
+        portrait, artwork = data['images']['portrait'], data['images']['artwork']
+        data['hashes'] = {
+            'asset_portrait_hash': ImageAsset.hash_image(portrait and portrait.data),
+            'asset_artwork_hash': ImageAsset.hash_image(artwork and artwork.data),
+        }
+        data['pair_hash'] = ImageAsset.combine_hashes(data['hashes']['asset_portrait_hash'], data['hashes']['asset_artwork_hash'])
+        return data
+    except Exception as e:
+        return {'error': f"Error processing student {source.name(unit)}: {e}", 'size': 0}
+
+def _asset_fields(data):
+    """ImageAsset field values for a prepared student record (either image may be None)."""
+    portrait, artwork = data['images']['portrait'], data['images']['artwork']
+    return {
+        'asset_pair_hash': data['pair_hash'],
+        **data['hashes'],
+        'asset_portrait_data': portrait and portrait.data,
+        'asset_artwork_data': artwork and artwork.data,
+        'asset_portrait_webp': portrait and portrait.webp,
+        'asset_artwork_webp': artwork and artwork.webp,
+        'asset_portrait_placeholder': portrait.placeholder if portrait else '',
+        'asset_artwork_placeholder': artwork.placeholder if artwork else '',
+    }
+
+class AssetCache:
+    """
+    The ImageAssets known to a student import, indexed by id and by pair
+    hash, with how many students use each one, so shared assets are never
+    overwritten and unused ones can be deleted.
+    """
+    def __init__(self, assets, students):
+        self.by_id = {asset.asset_id: asset for asset in assets}
+        self.by_hash = {asset.asset_pair_hash: asset for asset in self.by_id.values()}
+        self.users = Counter(student.asset_id_id for student in students if student.asset_id_id)
+        self._orphans = set()
+
+    def add(self, asset):
+        self.by_id[asset.asset_id] = asset
+        self.by_hash[asset.asset_pair_hash] = asset
+
+    def link(self, student, asset):
+        """Points `student` at `asset`, tracking the asset it leaves behind."""
+        previous = student.asset_id_id
+        if previous == asset.asset_id:
+            return
+        if previous:
+            self.users[previous] -= 1
+            if self.users[previous] <= 0:
+                self._orphans.add(previous)
+        student.asset_id = asset
+        self.users[asset.asset_id] += 1
+        self._orphans.discard(asset.asset_id)
+
+    def pop_orphans(self):
+        """Returns and forgets the ids of assets no student uses anymore."""
+        orphans, self._orphans = self._orphans, set()
+        for asset_id in orphans:
+            asset = self.by_id.pop(asset_id)
+            if self.by_hash.get(asset.asset_pair_hash) is asset:
+                del self.by_hash[asset.asset_pair_hash]
+        return orphans
 
 class Command(BaseCommand):
     """
     A Django management command to import all initial data for the application
-    from a structured directory of JSON files. The entire import process is
-    wrapped in a single atomic transaction to ensure data integrity.
+    from the seed data: the structured directory of JSON files, or with
+    `--source pack` the packed format written by `pack_seed_data`. The pack is
+    only read when asked for, since it goes stale when the JSON files are
+    edited; re-run `pack_seed_data` after editing them.
+
+    The import is incremental: a manifest of source file hashes (ImportManifest)
+    is kept in the database and files that have not changed since the last
+    import are skipped. Rows are written with bulk_create/bulk_update, and each
+    batch is committed together with its manifest entries, so an interrupted
+    import picks up where it stopped. Use --force to re-import everything.
     """
-    help = 'Import data from JSON files into the database.'
+    help = 'Import the seed data (packed or JSON) into the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Ignore the manifest and re-import every file.')
+        parser.add_argument(
+            '--source', choices=('json', 'pack'), default='json',
+            help="Read the JSON files (default) or the pack written by `pack_seed_data`.",
+        )
+        parser.add_argument(
+            '--summary', default=getattr(settings, 'IMPORT_SUMMARY_PATH', None),
+            help='Where to write the JSON telemetry summary (default: settings.IMPORT_SUMMARY_PATH).',
+        )
 
     # ===================================================================
     # --- MAIN HANDLER ---
     # ===================================================================
-    @transaction.atomic
     def handle(self, *args, **options):
         """Main entry point for the command."""
-        ROOT_DIR = os.path.join(settings.BASE_DIR, 'app_web', 'management', 'data', 'json')
-        
-        # Define directories for each data type
-        dirs = {
-            'presets': os.path.join(ROOT_DIR, 'presets'),
-            'banners': os.path.join(ROOT_DIR, 'banners'),
-            'schools': os.path.join(ROOT_DIR, 'schools'),
-            'students': os.path.join(ROOT_DIR, 'students'),
-            'achievements': os.path.join(ROOT_DIR, 'achievements'),
-        }
-
         self.stdout.write(self.style.SUCCESS('--- Starting Data Unpack ---'))
-        
+        start_time = time.perf_counter()
+        try:
+            self.source = open_seed_source(options['source'], JSON_DIR, PACK_DIR)
+        except FileNotFoundError as e:
+            raise CommandError(f'{e}. Run `pack_seed_data` first.')
+        self.manifest = SourceManifest(JSON_DIR, force=options['force'])
+        self.stdout.write(f'Reading {self.source}')
+        self.telemetry = ImportTelemetry('unpack', stream=self.stdout, source=str(self.source), force=options['force'])
+        self.data_changed = False
+        self.students_created = False
+        self.assets_reused = 0
+
         # Execute unpackers in an order that respects model dependencies
-        self.unpack_presets(dirs['presets'])
-        self.unpack_schools(dirs['schools'])
-        self.unpack_students_and_versions(dirs['students']) # This also handles Versions
-        self.unpack_banners(dirs['banners'])
-        self.unpack_achievements(dirs['achievements'])
+        stages = [
+            ('presets', self.unpack_presets),
+            ('schools', self.unpack_schools),
+            ('students', self.unpack_students_and_versions), # This also handles Versions
+            ('banners', self.unpack_banners),
+            ('achievements', self.unpack_achievements),
+            ('sprite_atlas', self.build_sprite_atlas),
+        ]
+        for name, unpacker in stages:
+            with self.telemetry.stage(name) as self.stage:
+                unpacker()
+
+        # The atlas checks its own catalog signature; the pack is only rewritten when rows changed.
+        if self.data_changed or not os.path.exists(ImagePack.PACK_PATH):
+            with self.telemetry.stage('image_pack') as self.stage:
+                self.build_image_pack()
+
+        self.stdout.write(self.style.NOTICE('\nStage summary:'))
+        for line in self.telemetry.summary_lines():
+            self.stdout.write(line)
+        if options['summary']:
+            self.telemetry.write_summary(options['summary'])
+            self.stdout.write(f"Telemetry written to {options['summary']}")
 
-        self.stdout.write(self.style.SUCCESS('\n--- Data Unpack Complete ---'))
+        self.stdout.write(self.style.SUCCESS(f'\n--- Data Unpack Complete ({time.perf_counter() - start_time:.2f}s) ---'))
 
     # ===================================================================
     # --- UNPACKER METHODS ---
     # ===================================================================
-    def unpack_presets(self, dir_path):
-        """Unpacks GachaPreset data from a single JSON file."""
+    def unpack_presets(self):
+        """Unpacks GachaPreset data."""
         self.stdout.write(self.style.NOTICE('\nUnpacking Gacha Presets...'))
-        json_file = os.path.join(dir_path, 'presets.json')
         try:
-            with open(json_file) as f:
-                data_list = json.load(f)
-            
-            prog_bar = TextProgressBar(len(data_list))
-            for data in data_list:
-                GachaPreset.objects.update_or_create(
-                    preset_name=data['name'],
-                    defaults={
+            if not self.source.units('presets'):
+                self.stdout.write(self.style.WARNING('No preset data found. Skipping.'))
+                return
+            units = self.source.changed(self.manifest, 'presets')
+            if not units:
+                self.stdout.write(self.style.SUCCESS('Presets are unchanged. Skipping.'))
+                return
+
+            data_list = self.source.load(units[0])
+
+            with transaction.atomic():
+                created, updated = self._bulk_upsert(GachaPreset, 'preset_name', {
+                    data['name']: {
                         'preset_pickup_rate': data['pickup'],
                         'preset_r3_rate': data['r3'],
                         'preset_r2_rate': data['r2'],
                         'preset_r1_rate': data['r1'],
                     }
-                )
-                prog_bar.add_step()
-            self.stdout.write(self.style.SUCCESS(f'\nSuccessfully unpacked {len(data_list)} presets.'))
-        except FileNotFoundError:
-            self.stdout.write(self.style.WARNING('presets.json not found. Skipping.'))
+                    for data in data_list
+                })
+                self.source.record(self.manifest, units)
+            self.stage.add(items=len(data_list), bytes=sum(data['size'] for data in data_list), rows=created + updated)
+            self.stdout.write(self.style.SUCCESS(f'Successfully unpacked {len(data_list)} presets ({created} new, {updated} updated).'))
         except Exception as e:
+            self.stage.add(errors=1)
             self.stdout.write(self.style.ERROR(f'\nAn error occurred: {e}'))
 
-    def unpack_schools(self, dir_path):
-        """Unpacks School data from a single JSON file."""
+    def unpack_schools(self):
+        """Unpacks School data."""
         self.stdout.write(self.style.NOTICE('\nUnpacking Schools...'))
-        json_file = os.path.join(dir_path, 'schools.json')
         try:
-            with open(json_file) as f:
-                data_list = json.load(f)
-
-            prog_bar = TextProgressBar(len(data_list))
-            for data in data_list:
-                School.objects.update_or_create(
-                    school_name=data['name'],
-                    defaults={'school_image': Converter.base64_to_byte(data['image_base64'])}
-                )
-                prog_bar.add_step()
-            self.stdout.write(self.style.SUCCESS(f'\nSuccessfully unpacked {len(data_list)} schools.'))
-        except FileNotFoundError:
-            self.stdout.write(self.style.WARNING('schools.json not found. Skipping.'))
+            if not self.source.units('schools'):
+                self.stdout.write(self.style.WARNING('No school data found. Skipping.'))
+                return
+            units = self.source.changed(self.manifest, 'schools')
+            if not units:
+                self.stdout.write(self.style.SUCCESS('Schools are unchanged. Skipping.'))
+                return
+
+            data_list = self.source.load(units[0])
+            optimized_images = ImageOptimizer.optimize_many(data.get('image') for data in data_list)
+
+            with transaction.atomic():
+                created, updated = self._bulk_upsert(School, 'school_name', {
+                    data['name']: {'school_image': optimized.data if optimized else None}
+                    for data, optimized in zip(data_list, optimized_images)
+                })
+                self.source.record(self.manifest, units)
+            self.stage.add(items=len(data_list), bytes=sum(data['size'] for data in data_list), rows=created + updated)
+            self.stdout.write(self.style.SUCCESS(f'Successfully unpacked {len(data_list)} schools ({created} new, {updated} updated).'))
         except Exception as e:
+            self.stage.add(errors=1)
             self.stdout.write(self.style.ERROR(f'\nAn error occurred: {e}'))
 
-    def unpack_students_and_versions(self, dir_path):
-        """Unpacks Version and Student data from a directory of JSON files."""
+    def unpack_students_and_versions(self):
+        """
+        Unpacks Version and Student data in a single pass: a process pool
+        loads and optimizes the changed records while this process writes the
+        results to the database in batches.
+        """
         self.stdout.write(self.style.NOTICE('\nUnpacking Students and Versions...'))
-        json_files = DirectoryProcessor.get_only_files(dir_path, ['.json'])
-        if not json_files:
-            self.stdout.write(self.style.WARNING('No student JSON files found. Skipping.'))
+        all_units = self.source.units('students')
+        if not all_units:
+            self.stdout.write(self.style.WARNING('No student data found. Skipping.'))
+            return
+
+        units = self.source.changed(self.manifest, 'students')
+        if not units:
+            self.stdout.write(self.style.SUCCESS(f'All {len(all_units)} students are unchanged. Skipping.'))
             return
-            
-        # --- Stage 1: Discover and create all Version objects in sorted order ---
-        all_version_names = {json.load(open(f))['version'] for f in json_files}
+
+        # --- Stage 1: Create missing Version objects in sorted order ---
+        # Versions are read without touching the images; those are read once, in Stage 2.
+        all_version_names = {self.source.version_name(unit) for unit in units}
         final_version_list = ['Original'] + sorted(list(all_version_names - {'Original'}))
-        
-        versions_cache = {}
+
+        versions_cache = {version.version_name: version for version in Version.objects.all()}
         for version_name in final_version_list:
-            version_obj, _ = Version.objects.get_or_create(version_name=version_name)
-            versions_cache[version_name] = version_obj
+            if version_name not in versions_cache:
+                versions_cache[version_name] = Version.objects.create(version_name=version_name)
         self.stdout.write(self.style.SUCCESS(f'Created/verified {len(versions_cache)} versions.'))
-        
-        # --- Stage 2: Create all Student objects ---
+
+        # --- Stage 2: Load records in parallel, write students in batches ---
         schools_cache = {school.school_name: school for school in School.objects.all()}
-        prog_bar = TextProgressBar(len(json_files))
-        for json_file in json_files:
+        existing_students = {
+            (student.student_name, student.version_id.version_name): student
+            for student in Student.objects.select_related('version_id').only(
+                'student_id', 'student_name', 'student_rarity', 'school_id', 'student_is_limited',
+                'version_id__version_name', 'asset_id',
+            )
+        }
+        # Assets are matched by pair hash, so a record whose images are already stored reuses that asset.
+        assets = AssetCache(ImageAsset.objects.only('asset_id', 'asset_pair_hash'), existing_students.values())
+        caches = (versions_cache, schools_cache, existing_students, assets)
+
+        # Workers report the bytes they load; this process counts records and rows.
+        self.stage.total = len(units)
+        batch = []
+        with ProcessPoolExecutor(max_workers=ImageOptimizer.WORKERS, initializer=ImportStage.attach, initargs=(self.stage,)) as executor:
+            for data in executor.map(partial(_prepare_student, self.source), units):
+                if 'error' in data:
+                    self.stage.add(errors=1)
+                    self.stdout.write(self.style.ERROR(f"\n{data['error']}"))
+                else:
+                    batch.append(data)
+                if len(batch) >= STUDENT_BATCH_SIZE:
+                    self._write_student_batch(batch, *caches)
+                    batch = []
+                self.stage.add(items=1)
+        self._write_student_batch(batch, *caches)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully unpacked {len(units)} changed students ({self.assets_reused} reused an existing image asset).'
+        ))
+
+    @transaction.atomic
+    def _write_student_batch(self, batch, versions_cache, schools_cache, existing_students, assets):
+        """
+        Writes one batch of loaded student records, a few queries per batch,
+        and records them in the manifest in the same transaction. Identical
+        images share one asset; assets left without students are deleted.
+        """
+        students_to_update, new_students, assets_to_update, imported_units = [], [], [], []
+        new_assets, waiting = {}, [] # pair hash -> unsaved asset; (student, pair hash) linked once it is saved
+        relinked = False
+        for data in batch:
+            key = (data['name'], data['version'])
             try:
-                with open(json_file) as f:
-                    data = json.load(f)
-                
-                student_obj, created = Student.objects.update_or_create(
-                    student_name=data['name'],
-                    version_id=versions_cache[data['version']],
-                    defaults={
-                        'student_rarity': data['rarity'],
-                        'school_id': schools_cache[data['school']],
-                        'student_is_limited': data['is_limited'],
-                    }
-                )
+                fields = {
+                    'student_rarity': data['rarity'],
+                    'school_id': schools_cache[data['school']],
+                    'student_is_limited': data['is_limited'],
+                }
+            except KeyError as e:
+                self.stdout.write(self.style.ERROR(f"\nError processing student {data['name']}: unknown school {e}"))
+                self.stage.add(errors=1)
+                continue
 
-                if created:
-                    asset_obj = ImageAsset.objects.create(
-                        asset_portrait_data=Converter.base64_to_byte(data['base64']['portrait']),
-                        asset_artwork_data=Converter.base64_to_byte(data['base64']['artwork'])
-                    )
-                    student_obj.asset_id = asset_obj
-                    student_obj.save()
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"\nError processing student file {os.path.basename(json_file)}: {e}"))
-            prog_bar.add_step()
-        self.stdout.write(self.style.SUCCESS(f'\nSuccessfully unpacked {len(json_files)} students.'))
+            student_obj = existing_students.get(key)
+            if student_obj is None:
+                student_obj = Student(student_name=data['name'], version_id=versions_cache[data['version']], **fields)
+                new_students.append(student_obj)
+            else:
+                for field, value in fields.items():
+                    setattr(student_obj, field, value)
+                students_to_update.append(student_obj)
+
+            current = assets.by_id.get(student_obj.asset_id_id)
+            pair_hash = data['pair_hash']
+            if current and current.asset_pair_hash == pair_hash:
+                pass
+            elif pair_hash in assets.by_hash:
+                assets.link(student_obj, assets.by_hash[pair_hash])
+                self.assets_reused += 1
+                relinked = True
+            elif pair_hash in new_assets:
+                # An earlier record of this batch brings the same images; its asset is saved below.
+                waiting.append((student_obj, pair_hash))
+                self.assets_reused += 1
+            elif current and assets.users[current.asset_id] == 1:
+                # Nobody else uses the old images: update the asset in place.
+                del assets.by_hash[current.asset_pair_hash]
+                for field, value in _asset_fields(data).items():
+                    setattr(current, field, value)
+                assets.by_hash[pair_hash] = current
+                assets_to_update.append(current)
+            else:
+                new_assets[pair_hash] = ImageAsset(**_asset_fields(data))
+                waiting.append((student_obj, pair_hash))
+            imported_units.append(data['unit'])
+
+        if assets_to_update:
+            ImageAsset.objects.bulk_update(assets_to_update, ASSET_IMAGE_FIELDS)
+        for asset_obj in ImageAsset.objects.bulk_create(new_assets.values()):
+            assets.add(asset_obj)
+        for student_obj, pair_hash in waiting:
+            assets.link(student_obj, new_assets[pair_hash])
+
+        if new_students:
+            for student_obj in Student.objects.bulk_create(new_students):
+                existing_students[(student_obj.student_name, student_obj.version_id.version_name)] = student_obj
+            self.students_created = True
+        if students_to_update:
+            Student.objects.bulk_update(students_to_update, ['student_rarity', 'school_id', 'student_is_limited', 'asset_id'])
 
-    def unpack_banners(self, dir_path):
-        """Unpacks GachaBanner data from a directory of JSON files."""
+        orphaned = assets.pop_orphans()
+        if orphaned:
+            ImageAsset.objects.filter(asset_id__in=orphaned, student__isnull=True).delete()
+
+        if new_students or new_assets or assets_to_update or orphaned or relinked:
+            self.data_changed = True
+        self.source.record(self.manifest, imported_units)
+        self.stage.add(rows=len(new_assets) + len(assets_to_update) + len(new_students) + len(students_to_update) + len(orphaned))
+
+    def unpack_banners(self):
+        """Unpacks GachaBanner data."""
         self.stdout.write(self.style.NOTICE('\nUnpacking Banners...'))
-        json_files = DirectoryProcessor.get_only_files(dir_path, ['.json'])
-        if not json_files:
-            self.stdout.write(self.style.WARNING('No banner JSON files found. Skipping.'))
+        all_units = self.source.units('banners')
+        if not all_units:
+            self.stdout.write(self.style.WARNING('No banner data found. Skipping.'))
+            return
+
+        sorted_units = sorted(all_units, key=lambda u: (0, u) if os.path.splitext(os.path.basename(u))[0] == 'Standard' else (1, u))
+
+        # Pickups refer to students by name, so new students can complete a banner whose record did not change.
+        changed_units = set(self.source.changed(self.manifest, 'banners'))
+        if self.students_created:
+            changed_units = set(sorted_units)
+        sorted_units = [unit for unit in sorted_units if unit in changed_units]
+        if not sorted_units:
+            self.stdout.write(self.style.SUCCESS('All banners are unchanged. Skipping.'))
             return
 
-        sorted_files = sorted(json_files, key=lambda p: (0, p) if "Standard.json" in p else (1, p))
-        
         # --- Cache all necessary related data for high performance ---
         presets_cache = {p.name: p for p in GachaPreset.objects.all()}
         versions_cache = {v.name: v for v in Version.objects.all()}
-        students_cache = {(s.name, s.version): s for s in Student.objects.select_related('version_id')}
-        
-        prog_bar = TextProgressBar(len(sorted_files))
-        for json_file in sorted_files:
+        students_cache = {(s.name, s.version): s for s in Student.objects.select_related('version_id').only('student_id', 'student_name', 'version_id__version_name')}
+
+        banner_data = self._load_units(sorted_units)
+        optimized_images = ImageOptimizer.optimize_many(data.get('image') if data else None for data in banner_data)
+
+        rows, relations, imported_units = {}, {}, []
+        for unit, data, optimized in zip(sorted_units, banner_data, optimized_images):
             try:
-                with open(json_file) as f:
-                    data = json.load(f)
-
-                banner_obj, _ = GachaBanner.objects.update_or_create(
-                    banner_name=data["name"],
-                    defaults={
-                        'preset_id': presets_cache[data["preset"]],
-                        'banner_image': Converter.base64_to_byte(data['image_base64']),
-                        'banner_include_limited': data["limited"]
-                    }
+                if data is None:
+                    raise ValueError('Could not read file.')
+
+                rows[data["name"]] = {
+                    'preset_id': presets_cache[data["preset"]],
+                    'banner_image': optimized.data if optimized else None,
+                    'banner_include_limited': data["limited"]
+                }
+                relations[data["name"]] = (
+                    [versions_cache[v_name] for v_name in data["version"] if v_name in versions_cache],
+                    [students_cache[(p["name"], p["version"])] for p in data["pickup"] if (p["name"], p["version"]) in students_cache],
                 )
-                
-                # --- Set Many-to-Many relationships using the cache ---
-                version_objects = [versions_cache[v_name] for v_name in data["version"] if v_name in versions_cache]
+                imported_units.append(unit)
+            except Exception as e:
+                self.stage.add(errors=1)
+                self.stdout.write(self.style.ERROR(f"\nError processing banner {self.source.name(unit)}: {e}"))
+
+        with transaction.atomic():
+            created, updated = self._bulk_upsert(GachaBanner, 'banner_name', rows)
+
+            # --- Set Many-to-Many relationships using the cache ---
+            for banner_obj in GachaBanner.objects.filter(banner_name__in=rows).only('banner_id', 'banner_name'):
+                version_objects, pickup_objects = relations[banner_obj.banner_name]
                 banner_obj.banner_include_version.set(version_objects)
-                
-                pickup_objects = [students_cache[(p["name"], p["version"])] for p in data["pickup"] if (p["name"], p["version"]) in students_cache]
                 banner_obj.banner_pickup.set(pickup_objects)
 
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"\nError processing banner file {os.path.basename(json_file)}: {e}"))
-            prog_bar.add_step()
-        self.stdout.write(self.style.SUCCESS(f'\nSuccessfully unpacked {len(sorted_files)} banners.'))
+            self.source.record(self.manifest, imported_units)
+        self.stage.add(items=len(banner_data), bytes=sum(data['size'] for data in banner_data if data), rows=created + updated)
+        self.stdout.write(self.style.SUCCESS(f'Successfully unpacked {len(rows)} banners ({created} new, {updated} updated).'))
 
-    def unpack_achievements(self, dir_path):
-        """Unpacks Achievement definitions from a directory of JSON files."""
+    def unpack_achievements(self):
+        """Unpacks Achievement definitions."""
         self.stdout.write(self.style.NOTICE('\nUnpacking Achievements...'))
-        json_files = DirectoryProcessor.get_only_files(dir_path, ['.json'])
-        if not json_files:
-            self.stdout.write(self.style.WARNING('No achievement JSON files found. Skipping.'))
+        all_units = self.source.units('achievements')
+        if not all_units:
+            self.stdout.write(self.style.WARNING('No achievement data found. Skipping.'))
+            return
+
+        units = self.source.changed(self.manifest, 'achievements')
+        if not units:
+            self.stdout.write(self.style.SUCCESS(f'All {len(all_units)} achievements are unchanged. Skipping.'))
             return
 
-        prog_bar = TextProgressBar(len(json_files))
-        for json_file in json_files:
+        achievement_data = self._load_units(units)
+        optimized_images = ImageOptimizer.optimize_many(data.get('image') if data else None for data in achievement_data)
+
+        rows, imported_units = {}, []
+        for unit, data, optimized in zip(units, achievement_data, optimized_images):
             try:
-                with open(json_file) as file:
-                    data = json.load(file)
-                
-                Achievement.objects.update_or_create(
-                    achievement_key=data["key"],
-                    defaults={
-                        'achievement_name': data["name"],
-                        'achievement_description': data["description"],
-                        'achievement_category': data["category"],
-                        'achievement_image': Converter.base64_to_byte(data['image_base64'])
-                    }
-                )
+                if data is None:
+                    raise ValueError('Could not read file.')
+
+                rows[data["key"]] = {
+                    'achievement_name': data["name"],
+                    'achievement_description': data["description"],
+                    'achievement_category': data["category"],
+                    'achievement_image': optimized.data if optimized else None,
+                    # Collections name their students; every other kind declares a "rule" (see AchievementRules).
+                    'achievement_rule': data.get("rule") or ({'students': data["students"]} if data.get("students") else None),
+                }
+                imported_units.append(unit)
             except Exception as e:
-                self.stdout.write(self.style.ERROR(f"\nError processing achievement file {os.path.basename(json_file)}: {e}"))
-            prog_bar.add_step()
-        self.stdout.write(self.style.SUCCESS(f'\nSuccessfully unpacked {len(json_files)} achievements.'))
\ No newline at end of file
+                self.stage.add(errors=1)
+                self.stdout.write(self.style.ERROR(f"\nError processing achievement {self.source.name(unit)}: {e}"))
+
+        with transaction.atomic():
+            created, updated = self._bulk_upsert(Achievement, 'achievement_key', rows)
+            self.source.record(self.manifest, imported_units)
+        self.stage.add(items=len(achievement_data), bytes=sum(data['size'] for data in achievement_data if data), rows=created + updated)
+        self.stdout.write(self.style.SUCCESS(f'Successfully unpacked {len(rows)} achievements ({created} new, {updated} updated).'))
+
+    # ===================================================================
+    # --- HELPERS ---
+    # ===================================================================
+    def _bulk_upsert(self, model, key_field, rows):
+        """
+        Creates or updates `rows` ({key: {field: value}}) with one bulk_create
+        and one bulk_update instead of an update_or_create per row. Rows whose
+        values did not change are left alone. Returns (created, updated) counts.
+        """
+        existing = model.objects.in_bulk(list(rows), field_name=key_field)
+        to_create, to_update, update_fields = [], [], set()
+        for key, fields in rows.items():
+            obj = existing.get(key)
+            if obj is None:
+                to_create.append(model(**{key_field: key}, **fields))
+                continue
+
+            # to_python() so e.g. a float from JSON compares equal to the stored Decimal.
+            values = {
+                field: value if model._meta.get_field(field).is_relation else model._meta.get_field(field).to_python(value)
+                for field, value in fields.items()
+            }
+            changed_fields = [field for field, value in values.items() if getattr(obj, field) != value]
+            for field in changed_fields:
+                setattr(obj, field, values[field])
+            if changed_fields:
+                to_update.append(obj)
+                update_fields.update(changed_fields)
+
+        if to_create:
+            model.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+        if to_update:
+            # bulk_update() skips pre_save(), so auto_now fields are stamped here.
+            for field in model._meta.concrete_fields:
+                if getattr(field, 'auto_now', False):
+                    for obj in to_update:
+                        field.pre_save(obj, add=False)
+                    update_fields.add(field.name)
+            model.objects.bulk_update(to_update, sorted(update_fields), batch_size=BULK_BATCH_SIZE)
+        if to_create or to_update:
+            self.data_changed = True
+        return len(to_create), len(to_update)
+
+    def _load_units(self, units):
+        """Loads each unit, returning None in its place if it cannot be read."""
+        data_list = []
+        for unit in units:
+            try:
+                data_list.append(self.source.load(unit))
+            except (OSError, ValueError, KeyError) as e:
+                self.stdout.write(self.style.ERROR(f"\nError reading {self.source.name(unit)}: {e}"))
+                data_list.append(None)
+        return data_list
+
+    def build_sprite_atlas(self):
+        """Packs the freshly imported portraits into sprite sheets."""
+        self.stdout.write(self.style.NOTICE('\nBuilding Sprite Atlas...'))
+        try:
+            manifest = SpriteAtlas.build()
+            self.stage.add(items=len(manifest['sheets']))
+            self.stdout.write(self.style.SUCCESS(f"Sprite atlas {manifest['version']} has {len(manifest['sheets'])} sheets."))
+        except Exception as e:
+            self.stage.add(errors=1)
+            self.stdout.write(self.style.ERROR(f'\nAn error occurred: {e}'))
+
+    def build_image_pack(self):
+        """Writes all imported images into the shared, memory-mapped pack file."""
+        self.stdout.write(self.style.NOTICE('\nBuilding Image Pack...'))
+        try:
+            summary = ImagePack.build()
+            self.stage.add(items=summary['images'], bytes=summary['bytes'])
+            self.stdout.write(self.style.SUCCESS(f"Packed {summary['images']} images into {summary['path']}."))
+        except Exception as e:
+            self.stage.add(errors=1)
+            self.stdout.write(self.style.ERROR(f'\nAn error occurred: {e}'))
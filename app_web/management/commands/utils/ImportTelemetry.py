@@ -0,0 +1,196 @@
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, TextIO
+from django.core.management.base import OutputWrapper
+from django.utils import timezone
+
+class ImportStage:
+    """
+    Counters for one stage of an import: items processed, bytes read, rows
+    written and errors. The counters live in shared memory, so they can be
+    updated from threads and from pool worker processes alike.
+
+    Worker processes get the stage through the pool initializer and report
+    with the `ImportStage.report()` class method:
+
+        ```python
+        with ProcessPoolExecutor(initializer=ImportStage.attach, initargs=(stage,)) as executor:
+            ...
+        # in the worker
+        ImportStage.report(bytes=len(data))
+        ```
+    """
+    FIELDS = ('items', 'bytes', 'rows', 'errors')
+    _attached: Optional['ImportStage'] = None
+
+    def __init__(self, telemetry: Optional['ImportTelemetry'], name: str, total: int = 0):
+        self.name = name
+        self.total = total
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self._telemetry = telemetry
+        self._counters = multiprocessing.Array('q', len(self.FIELDS))
+
+    def __getstate__(self):
+        # Workers only count; rendering stays with the process that owns the telemetry.
+        state = self.__dict__.copy()
+        state['_telemetry'] = None
+        return state
+
+    def add(self, items: int = 0, bytes: int = 0, rows: int = 0, errors: int = 0) -> None:
+        with self._counters.get_lock():
+            for index, value in enumerate((items, bytes, rows, errors)):
+                self._counters[index] += value
+        if self._telemetry:
+            self._telemetry.render(self)
+
+    def counts(self) -> Dict[str, int]:
+        with self._counters.get_lock():
+            return dict(zip(self.FIELDS, self._counters[:]))
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def summary(self) -> dict:
+        counts = self.counts()
+        elapsed = self.elapsed
+        return {
+            'name': self.name,
+            'seconds': round(elapsed, 3),
+            'total': self.total,
+            **counts,
+            'items_per_second': round(counts['items'] / elapsed, 2) if elapsed else 0,
+            'mb_per_second': round(counts['bytes'] / 1024 / 1024 / elapsed, 2) if elapsed else 0,
+        }
+
+    @classmethod
+    def attach(cls, stage: 'ImportStage') -> None:
+        """Pool initializer: makes `stage` the target of report() in this worker."""
+        cls._attached = stage
+
+    @classmethod
+    def report(cls, **counts) -> None:
+        """Adds to the attached stage from a worker process; a no-op outside of one."""
+        if cls._attached:
+            cls._attached.add(**counts)
+
+class ImportTelemetry:
+    """
+    Progress and telemetry for a multi-stage import such as `unpack`.
+
+    Each stage records its duration and the items, bytes, rows and errors it
+    handled. Stages with a known total get a progress bar; it is redrawn at
+    most every `min_interval` seconds and only on a terminal, so reporting
+    never slows the import down and build logs stay readable. At the end,
+    `write_summary()` writes everything as JSON for scripts and CI.
+
+    Commands pass their `self.stdout` as the stream, so `call_command(...,
+    stdout=...)` captures the progress too.
+
+    Example:
+        ```python
+        telemetry = ImportTelemetry('unpack', stream=self.stdout)
+        with telemetry.stage('students', total=len(files)) as stage:
+            for f in files:
+                ...
+                stage.add(items=1, bytes=size, rows=1)
+        telemetry.write_summary('import_summary.json')
+        ```
+    """
+    BAR_LENGTH = 40
+
+    def __init__(self, name: str, stream: Optional[TextIO] = None, min_interval: float = 0.1, **metadata):
+        self.name = name
+        self.metadata = metadata
+        self.stream = stream or sys.stdout
+        self.min_interval = min_interval
+        self.stages: List[ImportStage] = []
+        self.started_at = timezone.now()
+        self.started = time.perf_counter()
+        self._interactive = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self._last_render = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, total: int = 0) -> Iterator[ImportStage]:
+        stage = ImportStage(self, name, total)
+        self.stages.append(stage)
+        try:
+            yield stage
+        finally:
+            stage.finished = time.perf_counter()
+            if stage.total:
+                self.render(stage, final=True)
+
+    # ===================================================================
+    # --- RENDERING ---
+    # ===================================================================
+    def render(self, stage: ImportStage, final: bool = False) -> None:
+        """Redraws the stage's progress bar if it is due; the final draw always happens."""
+        if not stage.total or not (self._interactive or final):
+            return
+        now = time.perf_counter()
+        with self._lock:
+            if not final and now - self._last_render < self.min_interval:
+                return
+            self._last_render = now
+            self._write(f'\r{self._progress_line(stage)}' + ('\n' if final else ''))
+            self.stream.flush()
+
+    def _write(self, text: str) -> None:
+        # A command's self.stdout adds a newline unless told otherwise, which would break the redraw.
+        if isinstance(self.stream, OutputWrapper):
+            self.stream.write(text, ending='')
+        else:
+            self.stream.write(text)
+
+    def _progress_line(self, stage: ImportStage) -> str:
+        counts = stage.counts()
+        progress = min(counts['items'] / stage.total, 1)
+        bars = '█' * int(self.BAR_LENGTH * progress)
+        elapsed = stage.elapsed
+        rate = counts['bytes'] / 1024 / 1024 / elapsed if elapsed else 0
+        eta = elapsed / counts['items'] * (stage.total - counts['items']) if counts['items'] else 0
+        return (
+            f"{counts['items']}/{stage.total} [{bars:<{self.BAR_LENGTH}}] {int(progress * 100)}% "
+            f"| {rate:.1f} MB/s | ETA: {int(eta)}s "
+        )
+
+    # ===================================================================
+    # --- SUMMARY ---
+    # ===================================================================
+    def summary(self) -> dict:
+        stages = [stage.summary() for stage in self.stages]
+        return {
+            'name': self.name,
+            **self.metadata,
+            'started_at': self.started_at.isoformat(),
+            'seconds': round(time.perf_counter() - self.started, 3),
+            'stages': stages,
+            'totals': {field: sum(stage[field] for stage in stages) for field in ImportStage.FIELDS},
+        }
+
+    def summary_lines(self) -> List[str]:
+        """A human-readable table of the stages."""
+        lines = [f"{'stage':<14}{'seconds':>9}{'items':>8}{'rows':>8}{'MB':>9}{'errors':>8}"]
+        for stage in self.summary()['stages']:
+            lines.append(
+                f"{stage['name']:<14}{stage['seconds']:>9.2f}{stage['items']:>8}{stage['rows']:>8}"
+                f"{stage['bytes'] / 1024 / 1024:>9.1f}{stage['errors']:>8}"
+            )
+        return lines
+
+    def write_summary(self, path: str) -> dict:
+        summary = self.summary()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        os.replace(tmp_path, path)
+        return summary
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+from typing import Dict, List, Optional
+from .Converter import Converter
+from .DirectoryProcessor import DirectoryProcessor
+from .SourceManifest import SourceManifest
+
+KINDS = ('presets', 'schools', 'students', 'banners', 'achievements')
+
+# Fields that hold base64 images in the JSON layout, and the keys they are
+# exposed under (as raw bytes) by every seed source.
+IMAGE_FIELDS = {
+    'schools': {'image_base64': 'image'},
+    'students': {'portrait': 'portrait', 'artwork': 'artwork'},
+    'banners': {'image_base64': 'image'},
+    'achievements': {'image_base64': 'image'},
+}
+
+class JsonSeedSource:
+    """
+    Reads the seed data from the original layout: one JSON file per student,
+    banner and achievement, single files for presets and schools, with images
+    embedded as base64.
+
+    A unit is a file path; `load(unit)` returns its parsed content with images
+    decoded to bytes (`image`, or `portrait`/`artwork` for students).
+    """
+    VERSION_PATTERN = re.compile(r'"version"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+
+    def __str__(self):
+        return f'JSON files in {self.root_dir}'
+
+    def units(self, kind: str) -> List[str]:
+        directory = os.path.join(self.root_dir, kind)
+        if kind in ('presets', 'schools'):
+            path = os.path.join(directory, f'{kind}.json')
+            return [path] if os.path.isfile(path) else []
+        if not os.path.isdir(directory):
+            return []
+        return sorted(DirectoryProcessor.get_only_files(directory, ['.json']))
+
+    def changed(self, manifest: SourceManifest, kind: str) -> List[str]:
+        return manifest.changed(self.units(kind))
+
+    def record(self, manifest: SourceManifest, units: List[str]) -> None:
+        manifest.record(units)
+
+    def name(self, unit: str) -> str:
+        return os.path.basename(unit)
+
+    def load(self, unit: str):
+        with open(unit, 'rb') as f:
+            raw = f.read()
+        data = json.loads(raw)
+        kind = os.path.basename(os.path.dirname(unit))
+        records = data if isinstance(data, list) else [data]
+        for record in records:
+            self._decode_images(kind, record)
+            # Records of a shared file split its size, so sizes add up to the bytes read.
+            record['size'] = len(raw) // len(records)
+        return data
+
+    def version_name(self, unit: str) -> str:
+        """
+        Reads a student's version from the head of its file, where it sits
+        before the large base64 block. Falls back to parsing the whole file.
+        """
+        with open(unit, encoding='utf-8') as f:
+            match = self.VERSION_PATTERN.search(f.read(4096))
+        if match:
+            return json.loads(f'"{match.group(1)}"')
+        with open(unit) as f:
+            return json.load(f)['version']
+
+    @staticmethod
+    def _decode_images(kind: str, record: dict) -> None:
+        # Student images are nested under 'base64'; the others are top-level fields.
+        images = record.pop('base64', {}) if kind == 'students' else record
+        for field, key in IMAGE_FIELDS.get(kind, {}).items():
+            if field in images:
+                record[key] = Converter.base64_to_byte(images.pop(field))
+
+class PackedSeedSource:
+    """
+    Reads the seed data from the packed layout written by `pack_seed_data`:
+
+        index.json  Every record's fields, with images replaced by
+                    [offset, length] references and a SHA-256 per record.
+        blobs.bin   All image bytes back to back (identical images stored once).
+
+    The blob file is memory-mapped, so reading a name or a version never
+    touches image data and loading an image is a slice of the mapping.
+    A unit is '<kind>/<record key>'; the record digests from the index feed
+    the import manifest directly, so no file hashing is needed.
+    """
+    INDEX_NAME = 'index.json'
+    BLOB_NAME = 'blobs.bin'
+    FORMAT_VERSION = 1
+
+    def __init__(self, pack_dir: str):
+        self.pack_dir = pack_dir
+        with open(os.path.join(pack_dir, self.INDEX_NAME)) as f:
+            index = json.load(f)
+        if index.get('format') != self.FORMAT_VERSION:
+            raise ValueError(f"Unsupported seed pack format: {index.get('format')}")
+        self._records: Dict[str, dict] = {
+            f"{kind}/{record['key']}": record for kind in KINDS for record in index.get(kind, [])
+        }
+        self._mmap: Optional[mmap.mmap] = None
+
+    def __str__(self):
+        return f'seed pack in {self.pack_dir}'
+
+    def __getstate__(self):
+        # Worker processes map the blob file themselves.
+        state = self.__dict__.copy()
+        state['_mmap'] = None
+        return state
+
+    @classmethod
+    def exists(cls, pack_dir: str) -> bool:
+        return os.path.isfile(os.path.join(pack_dir, cls.INDEX_NAME))
+
+    def units(self, kind: str) -> List[str]:
+        return [unit for unit in self._records if unit.startswith(f'{kind}/')]
+
+    def changed(self, manifest: SourceManifest, kind: str) -> List[str]:
+        units = self.units(kind)
+        changed_keys = set(manifest.changed_digests({self._manifest_key(unit): self._records[unit]['sha256'] for unit in units}))
+        return [unit for unit in units if self._manifest_key(unit) in changed_keys]
+
+    def record(self, manifest: SourceManifest, units: List[str]) -> None:
+        manifest.record_digests({self._manifest_key(unit): self._records[unit]['sha256'] for unit in units})
+
+    def name(self, unit: str) -> str:
+        return unit
+
+    def load(self, unit: str):
+        record = self._records[unit]
+        if 'items' in record:
+            return [self._materialize(item) for item in record['items']]
+        return self._materialize(record['data'])
+
+    def version_name(self, unit: str) -> str:
+        return self._records[unit]['data']['version']
+
+    def _materialize(self, data: dict) -> dict:
+        record = {key: value for key, value in data.items() if key != 'blobs'}
+        record['size'] = 0
+        for key, (offset, length) in data.get('blobs', {}).items():
+            record[key] = self._blob(offset, length)
+            record['size'] += length
+        return record
+
+    def _blob(self, offset: int, length: int) -> bytes:
+        if self._mmap is None:
+            with open(os.path.join(self.pack_dir, self.BLOB_NAME), 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap[offset:offset + length]
+
+    @staticmethod
+    def _manifest_key(unit: str) -> str:
+        return f'pack:{unit}'
+
+    # ===================================================================
+    # --- CONVERTER ---
+    # ===================================================================
+    @classmethod
+    def convert(cls, source: JsonSeedSource, pack_dir: str) -> dict:
+        """
+        Writes every record of `source` into a new pack in `pack_dir`.
+        The old index is removed before the blob file is replaced and the new
+        index is written last, so a half-written pack is never picked up.
+        """
+        os.makedirs(pack_dir, exist_ok=True)
+        index = {'format': cls.FORMAT_VERSION}
+        offsets: Dict[str, List[int]] = {}
+        total_bytes = 0
+
+        blob_path = os.path.join(pack_dir, cls.BLOB_NAME)
+        with open(f'{blob_path}.tmp', 'wb') as blobs:
+            def store(data: bytes) -> List[int]:
+                nonlocal total_bytes
+                digest = hashlib.sha256(data).hexdigest()
+                if digest not in offsets:
+                    offsets[digest] = [total_bytes, len(data)]
+                    blobs.write(data)
+                    total_bytes += len(data)
+                return offsets[digest]
+
+            def pack_record(kind: str, record: dict):
+                record.pop('size', None)
+                packed = {'blobs': {}}
+                digest = hashlib.sha256()
+                for key, value in record.items():
+                    if key in IMAGE_FIELDS.get(kind, {}).values():
+                        if value:
+                            packed['blobs'][key] = store(value)
+                            digest.update(hashlib.sha256(value).digest())
+                    else:
+                        packed[key] = value
+                digest.update(json.dumps({k: v for k, v in packed.items() if k != 'blobs'}, sort_keys=True).encode())
+                return packed, digest.hexdigest()
+
+            for kind in KINDS:
+                entries = []
+                for unit in source.units(kind):
+                    data = source.load(unit)
+                    if isinstance(data, list):
+                        packed_items = [pack_record(kind, item) for item in data]
+                        entries.append({
+                            'key': kind,
+                            'sha256': hashlib.sha256(''.join(d for _, d in packed_items).encode()).hexdigest(),
+                            'items': [item for item, _ in packed_items],
+                        })
+                    else:
+                        packed, digest = pack_record(kind, data)
+                        entries.append({'key': os.path.splitext(os.path.basename(unit))[0], 'sha256': digest, 'data': packed})
+                index[kind] = entries
+
+        index_path = os.path.join(pack_dir, cls.INDEX_NAME)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        os.replace(f'{blob_path}.tmp', blob_path)
+        with open(f'{index_path}.tmp', 'w') as f:
+            json.dump(index, f, indent=1, ensure_ascii=False)
+        os.replace(f'{index_path}.tmp', index_path)
+        return {'records': sum(len(index[kind]) for kind in KINDS), 'blobs': len(offsets), 'bytes': total_bytes}
+
+def open_seed_source(source: str, root_dir: str, pack_dir: str):
+    """
+    Returns the JSON source, or the packed one for `source='pack'`. The pack is
+    never picked on its own: it does not notice edits to the JSON files.
+    """
+    if source == 'pack':
+        if not PackedSeedSource.exists(pack_dir):
+            raise FileNotFoundError(f'No seed pack in {pack_dir}')
+        return PackedSeedSource(pack_dir)
+    return JsonSeedSource(root_dir)
@@ -0,0 +1,227 @@
+import base64
+import datetime
+import decimal
+import gzip
+import json
+import os
+import uuid
+from typing import Callable, Dict, List, Optional
+from django.apps import apps
+from django.core.management.color import no_style
+from django.core.serializers import sort_dependencies
+from django.db import connection, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.utils import timezone
+
+class SnapshotError(Exception):
+    """Raised when an archive cannot be restored into the current database."""
+
+class Snapshot:
+    """
+    A compressed, versioned dump of every table in the database, catalog and
+    user data alike (GachaTransaction, UserInventory, UnlockAchievement, auth
+    users...), meant for cloning a production-sized dataset in seconds.
+
+    The archive is a gzip stream of JSON lines:
+
+        {"format": ..., "version": 1, "migrations": {...}}      header
+        {"model": "app_web.student", "columns": [...]}          one per table
+        [1, "Aru", 3, ...]                                      its rows
+        ...
+        {"end": true, "counts": {"app_web.student": 233, ...}}  trailer
+
+    Rows are read with chunked `iterator()` queries and written one line at a
+    time, so neither side ever holds a whole table in memory. Binary columns
+    are base64, the same encoding BinaryField.to_python() accepts.
+
+    Example:
+        ```python
+        Snapshot.export('prod.snapshot.gz')
+        Snapshot.restore('prod.snapshot.gz')
+        ```
+    """
+    FORMAT = 'gacha-snapshot'
+    FORMAT_VERSION = 1
+    CHUNK_SIZE = 2000
+    COMPRESS_LEVEL = 1 # Most of the bytes are already-compressed images.
+
+    # Sessions are per-browser state, not data worth cloning.
+    EXCLUDED_MODELS = {'sessions.session'}
+
+    # ===================================================================
+    # --- EXPORT ---
+    # ===================================================================
+    @classmethod
+    def export(cls, path: str, progress: Optional[Callable[[str, int], None]] = None) -> Dict[str, int]:
+        """Writes every model to `path`. Returns the row count per model."""
+        counts = {}
+        tmp_path = f'{path}.tmp'
+        # One transaction, so every table is read from the same snapshot where the database supports it.
+        with transaction.atomic(), gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=cls.COMPRESS_LEVEL) as f:
+            cls._write_line(f, {
+                'format': cls.FORMAT,
+                'version': cls.FORMAT_VERSION,
+                'created': timezone.now().isoformat(),
+                'migrations': cls._migration_state(),
+            })
+            for model in cls._models():
+                label = model._meta.label_lower
+                fields = model._meta.concrete_fields
+                cls._write_line(f, {'model': label, 'columns': [field.column for field in fields]})
+
+                rows = model._base_manager.order_by(model._meta.pk.attname).values_list(*[field.attname for field in fields])
+                count = 0
+                for row in rows.iterator(chunk_size=cls.CHUNK_SIZE):
+                    cls._write_line(f, row)
+                    count += 1
+                counts[label] = count
+                if progress:
+                    progress(label, count)
+            cls._write_line(f, {'end': True, 'counts': counts})
+        os.replace(tmp_path, path)
+        return counts
+
+    # ===================================================================
+    # --- RESTORE ---
+    # ===================================================================
+    @classmethod
+    def restore(cls, path: str, progress: Optional[Callable[[str, int], None]] = None) -> Dict[str, int]:
+        """
+        Replaces the contents of every table in the archive with its rows, in a
+        single transaction with constraint checks deferred until the load is done.
+        Returns the row count per model.
+        """
+        counts = {}
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            lines = (json.loads(line) for line in f)
+            header = next(lines, None)
+            cls._check_header(header)
+
+            with transaction.atomic():
+                with connection.constraint_checks_disabled():
+                    models = cls._models()
+                    tables = [model._meta.db_table for model in models]
+                    connection.ops.execute_sql_flush(
+                        connection.ops.sql_flush(no_style(), tables, reset_sequences=True, allow_cascade=False)
+                    )
+
+                    trailer, loader = None, None
+                    for item in lines:
+                        if isinstance(item, list):
+                            if loader is None:
+                                raise SnapshotError('The archive has rows before any table header.')
+                            loader.add(item)
+                            continue
+                        if loader:
+                            counts[loader.label] = loader.close()
+                            if progress:
+                                progress(loader.label, counts[loader.label])
+                        if 'end' in item:
+                            trailer = item
+                            break
+                        loader = _TableLoader(item['model'], item['columns'], cls.CHUNK_SIZE)
+
+                    if trailer is None or trailer['counts'] != counts:
+                        raise SnapshotError('The archive is truncated: its trailer is missing or does not match the rows read.')
+
+                    sequence_sql = connection.ops.sequence_reset_sql(no_style(), models)
+                    if sequence_sql:
+                        with connection.cursor() as cursor:
+                            for sql in sequence_sql:
+                                cursor.execute(sql)
+                connection.check_constraints(table_names=tables)
+        return counts
+
+    @classmethod
+    def _check_header(cls, header: Optional[dict]) -> None:
+        if not isinstance(header, dict) or header.get('format') != cls.FORMAT:
+            raise SnapshotError('Not a snapshot archive.')
+        if header.get('version') != cls.FORMAT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {header.get('version')} (expected {cls.FORMAT_VERSION}).")
+
+        current = cls._migration_state()
+        mismatched = sorted(app for app in set(header['migrations']) | set(current) if header['migrations'].get(app) != current.get(app))
+        if mismatched:
+            raise SnapshotError(
+                f"The archive was taken at different migrations for: {', '.join(mismatched)}. "
+                f"Migrate both databases to the same state first."
+            )
+
+    # ===================================================================
+    # --- HELPERS ---
+    # ===================================================================
+    @classmethod
+    def _models(cls) -> list:
+        """Every concrete model, parents before children, then the auto-created M2M tables."""
+        models = [
+            model for model in sort_dependencies([(app_config, None) for app_config in apps.get_app_configs()], allow_cycles=True)
+            if model._meta.label_lower not in cls.EXCLUDED_MODELS and not model._meta.proxy and model._meta.managed
+        ]
+        through_models = [
+            field.remote_field.through
+            for model in models for field in model._meta.local_many_to_many
+            if field.remote_field.through._meta.auto_created
+        ]
+        return models + through_models
+
+    @staticmethod
+    def _migration_state() -> Dict[str, List[str]]:
+        state: Dict[str, List[str]] = {}
+        for app_label, name in MigrationRecorder(connection).applied_migrations():
+            state.setdefault(app_label, []).append(name)
+        return {app_label: sorted(names) for app_label, names in sorted(state.items())}
+
+    @classmethod
+    def _write_line(cls, f, item) -> None:
+        f.write(json.dumps(item, default=cls._encode, ensure_ascii=False, separators=(',', ':')))
+        f.write('\n')
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return base64.b64encode(value).decode('ascii')
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, (decimal.Decimal, uuid.UUID)):
+            return str(value)
+        raise TypeError(f'Cannot serialize {type(value).__name__}')
+
+class _TableLoader:
+    """Bulk-loads one table's rows with executemany, skipping save(), signals and auto_now."""
+
+    def __init__(self, label: str, columns: List[str], chunk_size: int):
+        try:
+            model = apps.get_model(label)
+        except LookupError:
+            raise SnapshotError(f'The archive contains unknown model {label}.')
+        fields_by_column = {field.column: field for field in model._meta.concrete_fields}
+        missing = [column for column in columns if column not in fields_by_column]
+        if missing:
+            raise SnapshotError(f"{label}: unknown columns {', '.join(missing)}.")
+
+        quote = connection.ops.quote_name
+        self.label = label
+        self.fields = [fields_by_column[column] for column in columns]
+        self.sql = (
+            f'INSERT INTO {quote(model._meta.db_table)} ({", ".join(quote(column) for column in columns)}) '
+            f'VALUES ({", ".join(["%s"] * len(columns))})'
+        )
+        self.chunk_size = chunk_size
+        self.pending: List[list] = []
+        self.count = 0
+
+    def add(self, row: list) -> None:
+        self.pending.append([field.get_db_prep_save(field.to_python(value), connection) for field, value in zip(self.fields, row)])
+        if len(self.pending) >= self.chunk_size:
+            self._flush()
+
+    def close(self) -> int:
+        self._flush()
+        return self.count
+
+    def _flush(self) -> None:
+        if self.pending:
+            with connection.cursor() as cursor:
+                cursor.executemany(self.sql, self.pending)
+            self.count += len(self.pending)
+            self.pending = []
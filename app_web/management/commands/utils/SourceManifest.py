@@ -0,0 +1,121 @@
+import hashlib
+import os
+from typing import Dict, Iterable, List, Tuple
+from django.utils import timezone
+from app_web.models import ImportManifest
+
+class SourceManifest:
+    """
+    Tracks which seed data files have already been imported, so `unpack` only
+    processes files whose content changed since the last successful import.
+
+    A file counts as unchanged when its size and mtime match the manifest, or,
+    if those moved (a fresh checkout, a Docker COPY), when its SHA-256 still
+    matches. Files are recorded with `record()` inside the same transaction
+    that wrote their rows, so an interrupted import resumes where it stopped.
+
+    Example:
+        ```python
+        manifest = SourceManifest(root_dir)
+        changed = manifest.changed(json_files)
+        ...                                     # import `changed`
+        manifest.record(changed)
+        ```
+    """
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, root_dir: str, force: bool = False):
+        self.root_dir = root_dir
+        self.force = force
+        self._entries: Dict[str, ImportManifest] = {
+            entry.manifest_path: entry for entry in ImportManifest.objects.all()
+        }
+        # Stat and hash of files inspected by changed(), waiting for record().
+        self._pending: Dict[str, Tuple[int, int, str]] = {}
+
+    def changed(self, paths: Iterable[str]) -> List[str]:
+        """Returns the paths that are new or whose content differs from the manifest."""
+        paths = list(paths)
+        changed = []
+        for path in paths:
+            key = self._key(path)
+            stat = os.stat(path)
+            entry = self._entries.get(key)
+
+            if not self.force and entry and (entry.manifest_size, entry.manifest_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                continue
+
+            digest = self._sha256(path)
+            self._pending[key] = (stat.st_size, stat.st_mtime_ns, digest)
+            if self.force or not entry or entry.manifest_sha256 != digest:
+                changed.append(path)
+
+        # Files that were only touched are re-stamped right away so the next run takes the fast path.
+        changed_set = set(changed)
+        touched = [path for path in paths if self._key(path) in self._pending and path not in changed_set]
+        if touched:
+            self.record(touched)
+        return changed
+
+    def record(self, paths: Iterable[str]) -> None:
+        """Marks files as imported. Call inside the transaction that wrote their rows."""
+        keys = []
+        for path in paths:
+            key = self._key(path)
+            if key not in self._pending:
+                self._pending[key] = self._describe(path)
+            keys.append(key)
+        self._record_keys(keys)
+
+    def _record_keys(self, keys: List[str]) -> None:
+        now = timezone.now()
+        to_create, to_update = [], []
+        for key in keys:
+            size, mtime_ns, digest = self._pending.pop(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = ImportManifest(manifest_path=key)
+                to_create.append(entry)
+            else:
+                to_update.append(entry)
+            entry.manifest_size, entry.manifest_mtime_ns, entry.manifest_sha256 = size, mtime_ns, digest
+            entry.manifest_update_on = now
+            self._entries[key] = entry
+
+        if to_create:
+            ImportManifest.objects.bulk_create(to_create, batch_size=500)
+        if to_update:
+            ImportManifest.objects.bulk_update(
+                to_update, ['manifest_size', 'manifest_mtime_ns', 'manifest_sha256', 'manifest_update_on'], batch_size=500
+            )
+
+    def changed_digests(self, digests: Dict[str, str]) -> List[str]:
+        """
+        Same as changed(), for sources that carry their own content hashes
+        (the packed seed index): `digests` maps unit keys to SHA-256 digests.
+        """
+        return [
+            key for key, digest in digests.items()
+            if self.force or key not in self._entries or self._entries[key].manifest_sha256 != digest
+        ]
+
+    def record_digests(self, digests: Dict[str, str]) -> None:
+        """Marks units from a self-hashing source as imported."""
+        for key, digest in digests.items():
+            self._pending[key] = (0, 0, digest)
+        self._record_keys(list(digests))
+
+    def _key(self, path: str) -> str:
+        return os.path.relpath(path, self.root_dir).replace(os.sep, '/')
+
+    def _describe(self, path: str) -> Tuple[int, int, str]:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns, self._sha256(path)
+
+    @classmethod
+    def _sha256(cls, path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(cls.CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
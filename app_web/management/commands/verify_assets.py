@@ -0,0 +1,87 @@
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from app_web.models import ImageAsset
+from app_web.util.ImageOptimizer import ImageOptimizer
+
+CHUNK_SIZE = 50
+BLOB_FIELDS = ['asset_portrait_data', 'asset_artwork_data', 'asset_portrait_webp', 'asset_artwork_webp']
+
+def _check_asset(row):
+    """Re-hashes one asset's images. Returns (asset_id, stored hashes, actual hashes, blob bytes)."""
+    asset_id, pair_hash, portrait_hash, artwork_hash, portrait, artwork, portrait_webp, artwork_webp = row
+    actual_portrait, actual_artwork = ImageAsset.hash_image(portrait), ImageAsset.hash_image(artwork)
+    actual = (ImageAsset.combine_hashes(actual_portrait, actual_artwork), actual_portrait, actual_artwork)
+    size = sum(len(blob) for blob in (portrait, artwork, portrait_webp, artwork_webp) if blob)
+    return asset_id, (pair_hash, portrait_hash, artwork_hash), actual, size, (len(portrait or b''), len(artwork or b''))
+
+class Command(BaseCommand):
+    """
+    Re-hashes every ImageAsset in parallel and reports how well images are
+    deduplicated: bytes reclaimed by students sharing an asset, identical
+    images still stored in more than one asset, stale hashes and assets that
+    no student uses. With --fix, stale hashes are rewritten and unused assets
+    deleted.
+    """
+    help = 'Verify image asset hashes and report duplicate bytes reclaimed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rewrite stale hashes and delete assets no student uses.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('Verifying image assets...'))
+        start = time.perf_counter()
+
+        users = dict(ImageAsset.objects.annotate(users=Count('student')).values_list('asset_id', 'users'))
+        rows = ImageAsset.objects.values_list(
+            'asset_id', 'asset_pair_hash', 'asset_portrait_hash', 'asset_artwork_hash', *BLOB_FIELDS
+        ).iterator(chunk_size=CHUNK_SIZE)
+
+        # hashlib releases the GIL on large buffers, so threads hash in parallel.
+        stale, sizes, image_sizes, stored_by_hash = [], {}, {}, defaultdict(list)
+        with ThreadPoolExecutor(max_workers=ImageOptimizer.WORKERS) as executor:
+            # One chunk of rows in flight at a time, so the blobs are never all in memory.
+            results = (result for chunk in iter(lambda: list(islice(rows, CHUNK_SIZE)), []) for result in executor.map(_check_asset, chunk))
+            for asset_id, stored, actual, size, (portrait_size, artwork_size) in results:
+                sizes[asset_id] = size
+                if stored != actual:
+                    stale.append((asset_id, actual))
+                for image_hash, image_size in ((actual[1], portrait_size), (actual[2], artwork_size)):
+                    if image_hash:
+                        stored_by_hash[image_hash].append(asset_id)
+                        image_sizes[image_hash] = image_size
+
+        orphans = [asset_id for asset_id, count in users.items() if count == 0]
+        shared = {asset_id: count for asset_id, count in users.items() if count > 1}
+        reclaimed = sum(sizes[asset_id] * (count - 1) for asset_id, count in shared.items())
+        duplicates = {image_hash: asset_ids for image_hash, asset_ids in stored_by_hash.items() if len(set(asset_ids)) > 1}
+        duplicate_bytes = sum(image_sizes[image_hash] * (len(set(asset_ids)) - 1) for image_hash, asset_ids in duplicates.items())
+
+        self.stdout.write(f'Assets checked:             {len(sizes)} ({sum(sizes.values()) / 1024 / 1024:.1f} MB)')
+        self.stdout.write(f'Students per asset:         {dict(sorted(Counter(users.values()).items()))}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Shared assets:              {len(shared)}, reclaiming {reclaimed / 1024 / 1024:.1f} MB of duplicate images'
+        ))
+        self.stdout.write(
+            f'Duplicate images:           {len(duplicates)} ({duplicate_bytes / 1024 / 1024:.1f} MB, deduplicated in the image pack)'
+        )
+        self.stdout.write((self.style.WARNING if stale else self.style.SUCCESS)(f'Stale hashes:               {len(stale)}'))
+        self.stdout.write((self.style.WARNING if orphans else self.style.SUCCESS)(f'Assets without students:    {len(orphans)}'))
+
+        if options['fix'] and (stale or orphans):
+            with transaction.atomic():
+                fixed = []
+                for asset_id, (pair_hash, portrait_hash, artwork_hash) in stale:
+                    fixed.append(ImageAsset(
+                        asset_id=asset_id, asset_pair_hash=pair_hash,
+                        asset_portrait_hash=portrait_hash, asset_artwork_hash=artwork_hash,
+                    ))
+                ImageAsset.objects.bulk_update(fixed, ['asset_pair_hash', 'asset_portrait_hash', 'asset_artwork_hash'])
+                ImageAsset.objects.filter(asset_id__in=orphans, student__isnull=True).delete()
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(stale)} stale hashes and deleted {len(orphans)} unused assets.'))
+
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - start:.2f}s'))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_web', '0002_alter_achievement_achievement_category_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageasset',
+            name='asset_artwork_placeholder',
+            field=models.TextField(blank=True, default='', verbose_name='Artwork placeholder'),
+        ),
+        migrations.AddField(
+            model_name='imageasset',
+            name='asset_artwork_webp',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Artwork (WebP)'),
+        ),
+        migrations.AddField(
+            model_name='imageasset',
+            name='asset_portrait_placeholder',
+            field=models.TextField(blank=True, default='', verbose_name='Portrait placeholder'),
+        ),
+        migrations.AddField(
+            model_name='imageasset',
+            name='asset_portrait_webp',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Portrait (WebP)'),
+        ),
+    ]
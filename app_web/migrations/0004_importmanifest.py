@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_web', '0003_imageasset_optimized_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportManifest',
+            fields=[
+                ('manifest_id', models.AutoField(auto_created=True, editable=False, primary_key=True, serialize=False, verbose_name='ID')),
+                ('manifest_path', models.CharField(max_length=255, unique=True, verbose_name='Path')),
+                ('manifest_size', models.BigIntegerField(verbose_name='Size')),
+                ('manifest_mtime_ns', models.BigIntegerField(verbose_name='Modified (ns)')),
+                ('manifest_sha256', models.CharField(max_length=64, verbose_name='SHA-256')),
+                ('manifest_update_on', models.DateTimeField(auto_now=True, verbose_name='Imported On')),
+            ],
+            options={
+                'db_table': 'import_manifest_table',
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:13
+
+import django.db.models.deletion
+import hashlib
+from django.db import migrations, models
+
+
+def fill_image_hashes(apps, schema_editor):
+    ImageAsset = apps.get_model('app_web', 'ImageAsset')
+    batch = []
+    for asset in ImageAsset.objects.only('asset_id', 'asset_portrait_data', 'asset_artwork_data').iterator(chunk_size=50):
+        asset.asset_portrait_hash = hashlib.sha256(asset.asset_portrait_data).hexdigest() if asset.asset_portrait_data else ''
+        asset.asset_artwork_hash = hashlib.sha256(asset.asset_artwork_data).hexdigest() if asset.asset_artwork_data else ''
+        batch.append(asset)
+        if len(batch) >= 500:
+            ImageAsset.objects.bulk_update(batch, ['asset_portrait_hash', 'asset_artwork_hash'])
+            batch = []
+    ImageAsset.objects.bulk_update(batch, ['asset_portrait_hash', 'asset_artwork_hash'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_web', '0004_importmanifest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageasset',
+            name='asset_artwork_hash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='imageasset',
+            name='asset_portrait_hash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='student',
+            name='asset_id',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='app_web.imageasset'),
+        ),
+        migrations.RunPython(fill_image_hashes, migrations.RunPython.noop),
+    ]
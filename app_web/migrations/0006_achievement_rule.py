@@ -0,0 +1,31 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def reimport_achievements(apps, schema_editor):
+    # Rules come from the seed data, so make the next `unpack` re-read every achievement.
+    ImportManifest = apps.get_model('app_web', 'ImportManifest')
+    ImportManifest.objects.filter(manifest_path__startswith='achievements/').delete()
+    ImportManifest.objects.filter(manifest_path__startswith='pack:achievements/').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_web', '0005_imageasset_image_hashes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='achievement',
+            name='achievement_rule',
+            field=models.JSONField(blank=True, null=True, verbose_name='Rule'),
+        ),
+        migrations.AddField(
+            model_name='achievement',
+            name='achievement_update_on',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Update On'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(reimport_achievements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_web', '0006_achievement_rule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionProgress',
+            fields=[
+                ('progress_id', models.AutoField(auto_created=True, editable=False, primary_key=True, serialize=False, verbose_name='ID')),
+                ('progress_owned', models.PositiveIntegerField(default=0, verbose_name='Owned')),
+                ('progress_signature', models.CharField(max_length=16, verbose_name='Signature')),
+                ('achievement_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_web.achievement', verbose_name='Achievement')),
+                ('progress_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='collection_progress', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'db_table': 'collection_progress_table',
+                'unique_together': {('progress_user', 'achievement_id')},
+            },
+        ),
+    ]
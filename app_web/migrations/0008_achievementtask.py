@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_web', '0007_collectionprogress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AchievementTask',
+            fields=[
+                ('task_id', models.BigAutoField(auto_created=True, editable=False, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_pulled', models.JSONField(verbose_name='Pulled Students')),
+                ('task_new_students', models.JSONField(verbose_name='New Students')),
+                ('task_created_on', models.DateTimeField(auto_now_add=True, verbose_name='Created On')),
+                ('task_claimed_by', models.CharField(blank=True, default='', max_length=32, verbose_name='Claimed By')),
+                ('task_claimed_on', models.DateTimeField(blank=True, null=True, verbose_name='Claimed On')),
+                ('task_attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('task_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='achievement_tasks', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'db_table': 'achievement_task_table',
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# The rules that used to be hard-coded in AchievementEngine, as the seed data now declares them.
+BUILTIN_RULES = {
+    'LUCK_DOUBLE_R3': {'kind': 'batch', 'rarity': 3, 'at_least': 2},
+    'LUCK_TRIPLE_R3': {'kind': 'batch', 'rarity': 3, 'at_least': 3},
+    'MILESTONE_PULLS_10': {'kind': 'counter', 'counter': 'pulls', 'at_least': 10},
+    'MILESTONE_PULLS_1000': {'kind': 'counter', 'counter': 'pulls', 'at_least': 1000},
+}
+
+
+def declare_builtin_rules(apps, schema_editor):
+    # Keeps these achievements working before the next `unpack` re-imports them.
+    Achievement = apps.get_model('app_web', 'Achievement')
+    for achievement in Achievement.objects.filter(achievement_key__in=BUILTIN_RULES):
+        if not (achievement.achievement_rule or {}).get('kind'):
+            achievement.achievement_rule = BUILTIN_RULES[achievement.achievement_key]
+            achievement.save(update_fields=['achievement_rule', 'achievement_update_on'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_web', '0008_achievementtask'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AchievementRollup',
+            fields=[
+                ('rollup_id', models.AutoField(auto_created=True, editable=False, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rollup_counters', models.JSONField(default=dict, verbose_name='Counters')),
+                ('rollup_last_transaction', models.BigIntegerField(default=0, verbose_name='Last Transaction')),
+                ('rollup_update_on', models.DateTimeField(auto_now=True, verbose_name='Update On')),
+                ('rollup_user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='achievement_rollup', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'db_table': 'achievement_rollup_table',
+            },
+        ),
+        migrations.RunPython(declare_builtin_rules, migrations.RunPython.noop),
+    ]
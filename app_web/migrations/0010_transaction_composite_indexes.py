@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_web', '0009_achievementrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='achievementtask',
+            index=models.Index(condition=models.Q(('task_attempts__lt', 5)), fields=['task_id'], name='achievement_task_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gachatransaction',
+            index=models.Index(fields=['transaction_user', 'transaction_create_on', 'transaction_id'], name='gacha_tx_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gachatransaction',
+            index=models.Index(fields=['transaction_user', 'transaction_id', 'banner_id', 'student_id'], name='gacha_tx_user_rollup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gachatransaction',
+            index=models.Index(fields=['transaction_user', 'student_id', 'transaction_create_on'], name='gacha_tx_user_student_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='gachatransaction',
+            name='gacha_trans_transac_69fcd8_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='gachatransaction',
+            name='gacha_trans_banner__04f0be_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='gachatransaction',
+            name='gacha_trans_student_cd1c73_idx',
+        ),
+        migrations.AlterField(
+            model_name='gachatransaction',
+            name='transaction_user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+    ]
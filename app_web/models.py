@@ -53,21 +53,49 @@ class ImageAsset(models.Model):
     asset_artwork_data = models.BinaryField(null=True, blank=True, verbose_name='Artwork')
     asset_pair_hash = models.CharField(max_length=64, unique=True, editable=False)
 
-    def save(self, *args, **kwargs):
+    # SHA-256 of each image, so identical images can be found without reading the blobs.
+    asset_portrait_hash = models.CharField(max_length=64, blank=True, default='', db_index=True, editable=False)
+    asset_artwork_hash = models.CharField(max_length=64, blank=True, default='', db_index=True, editable=False)
+
+    # Derived at import time by ImageOptimizer: lossy WebP variants and tiny data-URI previews.
+    asset_portrait_webp = models.BinaryField(null=True, blank=True, verbose_name='Portrait (WebP)')
+    asset_artwork_webp = models.BinaryField(null=True, blank=True, verbose_name='Artwork (WebP)')
+    asset_portrait_placeholder = models.TextField(blank=True, default='', verbose_name='Portrait placeholder')
+    asset_artwork_placeholder = models.TextField(blank=True, default='', verbose_name='Artwork placeholder')
+
+    @staticmethod
+    def hash_image(image_data) -> str:
+        return hashlib.sha256(image_data).hexdigest() if image_data else ''
+
+    @staticmethod
+    def combine_hashes(portrait_hash: str, artwork_hash: str) -> str:
         # Create a unique "fingerprint" for the pair of images by
         # combining their individual hashes and then hashing that result.
-        
-        # Calculate portrait hash (or use a fixed string if null)
-        p_hash = hashlib.sha256(self.asset_portrait_data).hexdigest() if self.asset_portrait_data else "no-portrait"
-        
-        # Calculate full-body hash (or use a fixed string if null)
-        f_hash = hashlib.sha256(self.asset_artwork_data).hexdigest() if self.asset_artwork_data else "no-fullbody"
-        
-        # Combine the two hashes in a deterministic way and create the final hash
-        combined_hash_string = f"{p_hash}-{f_hash}"
-        self.asset_pair_hash = hashlib.sha256(combined_hash_string.encode()).hexdigest()
-        
+        # Missing images use a fixed string instead.
+        combined_hash_string = f"{portrait_hash or 'no-portrait'}-{artwork_hash or 'no-fullbody'}"
+        return hashlib.sha256(combined_hash_string.encode()).hexdigest()
+
+    @classmethod
+    def compute_pair_hash(cls, portrait_data, artwork_data) -> str:
+        return cls.combine_hashes(cls.hash_image(portrait_data), cls.hash_image(artwork_data))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded images, so save() only hashes the ones that were replaced.
+        instance._loaded_images = (instance.__dict__.get('asset_portrait_data'), instance.__dict__.get('asset_artwork_data'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        # bulk_create() skips save(), so bulk importers compute the hashes themselves.
+        loaded_portrait, loaded_artwork = getattr(self, '_loaded_images', (None, None))
+        if self.asset_portrait_data is not loaded_portrait or not self.asset_portrait_hash:
+            self.asset_portrait_hash = self.hash_image(self.asset_portrait_data)
+        if self.asset_artwork_data is not loaded_artwork or not self.asset_artwork_hash:
+            self.asset_artwork_hash = self.hash_image(self.asset_artwork_data)
+        self.asset_pair_hash = self.combine_hashes(self.asset_portrait_hash, self.asset_artwork_hash)
         super().save(*args, **kwargs)
+        self._loaded_images = (self.asset_portrait_data, self.asset_artwork_data)
     
     @property
     def id(self) -> int:
@@ -90,7 +118,8 @@ class Student(models.Model):
     version_id = models.ForeignKey(Version, on_delete=models.CASCADE)
     student_rarity = models.PositiveIntegerField(choices=[(1, '★'), (2, '★★'), (3, '★★★')])
     school_id = models.ForeignKey(School, on_delete=models.CASCADE)
-    asset_id = models.OneToOneField(ImageAsset, null=True, blank=True, on_delete=models.PROTECT)
+    # Students whose images are identical share one asset.
+    asset_id = models.ForeignKey(ImageAsset, null=True, blank=True, on_delete=models.PROTECT)
     student_is_limited = models.BooleanField(default=False)
 
     def __str__(self) -> str:
@@ -343,7 +372,8 @@ class GachaBanner(models.Model):
 
 class GachaTransaction(models.Model):
     transaction_id = models.AutoField(primary_key=True, auto_created=True, editable=False, verbose_name='ID')
-    transaction_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, verbose_name='User')
+    # No index of its own: the composite indexes below all lead with the user.
+    transaction_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, db_index=False, verbose_name='User')
     banner_id = models.ForeignKey(GachaBanner, on_delete=models.PROTECT, verbose_name='Banner')
     student_id = models.ForeignKey(Student, on_delete=models.PROTECT, verbose_name='Student')
     transaction_create_on = models.DateTimeField(auto_now_add=True, editable=False, verbose_name='Create On')
@@ -366,11 +396,14 @@ class GachaTransaction(models.Model):
     class Meta:
         db_table = 'gacha_transaction_table'
 
-        # Define indexes.
+        # Define indexes. The banner and student foreign keys have their own. Every hot query is per user:
+        # - history pages and the dashboard's pull data, in time order (the id breaks ties);
+        # - the achievement rollup, in id order, with the banner and student it reads (covering);
+        # - the podiums, grouped by student with their first pull time (covering).
         indexes = [
-            models.Index(fields=['transaction_user']),
-            models.Index(fields=['banner_id']),
-            models.Index(fields=['student_id']),
+            models.Index(fields=['transaction_user', 'transaction_create_on', 'transaction_id'], name='gacha_tx_user_created_idx'),
+            models.Index(fields=['transaction_user', 'transaction_id', 'banner_id', 'student_id'], name='gacha_tx_user_rollup_idx'),
+            models.Index(fields=['transaction_user', 'student_id', 'transaction_create_on'], name='gacha_tx_user_student_idx'),
         ]
 
         # It's good practice to set a more readable name for the admin.
@@ -425,6 +458,12 @@ class Achievement(models.Model):
     # A hidden field to link this achievement to the logic that unlocks it.
     achievement_key = models.CharField(max_length=50, unique=True, editable=False, verbose_name='Key')
 
+    # Unlock condition, imported by `unpack` and compiled by AchievementRules. Collections:
+    # {"students": [{"name": ..., "version": ...}, ...]}; pull batches, counters and streaks:
+    # {"kind": "batch" | "counter" | "streak", ..., "at_least": N}.
+    achievement_rule = models.JSONField(null=True, blank=True, verbose_name='Rule')
+    achievement_update_on = models.DateTimeField(auto_now=True, verbose_name='Update On')
+
     def __str__(self):
         return self.achievement_name
     
@@ -455,3 +494,76 @@ class UnlockAchievement(models.Model):
 
     def __str__(self):
         return f'{self.unlock_user.username} unlocked "{self.achievement_id.name}"'
+
+class CollectionProgress(models.Model):
+    """How many students of a collection achievement a user owns, updated on each pull by AchievementEngine."""
+    progress_id = models.AutoField(primary_key=True, auto_created=True, editable=False, verbose_name='ID')
+    progress_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='collection_progress', verbose_name='User')
+    achievement_id = models.ForeignKey(Achievement, on_delete=models.CASCADE, verbose_name='Achievement')
+    progress_owned = models.PositiveIntegerField(default=0, verbose_name='Owned')
+    # Signature of the student set the count was made for; a changed rule makes the row stale.
+    progress_signature = models.CharField(max_length=16, verbose_name='Signature')
+
+    class Meta:
+        db_table = 'collection_progress_table'
+        unique_together = ('progress_user', 'achievement_id')
+
+class AchievementRollup(models.Model):
+    """
+    Running totals of a user's pulls that achievement rules are checked against:
+    pulls overall, per rarity and per banner, and rarity streaks. Folded forward
+    from the transactions after `rollup_last_transaction` on each evaluation.
+    """
+    rollup_id = models.AutoField(primary_key=True, auto_created=True, editable=False, verbose_name='ID')
+    rollup_user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='achievement_rollup', verbose_name='User')
+    rollup_counters = models.JSONField(default=dict, verbose_name='Counters')
+    rollup_last_transaction = models.BigIntegerField(default=0, verbose_name='Last Transaction')
+    rollup_update_on = models.DateTimeField(auto_now=True, verbose_name='Update On')
+
+    class Meta:
+        db_table = 'achievement_rollup_table'
+
+    def __str__(self):
+        return f'Rollup of user {self.rollup_user_id} up to transaction {self.rollup_last_transaction}'
+
+TASK_MAX_ATTEMPTS = 5 # a task that failed this often is kept for inspection, but no longer claimed
+
+class AchievementTask(models.Model):
+    """
+    A pull whose achievements are still to be evaluated, queued by the pull view
+    when ACHIEVEMENTS_ASYNC is on and processed by `process_achievements`.
+    """
+    task_id = models.BigAutoField(primary_key=True, auto_created=True, editable=False, verbose_name='ID')
+    task_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='achievement_tasks', verbose_name='User')
+    task_pulled = models.JSONField(verbose_name='Pulled Students')          # student ids, in pull order
+    task_new_students = models.JSONField(verbose_name='New Students')       # ids the user did not own before the pull
+    task_created_on = models.DateTimeField(auto_now_add=True, verbose_name='Created On')
+    # Set when a worker takes the task; a claim older than the worker's timeout is taken over.
+    task_claimed_by = models.CharField(max_length=32, blank=True, default='', verbose_name='Claimed By')
+    task_claimed_on = models.DateTimeField(null=True, blank=True, verbose_name='Claimed On')
+    task_attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')
+
+    class Meta:
+        db_table = 'achievement_task_table'
+        # Workers claim the oldest live tasks; failed-out tasks pile up at the front and stay out of it.
+        indexes = [
+            models.Index(fields=['task_id'], condition=models.Q(task_attempts__lt=TASK_MAX_ATTEMPTS), name='achievement_task_live_idx'),
+        ]
+
+    def __str__(self):
+        return f'Achievements of {len(self.task_pulled)} pulls for user {self.task_user_id}'
+
+class ImportManifest(models.Model):
+    """One row per seed data file imported by `unpack`, used to skip unchanged files."""
+    manifest_id = models.AutoField(primary_key=True, auto_created=True, editable=False, verbose_name='ID')
+    manifest_path = models.CharField(max_length=255, unique=True, verbose_name='Path')
+    manifest_size = models.BigIntegerField(verbose_name='Size')
+    manifest_mtime_ns = models.BigIntegerField(verbose_name='Modified (ns)')
+    manifest_sha256 = models.CharField(max_length=64, verbose_name='SHA-256')
+    manifest_update_on = models.DateTimeField(auto_now=True, verbose_name='Imported On')
+
+    class Meta:
+        db_table = 'import_manifest_table'
+
+    def __str__(self):
+        return self.manifest_path
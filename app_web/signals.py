@@ -3,8 +3,10 @@ from django.db import transaction
 from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
-from .models import Student, Version, ImageAsset, GachaBanner, UserInventory
-from .util.AchievementEngine import AchievementEngine
+from .models import Student, Version, School, ImageAsset, GachaBanner, Achievement, UserInventory, UnlockAchievement
+from .util.AchievementEngine import AchievementCatalog, AchievementEngine, AchievementRules
+from .util.ImagePack import ImagePack
+from .util.SpriteAtlas import SpriteAtlas
 
 @receiver(post_delete, sender=Student)
 def delete_asset_after_student(sender, instance:Student, using, **kwargs):
@@ -13,11 +15,61 @@ def delete_asset_after_student(sender, instance:Student, using, **kwargs):
         return
 
     def _cleanup():
-        # With OneToOne, there can't be another Student on this ImageAsset.
-        ImageAsset.objects.using(using).filter(asset_id=asset_id.id).delete()
+        # Students with identical images share an asset; keep it while any of them remain.
+        ImageAsset.objects.using(using).filter(asset_id=asset_id.id, student__isnull=True).delete()
 
     transaction.on_commit(_cleanup)
 
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=ImageAsset)
+def rebuild_sprite_atlas(sender, **kwargs):
+    """
+    Keeps the portrait sprite sheets in sync with the catalog. The rebuild is
+    debounced and runs after commit, so bulk edits trigger it only once, and
+    it is a no-op when nothing that affects the sheets has changed.
+    """
+    transaction.on_commit(SpriteAtlas.schedule_rebuild)
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=ImageAsset)
+@receiver(post_save, sender=School)
+@receiver(post_delete, sender=School)
+@receiver(post_save, sender=GachaBanner)
+@receiver(post_delete, sender=GachaBanner)
+@receiver(post_save, sender=Achievement)
+@receiver(post_delete, sender=Achievement)
+def rebuild_image_pack(sender, **kwargs):
+    """
+    Rewrites the shared image pack after any image-bearing row changes, so
+    workers stop serving the old bytes once they remap the new file.
+    """
+    transaction.on_commit(ImagePack.schedule_rebuild)
+
+@receiver(post_save, sender=Achievement)
+@receiver(post_delete, sender=Achievement)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=GachaBanner)
+@receiver(post_delete, sender=GachaBanner)
+def invalidate_achievement_rules(sender, **kwargs):
+    """Makes this process recompile the achievement rules; other workers notice within AchievementRules.CHECK_INTERVAL."""
+    transaction.on_commit(AchievementRules.invalidate)
+
+@receiver(post_save, sender=Achievement)
+@receiver(post_delete, sender=Achievement)
+def invalidate_achievement_catalog(sender, **kwargs):
+    """Makes this process reload the achievement catalog; other workers notice within AchievementCatalog.CHECK_INTERVAL."""
+    transaction.on_commit(AchievementCatalog.invalidate)
+
+@receiver(post_save, sender=UnlockAchievement)
+@receiver(post_delete, sender=UnlockAchievement)
+def invalidate_unlocked_achievements(sender, instance:UnlockAchievement, **kwargs):
+    """Drops the user's cached unlocked set after an unlock is edited outside of a pull (e.g. in the admin)."""
+    user_id = instance.unlock_user_id
+    transaction.on_commit(lambda: AchievementEngine.UNLOCKED_CACHE.delete(user_id))
+
 @receiver(pre_delete, sender=Student)
 def remove_student_from_all_banners(sender, instance:Student, **kwargs):
     """
@@ -0,0 +1,22 @@
+from django import template
+
+from ..util.SpriteAtlas import SpriteAtlas
+
+register = template.Library()
+
+@register.simple_tag
+def student_sprite(student, kind):
+    """
+    Looks up a student's portrait in the sprite atlas.
+
+    Usage:
+        {% load atlas %}
+        {% student_sprite student 'rarity' as sprite %}
+        {% if sprite %}<div style="{{ sprite.style }}"></div>{% endif %}
+
+    Returns None when the atlas has not been built or does not contain the
+    student yet, so templates can fall back to `serve_student_image`.
+    """
+    if not kind:
+        return None
+    return SpriteAtlas.sprite(student.student_id, kind)
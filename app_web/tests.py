@@ -1,3 +1,1163 @@
-from django.test import TestCase
+"""
+Query-count, query-plan and latency regression tests for the views.
 
-# Create your tests here.
+The catalog is the real seed data, imported with `unpack` (with image
+encoding and the sprite atlas skipped, to keep the import fast). One user has
+a pull history of BENCHMARK_PULLS pulls (default 10,000). Other sizes:
+
+    python manage.py test app_web                           # 10k pulls, no latency tests
+    BENCHMARK=1 python manage.py test app_web               # with the latency tests
+    BENCHMARK=1 BENCHMARK_PULLS=1000000 python manage.py test app_web   # 1M pulls
+    BENCHMARK_RECORD=1 python manage.py test app_web        # rewrite the latency baselines
+
+- Query counts are exact, so a new query in a view (an N+1, a lost
+  select_related) fails the test. When a change legitimately adds or removes
+  queries, update the expected count.
+- Latencies are the median of LATENCY_RUNS runs, compared to the baseline in
+  test_baselines.json for the same pull count. A test fails when it is slower
+  than BENCHMARK_TOLERANCE times the baseline (default 3) plus LATENCY_SLACK.
+  Tests without a baseline only report their timing. Wall time depends on the
+  machine, so these only run with BENCHMARK=1 (or BENCHMARK_RECORD=1).
+- Query plans of the hot paths may not read a per-user table in full, so a
+  query that stops matching an index fails (see QueryPlanTests).
+"""
+import contextlib
+import gzip
+import io
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from unittest import mock, skipUnless
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .management.commands import unpack
+from .management.commands.utils.SeedSource import KINDS, JsonSeedSource, PackedSeedSource, open_seed_source
+from .management.commands.utils.Snapshot import Snapshot
+from .management.commands.utils.SourceManifest import SourceManifest
+from .models import (
+    TASK_MAX_ATTEMPTS, Achievement, AchievementRollup, AchievementTask, CollectionProgress, GachaBanner, GachaTransaction,
+    GachaPreset, ImageAsset, ImportManifest, School, Student, UnlockAchievement, UserInventory, Version,
+)
+from .util.AchievementEngine import AchievementCatalog, AchievementEngine, AchievementRules, Rollup
+from .util.AchievementQueue import AchievementQueue
+from .util.BackgroundTask import debounce
+from .util.Cache import CacheNamespace, ModelCodec
+from .util.GachaEngine import GachaEngine
+from .util.ImageOptimizer import ImageOptimizer, OptimizedImage
+from .util.ImagePack import ImagePack
+from .util.Metrics import REGISTRY, MetricsRegistry
+from .util.Profiler import RequestProfile
+from .util.SQLiteCache import SQLiteCache
+from .util.SpriteAtlas import SpriteAtlas
+
+BENCHMARK_PULLS = int(os.environ.get('BENCHMARK_PULLS', '10000'))
+BENCHMARK_TOLERANCE = float(os.environ.get('BENCHMARK_TOLERANCE', '3'))
+BENCHMARK_RECORD = os.environ.get('BENCHMARK_RECORD', '0') == '1'
+BENCHMARK = os.environ.get('BENCHMARK', '0') == '1' or BENCHMARK_RECORD
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'test_baselines.json')
+LATENCY_RUNS = 5
+LATENCY_SLACK = 0.005 # seconds, so sub-millisecond baselines don't fail on noise
+INSERT_BATCH_SIZE = 5000
+
+def _fast_optimize(cls, image_bytes, lossy=False):
+    # The original bytes, without the WebP and placeholder encoding that makes up most of a full import.
+    return OptimizedImage(image_bytes, None, '') if image_bytes else None
+
+class SeededDataMixin:
+    """
+    Imports the seed catalog once per test class into temporary pack and
+    atlas locations, and gives `cls.user` a history of BENCHMARK_PULLS pulls
+    with its inventory, rollup and achievements in place.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp(prefix='app_web_tests_')
+        cls.patches = [
+            mock.patch.object(ImageOptimizer, 'optimize', classmethod(_fast_optimize)),
+            mock.patch.object(unpack.Command, 'build_sprite_atlas', lambda self: None),
+            mock.patch.object(ImagePack, 'PACK_PATH', os.path.join(cls.temp_dir, 'images.pack')),
+            mock.patch.object(SpriteAtlas, 'ATLAS_DIR', os.path.join(cls.temp_dir, 'atlas')),
+            mock.patch.object(REGISTRY, '_directory', os.path.join(cls.temp_dir, 'metrics')),
+        ]
+        for patch in cls.patches:
+            patch.start()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for patch in reversed(cls.patches):
+            patch.stop()
+        ImagePack._default_checked_at = 0.0
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('unpack', summary='', stdout=open(os.devnull, 'w'), stderr=open(os.devnull, 'w'))
+        ImagePack._default_checked_at = 0.0
+
+        cls.banner = GachaBanner.objects.order_by('banner_id').first()
+        cls.school = School.objects.order_by('school_id').first()
+        cls.student = Student.objects.filter(asset_id__isnull=False).order_by('student_id').first()
+        cls.achievement = Achievement.objects.order_by('achievement_id').first()
+        cls.user = User.objects.create_user('veteran', password='benchmark')
+        cls.seed_pulls(cls.user, cls.banner, BENCHMARK_PULLS)
+
+    @staticmethod
+    def seed_pulls(user, banner, count):
+        """Draws `count` pulls with the real engine and writes them like the pull view would, in bulk."""
+        engine = GachaEngine(banner)
+        pulled = []
+        for _ in range(count // 10):
+            pulled.extend(engine.draw_10())
+        pulled.extend(engine.draw_1()[0] for _ in range(count % 10))
+
+        GachaTransaction.objects.bulk_create(
+            (GachaTransaction(transaction_user=user, banner_id=banner, student_id=student) for student in pulled),
+            batch_size=INSERT_BATCH_SIZE,
+        )
+        obtained = Counter(student.student_id for student in pulled)
+        UserInventory.objects.bulk_create(
+            [UserInventory(inventory_user=user, student_id_id=student_id, inventory_num_obtained=num) for student_id, num in obtained.items()]
+        )
+        # Builds the rollup from the whole history, then unlocks what it earned.
+        AchievementEngine(user).evaluate([], obtained.keys())
+
+    def setUp(self):
+        # Every test starts cold, with the per-process achievement caches warm like a running worker's.
+        cache.clear()
+        AchievementCatalog.get()
+        AchievementRules.get()
+        self.client.force_login(self.user)
+
+# --- =============================================================== ---
+# --- QUERY COUNTS                                                    ---
+# --- =============================================================== ---
+
+class QueryCountTests(SeededDataMixin, TestCase):
+    """Exact query counts per endpoint, on a cold cache. Logged-in requests include the session and user lookups."""
+
+    def assertQueryCount(self, method, url, expected, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400, f'{method.upper()} {url} returned {response.status_code}')
+        if hasattr(response, 'streaming_content'):
+            b''.join(response.streaming_content)
+        self.assertEqual(
+            len(queries), expected,
+            f'{method.upper()} {url} ran {len(queries)} queries, expected {expected}:\n' +
+            '\n'.join(f"  {query['sql']}" for query in queries.captured_queries),
+        )
+        return response
+
+    def test_pages(self):
+        for url, expected in [
+            (reverse('home'), 2),
+            (reverse('student'), 3),
+            (reverse('gacha'), 3),
+            (reverse('banner_details', args=[self.banner.banner_id]), 6),
+            (reverse('student_card', args=[self.student.student_id]), 5),
+            (reverse('dashboard'), 2),
+            (reverse('get_students_by_school', args=[self.school.school_id]), 2),
+        ]:
+            with self.subTest(url=url):
+                self.assertQueryCount('get', url, expected)
+
+    def test_dashboard_tabs(self):
+        last_page = (BENCHMARK_PULLS + 4) // 5
+        for url, expected in [
+            (reverse('get_dashboard_content', args=['summary']), 3),
+            (reverse('get_dashboard_content', args=['history']), 4),
+            (reverse('get_dashboard_content', args=['history']) + f'?page={last_page}', 4),
+            (reverse('get_dashboard_content', args=['collection']), 4),
+            (reverse('get_dashboard_content', args=['achievements']), 4),
+        ]:
+            with self.subTest(url=url):
+                self.assertQueryCount('get', url, expected)
+
+    def test_dashboard_widgets(self):
+        # The first widget loads the shared pull data; the others read it from the cache. The first 3-star
+        # card looks up its student's school and version, the performance table each pulled banner's preset.
+        self.assertQueryCount('get', reverse('dashboard_widget_kpis'), 3)
+        for name, expected in [
+            ('dashboard_widget_top_students', 3),
+            ('dashboard_widget_first_r3_pull', 4),
+            ('dashboard_widget_chart_overall_rarity', 2),
+            ('dashboard_widget_chart_banner_breakdown', 2),
+            ('dashboard_widget_chart_banner_activity', 2),
+            ('dashboard_widget_performance_table', 3),
+            ('dashboard_widget_milestone_timeline', 2),
+        ]:
+            with self.subTest(widget=name):
+                self.assertQueryCount('get', reverse(name), expected)
+        cache.clear()
+        for rarity in (1, 2, 3):
+            with self.subTest(podium=rarity):
+                self.assertQueryCount('get', reverse('get_top_students_by_rarity', args=[rarity]), 3)
+
+    def test_pulls(self):
+        # A single and a ten pull for a veteran user who owns every student and has every achievement, so
+        # the random pulls cannot add an inventory row or an unlock: the pulls and the inventory in one
+        # write each, the achievement check from the user's unlocks.
+        UserInventory.objects.bulk_create(
+            [UserInventory(inventory_user=self.user, student_id=student) for student in Student.objects.all()], ignore_conflicts=True
+        )
+        UnlockAchievement.objects.bulk_create(
+            [UnlockAchievement(unlock_user=self.user, achievement_id=achievement) for achievement in Achievement.objects.all()],
+            ignore_conflicts=True,
+        )
+        self.assertQueryCount('post', reverse('draw_one_gacha', args=[self.banner.banner_id]), 14)
+        cache.clear()
+        self.assertQueryCount('post', reverse('draw_ten_gacha', args=[self.banner.banner_id]), 14)
+
+    def test_guest_pull(self):
+        self.client.logout()
+        self.assertQueryCount('post', reverse('draw_ten_gacha', args=[self.banner.banner_id]), 6)
+
+    def test_images(self):
+        # Served from the image pack: no queries beyond the session.
+        for url in [
+            reverse('serve_school_image', args=[self.school.school_id]),
+            reverse('serve_banner_image', args=[self.banner.banner_id]),
+            reverse('serve_achievement_image', args=[self.achievement.achievement_id]),
+            reverse('serve_student_image', args=[self.student.student_id, 'portrait']),
+        ]:
+            with self.subTest(url=url):
+                self.assertQueryCount('get', url, 0)
+
+    def test_images_without_pack(self):
+        # One query per request (or per batch) from the database, then none from the cache.
+        student_ids = Student.objects.order_by('student_id').values_list('student_id', flat=True)[:10]
+        batch_url = reverse('serve_student_image_batch') + f"?ids={','.join(map(str, student_ids))}&types=portrait,artwork"
+        with mock.patch.object(ImagePack, 'default', classmethod(lambda cls: None)):
+            for url in [
+                reverse('serve_banner_image', args=[self.banner.banner_id]),
+                reverse('serve_student_image', args=[self.student.student_id, 'portrait']),
+                batch_url,
+            ]:
+                with self.subTest(url=url):
+                    self.assertQueryCount('get', url, 1)
+                    self.assertQueryCount('get', url, 0)
+
+# --- =============================================================== ---
+# --- ASYNC ACHIEVEMENTS                                              ---
+# --- =============================================================== ---
+
+class AchievementQueueTests(SeededDataMixin, TestCase):
+    """ACHIEVEMENTS_ASYNC: the queue and its worker, against the synchronous path."""
+
+    def ten_pulls(self, count=40):
+        # The same ten pulls every time, with some all-3-star ones so batch and streak rules fire too.
+        rng = random.Random(7)
+        students = list(Student.objects.order_by('student_id'))
+        three_stars = [student for student in students if student.student_rarity == 3]
+        return [rng.sample(three_stars if n % 8 == 0 else students, 10) for n in range(count)]
+
+    def unlocks_after_pulls(self, username, asynchronous):
+        user = User.objects.create_user(username)
+        self.client.force_login(user)
+        url = reverse('draw_ten_gacha', args=[self.banner.banner_id])
+        with override_settings(ACHIEVEMENTS_ASYNC=asynchronous):
+            for pulled in self.ten_pulls():
+                with mock.patch.object(GachaEngine, 'draw_10', lambda engine, pulled=pulled: pulled):
+                    self.assertTrue(self.client.post(url).json()['achievements_pending'] is asynchronous)
+        if asynchronous:
+            self.assertTrue(AchievementQueue.pending(user))
+            call_command('process_achievements', once=True, stdout=io.StringIO())
+            self.assertFalse(AchievementQueue.pending(user))
+        return set(UnlockAchievement.objects.filter(unlock_user=user).values_list('achievement_id__achievement_key', flat=True))
+
+    def test_async_unlocks_match_sync(self):
+        synchronous = self.unlocks_after_pulls('sync', asynchronous=False)
+        cache.clear()
+        asynchronous = self.unlocks_after_pulls('async', asynchronous=True)
+        self.assertTrue(synchronous)
+        self.assertEqual(asynchronous, synchronous)
+
+    def test_abandoned_claim_is_taken_over(self):
+        task = AchievementQueue.enqueue(self.user, [self.student], [])
+        first = AchievementQueue.claim()
+        self.assertEqual([claimed.task_id for claimed in first], [task.task_id])
+        self.assertEqual(AchievementQueue.claim(), [])
+
+        # The worker that claimed it died: once the claim is older than the timeout, another takes it.
+        AchievementTask.objects.filter(pk=task.pk).update(
+            task_claimed_on=timezone.now() - AchievementQueue.CLAIM_TIMEOUT - timedelta(seconds=1)
+        )
+        second = AchievementQueue.claim()
+        self.assertEqual([claimed.task_id for claimed in second], [task.task_id])
+        self.assertNotEqual(second[0].task_claimed_by, first[0].task_claimed_by)
+
+    def test_failing_task_stops_after_max_attempts(self):
+        task = AchievementQueue.enqueue(self.user, [self.student], [])
+        with mock.patch.object(AchievementQueue, '_evaluate', side_effect=RuntimeError('boom')), \
+                contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(TASK_MAX_ATTEMPTS):
+                self.assertEqual(AchievementQueue.process_batch(), 1)
+            self.assertEqual(AchievementQueue.process_batch(), 0)
+
+        task.refresh_from_db()
+        self.assertEqual(task.task_attempts, TASK_MAX_ATTEMPTS)
+        self.assertFalse(AchievementQueue.pending(self.user))
+
+    def test_unlocks_poll_rejects_invalid_since(self):
+        url = reverse('achievement_unlocks')
+        for since in ('', 'yesterday', '2024-13-45T00:00:00'):
+            with self.subTest(since=since):
+                response = self.client.get(url, {'since': since})
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+
+# --- =============================================================== ---
+# --- IMPORT                                                          ---
+# --- =============================================================== ---
+
+class UnpackTests(SeededDataMixin, TestCase):
+    """Edge cases of the student import that the seed data does not exercise."""
+
+    def record(self, name, version, images):
+        portrait = OptimizedImage(images, None, '')
+        hashes = {'asset_portrait_hash': ImageAsset.hash_image(images), 'asset_artwork_hash': ''}
+        return {
+            'name': name, 'version': version, 'rarity': 1, 'school': self.school.school_name, 'is_limited': False,
+            'unit': name, 'images': {'portrait': portrait, 'artwork': None}, 'hashes': hashes,
+            'pair_hash': ImageAsset.combine_hashes(hashes['asset_portrait_hash'], ''),
+        }
+
+    def test_output_goes_to_command_stdout(self):
+        # The progress bars and the stage summary are written to the command's stdout, not the process's.
+        out, process_out = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(process_out):
+            call_command('unpack', summary='', force=True, stdout=out, stderr=io.StringIO())
+        output = out.getvalue()
+        students = Student.objects.count()
+        self.assertIn(f'{students}/{students} [', output)
+        summary = output[output.index('Stage summary:'):].splitlines()[1:]
+        self.assertTrue(summary[0].startswith('stage'))
+        self.assertEqual(
+            [line.split()[0] for line in summary[1:6]],
+            ['presets', 'schools', 'students', 'banners', 'achievements'],
+        )
+        self.assertEqual(process_out.getvalue(), '')
+
+    @staticmethod
+    def catalog_rows():
+        """Every imported row by natural key, without ids."""
+        return {
+            'presets': set(GachaPreset.objects.values_list(
+                'preset_name', 'preset_pickup_rate', 'preset_r3_rate', 'preset_r2_rate', 'preset_r1_rate'
+            )),
+            'schools': set(School.objects.values_list('school_name', 'school_image')),
+            'students': set(Student.objects.values_list(
+                'student_name', 'version_id__version_name', 'student_rarity', 'school_id__school_name',
+                'student_is_limited', 'asset_id__asset_pair_hash',
+            )),
+            'banners': set(GachaBanner.objects.values_list('banner_name', 'preset_id__preset_name', 'banner_include_limited', 'banner_image')),
+            'pickups': set(GachaBanner.objects.values_list('banner_name', 'banner_pickup__student_name', 'banner_pickup__version_id__version_name')),
+            'achievements': set(
+                (key, name, json.dumps(rule, sort_keys=True), bytes(image or b''))
+                for key, name, rule, image in Achievement.objects.values_list(
+                    'achievement_key', 'achievement_name', 'achievement_rule', 'achievement_image'
+                )
+            ),
+        }
+
+    def test_pack_matches_json(self):
+        # The pack holds the same records as the JSON files, and importing it from scratch writes the same rows.
+        json_source = JsonSeedSource(unpack.JSON_DIR)
+        with tempfile.TemporaryDirectory() as pack_dir:
+            PackedSeedSource.convert(json_source, pack_dir)
+            pack_source = open_seed_source('pack', unpack.JSON_DIR, pack_dir)
+            for kind in KINDS:
+                json_units, pack_units = json_source.units(kind), pack_source.units(kind)
+                self.assertEqual(len(pack_units), len(json_units), kind)
+                for json_unit, pack_unit in zip(json_units, pack_units):
+                    loaded = [json_source.load(json_unit), pack_source.load(pack_unit)]
+                    for records in loaded:
+                        for record in records if isinstance(records, list) else [records]:
+                            record.pop('size')
+                    self.assertEqual(loaded[1], loaded[0], pack_unit)
+
+            before = self.catalog_rows()
+            with mock.patch.object(unpack, 'PACK_DIR', pack_dir):
+                call_command('unpack', source='pack', force=True, summary='', stdout=io.StringIO(), stderr=io.StringIO())
+            self.assertEqual(self.catalog_rows(), before)
+            self.assertEqual(
+                ImportManifest.objects.filter(manifest_path__startswith='pack:students/').count(), len(json_source.units('students'))
+            )
+
+    def test_pack_source_is_explicit(self):
+        # Without --source pack the JSON files are read, even when a pack exists; asking for a missing pack fails.
+        with tempfile.TemporaryDirectory() as pack_dir, mock.patch.object(unpack, 'PACK_DIR', pack_dir):
+            self.assertIsInstance(open_seed_source('json', unpack.JSON_DIR, pack_dir), JsonSeedSource)
+            with self.assertRaisesMessage(CommandError, 'pack_seed_data'):
+                call_command('unpack', source='pack', summary='', stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_batch_shares_new_images(self):
+        # A new student brings new images, then an existing student whose asset nobody else uses gets the same
+        # ones: both share one new asset, rather than the second updating its old asset to a taken hash.
+        students = list(Student.objects.select_related('version_id'))
+        users = Counter(student.asset_id_id for student in students)
+        existing = next(student for student in students if users[student.asset_id_id] == 1)
+        version, old_asset_id = existing.version_id.version_name, existing.asset_id_id
+
+        command = unpack.Command(stdout=open(os.devnull, 'w'))
+        command.stage, command.source, command.manifest = mock.Mock(), mock.Mock(), None
+        command.data_changed, command.students_created, command.assets_reused = False, False, 0
+        existing_students = {(student.student_name, student.version_id.version_name): student for student in students}
+        command._write_student_batch(
+            [self.record('Newcomer', version, b'shared images'), self.record(existing.student_name, version, b'shared images')],
+            {version: existing.version_id}, {self.school.school_name: self.school}, existing_students,
+            unpack.AssetCache(ImageAsset.objects.only('asset_id', 'asset_pair_hash'), students),
+        )
+
+        newcomer = Student.objects.get(student_name='Newcomer')
+        existing.refresh_from_db()
+        self.assertEqual(newcomer.asset_id_id, existing.asset_id_id)
+        self.assertEqual(ImageAsset.objects.filter(asset_pair_hash=newcomer.asset_id.asset_pair_hash).count(), 1)
+        self.assertFalse(ImageAsset.objects.filter(asset_id=old_asset_id).exists())
+
+class IncrementalImportTests(SeededDataMixin, TestCase):
+    """
+    Re-imports against a hard-linked copy of the seed tree, so files can be
+    touched and edited without changing the real ones.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.json_dir = os.path.join(tempfile.mkdtemp(dir=self.temp_dir), 'json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.json_dir), ignore_errors=True)
+        # Links share the originals' mtimes, so the copy matches the manifest of the seeded import.
+        shutil.copytree(unpack.JSON_DIR, self.json_dir, copy_function=os.link)
+        self.unit = os.path.join(self.json_dir, 'students', sorted(os.listdir(os.path.join(self.json_dir, 'students')))[0])
+        self.key = os.path.relpath(self.unit, self.json_dir)
+        # A file of its own, so touching or editing it leaves the real seed file alone.
+        os.remove(self.unit)
+        shutil.copy2(os.path.join(unpack.JSON_DIR, self.key), self.unit)
+
+    def run_unpack(self):
+        """Runs an incremental unpack and returns its stage summaries by name."""
+        summary_path = os.path.join(os.path.dirname(self.json_dir), 'summary.json')
+        with mock.patch.object(unpack, 'JSON_DIR', self.json_dir):
+            call_command('unpack', summary=summary_path, stdout=io.StringIO(), stderr=io.StringIO())
+        with open(summary_path) as f:
+            return {stage['name']: stage for stage in json.load(f)['stages']}
+
+    @staticmethod
+    def manifest_rows():
+        return {
+            entry.manifest_path: (entry.manifest_size, entry.manifest_mtime_ns, entry.manifest_sha256, entry.manifest_update_on)
+            for entry in ImportManifest.objects.all()
+        }
+
+    def test_unchanged_tree_is_skipped(self):
+        before = self.manifest_rows()
+        stages = self.run_unpack()
+        for name in ('presets', 'schools', 'students', 'banners', 'achievements'):
+            self.assertEqual((stages[name]['items'], stages[name]['rows']), (0, 0), name)
+        self.assertNotIn('image_pack', stages)
+        self.assertEqual(self.manifest_rows(), before)
+
+    def test_touched_file_is_restamped(self):
+        before = self.manifest_rows()
+        mtime_ns = os.stat(self.unit).st_mtime_ns + 10 ** 9
+        os.utime(self.unit, ns=(mtime_ns, mtime_ns))
+
+        stages = self.run_unpack()
+        self.assertEqual((stages['students']['items'], stages['students']['rows']), (0, 0))
+        after = self.manifest_rows()
+        size, new_mtime_ns, sha256, _ = after.pop(self.key)
+        old_size, _, old_sha256, _ = before.pop(self.key)
+        self.assertEqual((size, new_mtime_ns, sha256), (old_size, mtime_ns, old_sha256))
+        self.assertEqual(after, before)
+
+        # Now on the fast path: the next run does not hash it again.
+        with mock.patch.object(SourceManifest, '_sha256', side_effect=AssertionError('hashed')):
+            self.assertEqual(self.run_unpack()['students']['items'], 0)
+
+    def test_edited_file_is_reimported(self):
+        with open(self.unit) as f:
+            record = json.load(f)
+        student = Student.objects.get(student_name=record['name'], version_id__version_name=record['version'])
+        record['rarity'] = student.student_rarity % 3 + 1
+        with open(self.unit, 'w') as f:
+            json.dump(record, f, indent=2)
+        before = self.manifest_rows()
+
+        stages = self.run_unpack()
+        self.assertEqual((stages['students']['items'], stages['students']['rows'], stages['students']['errors']), (1, 1, 0))
+        for name in ('presets', 'schools', 'banners', 'achievements'):
+            self.assertEqual(stages[name]['items'], 0, name)
+        student.refresh_from_db()
+        self.assertEqual(student.student_rarity, record['rarity'])
+
+        after = self.manifest_rows()
+        self.assertEqual(after.pop(self.key)[2], SourceManifest._sha256(self.unit))
+        before.pop(self.key)
+        self.assertEqual(after, before)
+
+# --- =============================================================== ---
+# --- SNAPSHOTS                                                       ---
+# --- =============================================================== ---
+
+class SnapshotTests(SeededDataMixin, TestCase):
+    """export_snapshot and restore_snapshot round trips, with the atlas rebuild after a restore skipped."""
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.temp_dir, f'{self._testMethodName}.snapshot.gz')
+        self.addCleanup(lambda: os.path.exists(self.path) and os.remove(self.path))
+
+    def restore(self):
+        with mock.patch.object(SpriteAtlas, 'build', return_value={'version': 'test'}):
+            call_command('restore_snapshot', self.path, interactive=False, stdout=io.StringIO())
+
+    @staticmethod
+    def database_rows():
+        """The row count of every table, and the first and last rows of the busy ones."""
+        counts = {model._meta.label_lower: model._base_manager.count() for model in Snapshot._models()}
+        samples = {}
+        for model in (User, Student, GachaBanner, GachaTransaction, UserInventory, UnlockAchievement, AchievementRollup):
+            rows = model._base_manager.order_by('pk').values()
+            samples[model._meta.label_lower] = list(rows[:20]) + list(rows.reverse()[:20])
+        return counts, samples
+
+    def test_round_trip(self):
+        before = self.database_rows()
+        call_command('export_snapshot', self.path, stdout=io.StringIO())
+        call_command('flush', interactive=False, verbosity=0)
+        self.assertFalse(GachaTransaction.objects.exists())
+
+        self.restore()
+        self.assertEqual(self.database_rows(), before)
+
+        # Sequences continue after the restored ids instead of colliding with them.
+        last_id = GachaTransaction.objects.order_by('-pk').values_list('pk', flat=True).first()
+        pulled = GachaTransaction.objects.create(transaction_user=self.user, banner_id=self.banner, student_id=self.student)
+        self.assertGreater(pulled.pk, last_id)
+        self.assertGreater(User.objects.create_user('newcomer').pk, self.user.pk)
+
+    def test_tables_are_written_parents_first(self):
+        # Rows of a table only reference tables restored before it.
+        call_command('export_snapshot', self.path, stdout=io.StringIO())
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            labels = [item['model'] for item in map(json.loads, f) if isinstance(item, dict) and 'model' in item]
+        self.assertEqual(set(labels), {model._meta.label_lower for model in Snapshot._models()})
+        for position, label in enumerate(labels):
+            for field in apps.get_model(label)._meta.concrete_fields:
+                if field.is_relation and field.related_model._meta.label_lower != label:
+                    self.assertIn(field.related_model._meta.label_lower, labels[:position], f'{label}.{field.name}')
+
+    def test_other_migration_state_is_rejected(self):
+        state = Snapshot._migration_state()
+        state['app_web'] = state['app_web'][:-1]
+        with mock.patch.object(Snapshot, '_migration_state', return_value=state):
+            call_command('export_snapshot', self.path, stdout=io.StringIO())
+
+        before = self.database_rows()
+        with self.assertRaisesMessage(CommandError, 'different migrations for: app_web'):
+            self.restore()
+        self.assertEqual(self.database_rows(), before)
+
+# --- =============================================================== ---
+# --- BACKGROUND REBUILDS                                             ---
+# --- =============================================================== ---
+
+class BackgroundRebuildTests(SimpleTestCase):
+    """The debounced rebuilds of the sprite atlas and the image pack."""
+
+    def test_debounced_runs_never_overlap(self):
+        # A trigger while a run is going starts a second run, but only once the first has finished.
+        running, overlaps, runs = [], [], []
+        first_started = threading.Event()
+
+        def rebuild():
+            overlaps.append(len(running))
+            running.append(True)
+            first_started.set()
+            time.sleep(0.2)
+            running.pop()
+            runs.append(True)
+
+        debounce('test_rebuild', rebuild, delay=0)
+        self.assertTrue(first_started.wait(5))
+        debounce('test_rebuild', rebuild, delay=0)
+        deadline = time.monotonic() + 5
+        while len(runs) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(runs), 2)
+        self.assertEqual(overlaps, [0, 0])
+
+    def test_stale_sheets_are_kept_while_recent(self):
+        # The current and previous generations stay; older sheets go once they have aged out.
+        with tempfile.TemporaryDirectory() as atlas_dir, mock.patch.object(SpriteAtlas, 'ATLAS_DIR', atlas_dir):
+            names = ['all.current.webp', 'all.previous.webp', 'all.recent.webp', 'all.old.webp', 'manifest.json']
+            for name in names:
+                with open(os.path.join(atlas_dir, name), 'wb') as file:
+                    file.write(b'sheet')
+            aged = time.time() - SpriteAtlas.STALE_SHEET_AGE - 60
+            for name in ('all.previous.webp', 'all.old.webp'):
+                os.utime(os.path.join(atlas_dir, name), (aged, aged))
+
+            SpriteAtlas._remove_stale_sheets({'all.current.webp', 'all.previous.webp'})
+            self.assertEqual(sorted(os.listdir(atlas_dir)), ['all.current.webp', 'all.previous.webp', 'all.recent.webp', 'manifest.json'])
+
+    def test_overlapping_pack_builds_publish_a_whole_pack(self):
+        # Two builds of one path at once, each slow to write out: the published pack is one of them,
+        # complete, with no scratch files left behind.
+        copy = shutil.copyfileobj
+
+        def iter_images(cls):
+            fill = threading.current_thread().name.encode()
+            return ((f'student:{n}', f'{n}.png', fill * 4096, '') for n in range(100))
+
+        def slow_copy(source, destination, length=0):
+            time.sleep(0.1)
+            copy(source, destination, 4096)
+
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(ImagePack, '_iter_images', classmethod(iter_images)), \
+                mock.patch.object(shutil, 'copyfileobj', slow_copy):
+            path, errors = os.path.join(directory, 'images.pack'), []
+
+            def build():
+                try:
+                    ImagePack.build(path)
+                except Exception as e:
+                    errors.append(e)
+            builds = [threading.Thread(target=build, name=name) for name in ('a', 'b')]
+            for thread in builds:
+                thread.start()
+            for thread in builds:
+                thread.join()
+
+            self.assertEqual(errors, [])
+            pack = ImagePack(path)
+            self.assertEqual(len(pack), 100)
+            self.assertIn({bytes(pack.get(f'student:{n}').data) for n in range(100)}, ({b'a' * 4096}, {b'b' * 4096}))
+            self.assertEqual(os.listdir(directory), ['images.pack'])
+
+    def test_atomic_writes_use_their_own_temporary_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'manifest.json')
+            SpriteAtlas._atomic_write(path, b'first')
+            SpriteAtlas._atomic_write(path, b'second')
+            with open(path, 'rb') as file:
+                self.assertEqual(file.read(), b'second')
+            self.assertEqual(os.listdir(directory), ['manifest.json'])
+
+# --- =============================================================== ---
+# --- CACHES                                                          ---
+# --- =============================================================== ---
+
+class CacheNamespaceTests(TestCase):
+    """get_or_set() single flight and "not found" entries, and ModelCodec round trips through the cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        version = Version.objects.create(version_name='Original')
+        school = School.objects.create(school_name='Abydos')
+        cls.students = [
+            Student.objects.create(student_name=name, version_id=version, student_rarity=rarity, school_id=school)
+            for name, rarity in (('Hoshino', 3), ('Shiroko', 2))
+        ]
+
+    def setUp(self):
+        cache.clear()
+        metrics_dir = tempfile.mkdtemp(prefix='app_web_metrics_')
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        patch = mock.patch.object(REGISTRY, '_directory', metrics_dir)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def counting(self, value, delay=0.0, fail_first=False):
+        """A compute function that counts its calls, optionally slow and failing on the first one."""
+        def compute():
+            with self.calls_lock:
+                self.calls += 1
+                call = self.calls
+            time.sleep(delay)
+            if fail_first and call == 1:
+                raise RuntimeError('leader failed')
+            return value
+        return compute
+
+    def in_threads(self, count, target):
+        """Runs `target` in `count` threads started together. Returns their results or exceptions."""
+        barrier = threading.Barrier(count)
+        results = [None] * count
+        def run(i):
+            barrier.wait()
+            try:
+                results[i] = target()
+            except Exception as e:
+                results[i] = e
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_misses_compute_once(self):
+        namespace = CacheNamespace('test_single_flight', timeout=60)
+        compute = self.counting({'value': 1}, delay=0.2)
+        results = self.in_threads(8, lambda: namespace.get_or_set('key', compute=compute))
+        self.assertEqual(results, [{'value': 1}] * 8)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(CacheNamespace._flights, {})
+        self.assertIsNone(cache.get(f"{namespace.key('key')}:lock"))
+
+    def test_failed_leader_hands_off_to_a_waiter(self):
+        namespace = CacheNamespace('test_handoff', timeout=60)
+        compute = self.counting('value', delay=0.2, fail_first=True)
+        start = time.monotonic()
+        results = self.in_threads(4, lambda: namespace.get_or_set('key', compute=compute))
+
+        self.assertEqual(sorted(map(repr, results)), sorted([repr(RuntimeError('leader failed'))] + [repr('value')] * 3))
+        # One waiter took over right away: the others read its value instead of computing or waiting out the lock.
+        self.assertEqual(self.calls, 2)
+        self.assertLess(time.monotonic() - start, CacheNamespace.LOCK_TIMEOUT / 2)
+        self.assertEqual(namespace.get_or_set('key', compute=compute), 'value')
+        self.assertEqual(self.calls, 2)
+
+    def test_none_is_cached_as_a_miss(self):
+        namespace = CacheNamespace('test_none', timeout=60, miss_timeout=60)
+        compute = self.counting(None)
+        self.assertIsNone(namespace.get_or_set('key', compute=compute))
+        self.assertIsNone(namespace.get_or_set('key', compute=compute))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(namespace.get('key', default='absent'), None)
+
+        # Without a miss timeout, "not found" is not cached.
+        uncached = CacheNamespace('test_none_uncached', timeout=60, miss_timeout=None)
+        uncached.get_or_set('key', compute=compute)
+        uncached.get_or_set('key', compute=compute)
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(uncached.get('key', default='absent'), 'absent')
+
+    def test_model_codec_round_trip(self):
+        namespace = CacheNamespace('test_models', timeout=60, codec=ModelCodec(Student, related=('school_id',), attrs=('count',)))
+        students = list(
+            Student.objects.select_related('school_id').only('student_name', 'student_rarity', 'school_id__school_name').order_by('student_id')
+        )
+        for count, student in enumerate(students, 1):
+            student.count = count
+        namespace.set('key', value=students)
+
+        with self.assertNumQueries(0):
+            cached = namespace.get('key')
+            self.assertEqual(
+                [(s.pk, s.student_name, s.student_rarity, s.school_id.school_name, s.count) for s in cached],
+                [(s.pk, s.student_name, s.student_rarity, s.school_id.school_name, count) for count, s in enumerate(students, 1)],
+            )
+        self.assertEqual([s.get_deferred_fields() for s in cached], [s.get_deferred_fields() for s in students])
+        self.assertIn('student_is_limited', cached[0].get_deferred_fields())
+        self.assertEqual(cached[0].school_id.get_deferred_fields(), students[0].school_id.get_deferred_fields())
+
+        # A deferred field still loads on access, like on the original instance.
+        with self.assertNumQueries(1):
+            self.assertEqual(cached[0].student_is_limited, False)
+
+class SQLiteCacheTests(SimpleTestCase):
+    """The shared SQLite backend's atomic operations, expiry, culling and fork safety, on a temporary file."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='app_web_cache_')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.cache = self.open_cache()
+
+    def open_cache(self, **options):
+        return SQLiteCache(os.path.join(self.directory, 'cache.sqlite3'), {'OPTIONS': options})
+
+    def rows(self):
+        return self.cache._connection.execute('SELECT key FROM cache_entry ORDER BY rowid').fetchall()
+
+    def concurrent_adds(self, count=8):
+        """add()s the same key from `count` threads, each with its own connection. Returns the winners."""
+        barrier = threading.Barrier(count)
+        won = []
+        def add(i):
+            barrier.wait()
+            if self.cache.add('lock', i, timeout=60):
+                won.append(i)
+        threads = [threading.Thread(target=add, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return won
+
+    def test_add_has_a_single_winner(self):
+        won = self.concurrent_adds()
+        self.assertEqual(len(won), 1)
+        self.assertEqual(self.cache.get('lock'), won[0])
+
+        # An entry that is still valid is never replaced.
+        self.assertEqual(self.concurrent_adds(), [])
+        self.assertEqual(self.cache.get('lock'), won[0])
+
+        # An expired entry is replaced by exactly one of them.
+        self.cache.set('lock', 'expired', timeout=0)
+        won = self.concurrent_adds()
+        self.assertEqual(len(won), 1)
+        self.assertEqual(self.cache.get('lock'), won[0])
+
+    def test_incr(self):
+        with self.assertRaisesMessage(ValueError, "Key 'missing' not found."):
+            self.cache.incr('missing')
+        self.cache.set('expired', 1, timeout=0)
+        with self.assertRaises(ValueError):
+            self.cache.incr('expired')
+
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertEqual(self.cache.decr('counter'), 2)
+        self.assertEqual(self.cache.get('counter'), 2)
+
+    def test_expiry(self):
+        self.cache.set('short', 'value', timeout=0.2)
+        self.cache.set('zero', 'value', timeout=0)
+        self.cache.set('forever', 'value', timeout=None)
+        self.assertEqual(self.cache.get_many(['short', 'zero', 'forever']), {'short': 'value', 'forever': 'value'})
+        self.assertFalse(self.cache.has_key('zero'))
+        self.assertFalse(self.cache.touch('zero'))
+
+        time.sleep(0.3)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertFalse(self.cache.has_key('short'))
+        self.assertEqual(self.cache.get('forever'), 'value')
+        self.assertIsNone(self.cache._connection.execute("SELECT expires FROM cache_entry WHERE key LIKE '%forever'").fetchone()[0])
+
+    def test_culling(self):
+        cache = self.open_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        cache.CULL_EVERY = 1
+        for i in range(10):
+            cache.set(f'key-{i}', i)
+        self.assertEqual(len(self.rows()), 10)
+
+        # One over the limit: the least recently written half goes.
+        cache.set('key-0', 'rewritten')
+        cache.set('key-10', 10)
+        self.assertEqual(
+            [cache.get(f'key-{i}') for i in range(11)],
+            ['rewritten'] + [None] * 5 + [6, 7, 8, 9, 10],
+        )
+
+        # Expired entries are dropped first, whatever the count.
+        cache.set('stale', 'value', timeout=0)
+        self.assertEqual(len(self.rows()), 6)
+        self.assertFalse(cache._connection.execute("SELECT 1 FROM cache_entry WHERE key LIKE '%stale'").fetchone())
+
+    def test_connection_is_reopened_after_fork(self):
+        self.cache.set('parent', 1)
+        parent_connection = self.cache._connection
+
+        pid = os.fork()
+        if pid == 0:
+            # Child: no assertions here, the exit status reports back.
+            status = 1
+            try:
+                if self.cache._connection is not parent_connection and self.cache.get('parent') == 1:
+                    self.cache.set('child', os.getpid())
+                    status = 0
+            finally:
+                os._exit(status)
+
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertIs(self.cache._connection, parent_connection)
+        self.assertEqual(self.cache.get('child'), pid)
+
+# --- =============================================================== ---
+# --- METRICS                                                         ---
+# --- =============================================================== ---
+
+class MetricsTests(SimpleTestCase):
+    """Snapshots shared between processes, on a temporary directory."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='app_web_metrics_')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def registry(self):
+        registry = MetricsRegistry(self.directory)
+        registry.counter('pulls_total', 'Pulls.', ('draw',))
+        registry.histogram('pull_seconds', 'Pull time.', buckets=(0.1, 1.0))
+        return registry
+
+    def write_snapshot(self, name, pulls, adopted=()):
+        with open(os.path.join(self.directory, name), 'w') as file:
+            json.dump({'pulls_total': [[['ten'], pulls]], 'pull_seconds': [[[], [1, 0, 0, 0.05, 1]]], '_adopted': list(adopted)}, file)
+
+    @staticmethod
+    def exited_pid():
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        return process.pid
+
+    def files(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_exited_snapshots_are_adopted(self):
+        exited = self.exited_pid()
+        self.write_snapshot(f'{exited}-1.json', 5)
+        self.write_snapshot(f'{os.getppid()}-1.json', 3) # still running
+        registry = self.registry()
+        registry.metrics['pulls_total'].inc(2, draw='ten')
+        registry.flush()
+
+        self.assertEqual(self.files(), sorted([f'{os.getppid()}-1.json', registry._snapshot_name]))
+        totals = registry.collect()
+        self.assertEqual(totals['pulls_total'], {('ten',): 10})
+        self.assertEqual(totals['pull_seconds'], {(): [2, 0, 0, 0.1, 2]})
+
+        # The totals are the same for any process reading them.
+        self.assertEqual(self.registry().collect(), totals)
+
+    def test_snapshot_is_adopted_once(self):
+        self.write_snapshot(f'{self.exited_pid()}-1.json', 5)
+        registries = [self.registry() for _ in range(4)]
+        barrier = threading.Barrier(len(registries))
+        def flush(registry):
+            barrier.wait()
+            registry.flush()
+        threads = [threading.Thread(target=flush, args=(registry,)) for registry in registries]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(len(registry._adopted) for registry in registries), 1)
+        self.assertEqual(len(self.files()), len(registries))
+        self.assertEqual(registries[0].collect()['pulls_total'], {('ten',): 5})
+
+    def test_adopted_files_left_behind_are_not_counted_twice(self):
+        # An adopter exited between writing its snapshot and deleting the file it adopted.
+        exited, adopter = self.exited_pid(), self.exited_pid()
+        self.write_snapshot(f'{exited}-1.json', 5)
+        open(os.path.join(self.directory, f'{exited}-1.json.claim'), 'w').close()
+        self.write_snapshot(f'{adopter}-2.json', 5 + 1, adopted=[f'{exited}-1.json'])
+
+        # Readers skip the file the adopter's snapshot already includes.
+        with mock.patch.object(MetricsRegistry, '_is_running', return_value=True):
+            self.assertEqual(self.registry().collect()['pulls_total'], {('ten',): 6})
+
+        registry = self.registry()
+        registry.flush()
+        self.assertFalse({f'{exited}-1.json', f'{exited}-1.json.claim', f'{adopter}-2.json'} & set(self.files()))
+        self.assertEqual(registry._adopted, [f'{adopter}-2.json', f'{exited}-1.json'])
+        self.assertEqual(registry.collect()['pulls_total'], {('ten',): 6})
+
+    def test_forked_child_starts_from_zero(self):
+        self.write_snapshot(f'{self.exited_pid()}-1.json', 5)
+        registry = self.registry()
+        registry.flush()
+        registry._reset()
+        self.assertEqual((registry._inherited, registry._adopted), ({}, []))
+
+# --- =============================================================== ---
+# --- LATENCY BASELINES                                               ---
+# --- =============================================================== ---
+
+@skipUnless(BENCHMARK, 'latency baselines only run with BENCHMARK=1')
+class LatencyTests(SeededDataMixin, TestCase):
+    """Wall time of the hot paths against recorded baselines (see the module docstring)."""
+    baselines = {}
+    measured = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if os.path.exists(BASELINES_PATH):
+            with open(BASELINES_PATH) as file:
+                cls.baselines = json.load(file)
+
+    @classmethod
+    def tearDownClass(cls):
+        if BENCHMARK_RECORD and cls.measured:
+            baselines = {**cls.baselines, **cls.measured}
+            with open(BASELINES_PATH, 'w') as file:
+                json.dump(dict(sorted(baselines.items())), file, indent=2)
+                file.write('\n')
+        super().tearDownClass()
+
+    def assertFasterThanBaseline(self, name, func, runs=LATENCY_RUNS, before_each=None):
+        timings = []
+        for _ in range(runs):
+            if before_each:
+                before_each()
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        median = statistics.median(timings)
+
+        key = f'{name}@{BENCHMARK_PULLS}'
+        type(self).measured[key] = round(median, 6)
+        baseline = self.baselines.get(key)
+        print(f"\n  {key:<40} {median * 1000:9.2f} ms" + (f"   (baseline {baseline * 1000:.2f} ms)" if baseline else "   (no baseline)"))
+        if baseline is not None and not BENCHMARK_RECORD:
+            limit = baseline * BENCHMARK_TOLERANCE + LATENCY_SLACK
+            self.assertLessEqual(median, limit, f'{key} took {median * 1000:.2f} ms, over {limit * 1000:.2f} ms (baseline {baseline * 1000:.2f} ms)')
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertLess(response.status_code, 400, f'GET {url} returned {response.status_code}')
+        return response
+
+    def test_pull_latency(self):
+        url = reverse('draw_ten_gacha', args=[self.banner.banner_id])
+        self.assertFasterThanBaseline('draw_ten', lambda: self.assertEqual(self.client.post(url).status_code, 200))
+
+    def test_dashboard_latency(self):
+        widgets = [
+            reverse(name) for name in (
+                'dashboard_widget_kpis', 'dashboard_widget_top_students', 'dashboard_widget_first_r3_pull',
+                'dashboard_widget_chart_overall_rarity', 'dashboard_widget_chart_banner_breakdown',
+                'dashboard_widget_chart_banner_activity', 'dashboard_widget_performance_table',
+                'dashboard_widget_milestone_timeline',
+            )
+        ]
+        # A whole dashboard load from a cold cache: the first widget pays for the shared pull data.
+        self.assertFasterThanBaseline('dashboard_widgets', lambda: [self.get(url) for url in widgets], before_each=cache.clear)
+        self.assertFasterThanBaseline(
+            'dashboard_collection', lambda: self.get(reverse('get_dashboard_content', args=['collection'])), before_each=cache.clear
+        )
+
+    def test_history_latency(self):
+        url = reverse('get_dashboard_content', args=['history'])
+        self.assertFasterThanBaseline('history_first_page', lambda: self.get(url))
+        self.assertFasterThanBaseline('history_last_page', lambda: self.get(f'{url}?page={(BENCHMARK_PULLS + 4) // 5}'))
+
+    def test_image_latency(self):
+        student_ids = Student.objects.order_by('student_id').values_list('student_id', flat=True)[:10]
+        batch_url = reverse('serve_student_image_batch') + f"?ids={','.join(map(str, student_ids))}&types=portrait,artwork"
+        self.assertFasterThanBaseline('student_image_pack', lambda: self.get(reverse('serve_student_image', args=[self.student.student_id, 'portrait'])))
+        with mock.patch.object(ImagePack, 'default', classmethod(lambda cls: None)):
+            self.assertFasterThanBaseline('student_image_batch_database', lambda: self.get(batch_url), before_each=cache.clear)
+
+    def test_unpack_latency(self):
+        # The import every deploy runs: nothing changed, so every stage is skipped by the manifest.
+        devnull = open(os.devnull, 'w')
+        self.assertFasterThanBaseline('unpack_unchanged', lambda: call_command('unpack', summary='', stdout=devnull, stderr=devnull), runs=3)
+
+# --- =============================================================== ---
+# --- QUERY PLANS                                                     ---
+# --- =============================================================== ---
+
+class QueryPlanTests(SeededDataMixin, TestCase):
+    """
+    EXPLAIN of every query the hot paths run, from a cold cache, against the
+    per-user tables, which grow with the pull history. A plan that reads one of
+    them in full (SQLite `SCAN t` without an index, PostgreSQL `Seq Scan`)
+    fails, as does a sort of the history where an index should give the order.
+    The small catalog tables may be scanned.
+
+    On PostgreSQL sequential scans are disabled while explaining, so the
+    planner only picks one when no index can serve the query, however few
+    rows the test database holds.
+    """
+    LARGE_TABLES = [
+        model._meta.db_table for model in (
+            GachaTransaction, UserInventory, UnlockAchievement, CollectionProgress, AchievementRollup, AchievementTask,
+        )
+    ]
+
+    def capture_plans(self, func):
+        """Runs `func` and returns (sql, plan) for each distinct SELECT it ran on a large table."""
+        cache.clear()
+        profile = RequestProfile()
+        with connection.execute_wrapper(profile):
+            func()
+        plans = {}
+        for query in profile.queries:
+            sql = query['sql']
+            if sql in plans or query['many'] or sql.lstrip()[:6].upper() != 'SELECT':
+                continue
+            if any(f'"{table}"' in sql for table in self.LARGE_TABLES):
+                plans[sql] = self.explain(sql, query['params'])
+        return list(plans.items())
+
+    @staticmethod
+    def explain(sql, params):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+
+    def full_scans(self, plan):
+        if connection.vendor == 'postgresql':
+            pattern = r'Seq Scan on "?(\w+)"?'
+        else:
+            # `SCAN t USING INDEX i` walks an index in order, and stops at the LIMIT.
+            pattern = r'\bSCAN "?(\w+)"?(?! USING)'
+        return [table for line in plan for table in re.findall(pattern, line) if table in self.LARGE_TABLES]
+
+    @staticmethod
+    def sorts(plan):
+        if connection.vendor == 'postgresql':
+            return [line for line in plan if re.match(r'\s*(->\s*)?(Incremental )?Sort\b', line)]
+        return [line for line in plan if 'TEMP B-TREE FOR ORDER BY' in line]
+
+    def assertIndexedPlans(self, name, func, allow_sort=True):
+        plans = self.capture_plans(func)
+        self.assertTrue(plans, f'{name} ran no queries on the large tables')
+        for sql, plan in plans:
+            report = f'{name}:\n  {sql}\n' + '\n'.join(f'    {line}' for line in plan)
+            self.assertFalse(self.full_scans(plan), f'Full scan in {report}')
+            if not allow_sort:
+                self.assertFalse(self.sorts(plan), f'Sort in {report}')
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertLess(response.status_code, 400, f'GET {url} returned {response.status_code}')
+
+    def test_history(self):
+        # Paged newest first: the index has to give the order, or every page sorts the whole history.
+        url = reverse('get_dashboard_content', args=['history'])
+        self.assertIndexedPlans('history', lambda: self.get(url), allow_sort=False)
+        self.assertIndexedPlans('history last page', lambda: self.get(f'{url}?page={(BENCHMARK_PULLS + 4) // 5}'), allow_sort=False)
+
+    def test_dashboard(self):
+        for tab in ('summary', 'collection', 'achievements'):
+            with self.subTest(tab=tab):
+                self.assertIndexedPlans(tab, lambda: self.get(reverse('get_dashboard_content', args=[tab])))
+        self.assertIndexedPlans('pull data', lambda: self.get(reverse('dashboard_widget_kpis')), allow_sort=False)
+        for rarity in (1, 2, 3):
+            with self.subTest(podium=rarity):
+                self.assertIndexedPlans('podium', lambda: self.get(reverse('get_top_students_by_rarity', args=[rarity])))
+
+    def test_pull(self):
+        url = reverse('draw_ten_gacha', args=[self.banner.banner_id])
+        self.assertIndexedPlans('draw_ten', lambda: self.assertEqual(self.client.post(url).status_code, 200))
+        # The veteran has every counter achievement, so the pull skipped the rollup: fold the new pulls in directly.
+        self.assertIndexedPlans('rollup', lambda: Rollup.update(self.user))
+
+    def test_achievement_queue(self):
+        for _ in range(3):
+            AchievementQueue.enqueue(self.user, [self.student], [])
+        url = reverse('achievement_unlocks') + '?since=2000-01-01T00:00:00Z'
+        self.assertIndexedPlans('achievement unlocks', lambda: self.get(url))
+        self.assertIndexedPlans('queue claim', lambda: self.assertEqual(len(AchievementQueue.claim()), 3))
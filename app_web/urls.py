@@ -41,11 +41,15 @@ urlpatterns = [
     path('api/school/<int:school_id>/students/', views.get_students_by_school, name='get_students_by_school'),
     path('api/gacha/<int:banner_id>/draw_one/', views.draw_one_gacha, name='draw_one_gacha'),
     path('api/gacha/<int:banner_id>/draw_ten/', views.draw_ten_gacha, name='draw_ten_gacha'),
+    path('api/achievements/unlocked/', views.achievement_unlocks, name='achievement_unlocks'),
+    path('metrics/', views.metrics, name='metrics'),
 
     path('image/school/<int:school_id>/', views.serve_school_image, name='serve_school_image'),
     path('image/banner/<int:banner_id>/', views.serve_banner_image, name='serve_banner_image'),
     path('image/achievement/<int:achievement_id>/', views.serve_achievement_image, name='serve_achievement_image'),
+    path('image/student/batch/', views.serve_student_image_batch, name='serve_student_image_batch'),
     path('image/student/<int:student_id>/<str:image_type>/', views.serve_student_image, name='serve_student_image'),
+    path('image/atlas/<str:filename>', views.serve_atlas_image, name='serve_atlas_image'),
     # path('image/student/<int:student_id>/artwork', views.serve_student_artwork, name='serve_student_artwork'),
     # path('image/student/<int:student_id>/portrait', views.serve_student_portrait, name='serve_student_portrait'),
 
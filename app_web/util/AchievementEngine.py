@@ -1,177 +1,429 @@
-import json
-import os
-from typing import List, Optional
-from django.conf import settings
-from django.core.cache import cache
+import hashlib
+import threading
+import time
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
 from django.contrib.auth.models import User # Or your custom user model
-from ..models import Achievement, UnlockAchievement, UserInventory, GachaTransaction, Student
-
-# This dictionary will hold ONLY the data needed for collection checks.
-# Format: { "unlock_key": [ { "name": "Student", "version": "Ver" }, ... ] }
-COLLECTION_SETS = {}
-
-try:
-    achievements_dir = os.path.join(settings.BASE_DIR, 'app_web', 'management', 'data', 'json', 'achievements')
-
-    if os.path.isdir(achievements_dir):
-        for filename in os.listdir(achievements_dir):
-            if filename.endswith('.json'):
-                file_path = os.path.join(achievements_dir, filename)
-                try:
-                    with open(file_path, 'r') as f:
-                        data = json.load(f)
-                        
-                        # --- THE OPTIMIZATION ---
-                        # We ONLY process and store the data if it's a COLLECTION achievement
-                        # and has a 'students' list. All other types are ignored here.
-                        if data.get("category") == "COLLECTION" and "students" in data:
-                            COLLECTION_SETS[data["key"]] = data["students"]
-
-                except (json.JSONDecodeError, KeyError) as e:
-                    print(f"WARNING: Skipping achievement file {filename} due to parsing error: {e}")
-    else:
-        raise FileNotFoundError("Achievements directory not found.")
-
-except FileNotFoundError:
-    print(f"WARNING: Achievements directory not found. Collection achievements will be disabled.")
-except Exception as e:
-    print(f"CRITICAL ERROR loading achievement definitions: {e}")
+from django.db.models import Count, F, Max
+from django.utils import timezone
+from .Cache import CacheNamespace, JsonCodec
+from ..models import (
+    Achievement, UnlockAchievement, UserInventory, GachaTransaction, GachaBanner, Student, CollectionProgress, AchievementRollup,
+)
+
+RARITIES = (1, 2, 3)
+
+class AchievementCatalog:
+    """
+    Every achievement without its image blob, keyed by `achievement_key` and
+    cached per process, so awarding one never has to query for it. Like
+    AchievementRules, the cache is checked against the latest update and the
+    achievement count at most every CHECK_INTERVAL seconds.
+    """
+    CHECK_INTERVAL = 30 # seconds
+
+    _lock = threading.Lock()
+    _catalog: Optional[Dict[str, Achievement]] = None
+    _version = None
+    _checked_at = 0.0
+
+    @classmethod
+    def get(cls) -> Dict[str, Achievement]:
+        now = time.monotonic()
+        if cls._catalog is not None and now - cls._checked_at < cls.CHECK_INTERVAL:
+            return cls._catalog
+
+        with cls._lock:
+            if cls._catalog is None or now - cls._checked_at >= cls.CHECK_INTERVAL:
+                version = Achievement.objects.aggregate(updated=Max('achievement_update_on'), count=Count('achievement_id'))
+                if cls._catalog is None or version != cls._version:
+                    cls._catalog = {
+                        achievement.achievement_key: achievement
+                        for achievement in Achievement.objects.defer('achievement_image', 'achievement_rule')
+                    }
+                    cls._version = version
+                cls._checked_at = now
+        return cls._catalog
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Forces the next get() in this process to check the version."""
+        cls._checked_at = 0.0
+
+class CollectionIndex(NamedTuple):
+    sets: Dict[str, FrozenSet[int]]             # unlock key -> required student ids
+    by_student: Dict[int, Tuple[str, ...]]      # student id -> unlock keys of the sets containing it
+    signatures: Dict[str, str]                  # unlock key -> signature of its student set
+    achievement_ids: Dict[str, int]             # unlock key -> achievement id
+
+class CompiledRules(NamedTuple):
+    collections: CollectionIndex
+    batch: Tuple[Tuple[str, int, int], ...]      # (unlock key, rarity, at least this many of it in one pull)
+    counters: Tuple[Tuple[str, str, int], ...]   # (unlock key, rollup counter, at least this value)
+
+    def evaluate(self, batches: Iterable[Iterable[int]], counters: Dict[str, int], skip: FrozenSet[str] = frozenset()) -> List[str]:
+        """
+        The unlock keys of every batch and counter rule met, in one pass over the
+        pulls' rarities and one over the rollup counters. Collections are checked
+        incrementally by AchievementEngine instead.
+        """
+        batch_rules = [rule for rule in self.batch if rule[0] not in skip]
+        met = []
+        if batch_rules:
+            best = Counter()
+            for rarities in batches:
+                for rarity, count in Counter(rarities).items():
+                    best[rarity] = max(best[rarity], count)
+            met.extend(unlock_key for unlock_key, rarity, at_least in batch_rules if best[rarity] >= at_least)
+        met.extend(
+            unlock_key for unlock_key, counter, at_least in self.counters
+            if unlock_key not in skip and counters.get(counter, 0) >= at_least
+        )
+        return met
+
+class AchievementRules:
+    """
+    Every achievement's rule, declared as data in `achievement_rule` and compiled
+    into a CompiledRules on first use. The rule kinds are:
+
+        {"students": [{"name": "Aru", "version": "Original"}, ...]}     own all of them
+        {"kind": "batch", "rarity": 3, "at_least": 2}                   in a single pull
+        {"kind": "counter", "counter": "pulls", "at_least": 10}         pulls, pulls_r1..pulls_r3
+        {"kind": "counter", "counter": "banner_pulls", "banner": "Standard", "at_least": 100}
+        {"kind": "streak", "rarity": 3, "without": true, "at_least": 50}    pulls in a row (without) a rarity
+
+    Batch rules are judged on the pulled students alone, counter and streak rules
+    on the user's Rollup, and collections through the inverted index of
+    CollectionIndex, so none of them needs a query of its own. A rule that cannot
+    be compiled (unknown student or banner, malformed) is disabled with a warning.
+
+    The compiled rules are cached per process. At most every CHECK_INTERVAL
+    seconds, one cheap aggregate query compares a version (latest achievement
+    update and the achievement, student and banner counts) with the cached one,
+    so edits made by `unpack`, the admin or another worker are picked up without
+    recompiling on every check.
+    """
+    CHECK_INTERVAL = 30 # seconds
+    COUNTERS = ('pulls',) + tuple(f'pulls_r{rarity}' for rarity in RARITIES)
+
+    _lock = threading.Lock()
+    _rules: Optional[CompiledRules] = None
+    _version = None
+    _checked_at = 0.0
+
+    @classmethod
+    def get(cls) -> CompiledRules:
+        now = time.monotonic()
+        if cls._rules is not None and now - cls._checked_at < cls.CHECK_INTERVAL:
+            return cls._rules
+
+        with cls._lock:
+            if cls._rules is None or now - cls._checked_at >= cls.CHECK_INTERVAL:
+                version = cls._current_version()
+                if cls._rules is None or version != cls._version:
+                    cls._rules = cls._compile()
+                    cls._version = version
+                cls._checked_at = now
+        return cls._rules
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Forces the next get() in this process to check the version."""
+        cls._checked_at = 0.0
+
+    @staticmethod
+    def _current_version() -> tuple:
+        achievements = Achievement.objects.aggregate(updated=Max('achievement_update_on'), count=Count('achievement_id'))
+        students = Student.objects.aggregate(last=Max('student_id'), count=Count('student_id'))
+        banners = GachaBanner.objects.aggregate(last=Max('banner_id'), count=Count('banner_id'))
+        return achievements['updated'], achievements['count'], students['last'], students['count'], banners['last'], banners['count']
+
+    @staticmethod
+    def signature(student_ids: Iterable[int]) -> str:
+        return hashlib.sha1(','.join(map(str, sorted(student_ids))).encode()).hexdigest()[:16]
+
+    @classmethod
+    def _compile(cls) -> CompiledRules:
+        student_ids = {
+            (name, version): student_id
+            for student_id, name, version in Student.objects.values_list('student_id', 'student_name', 'version_id__version_name')
+        }
+        banner_ids = {name: banner_id for banner_id, name in GachaBanner.objects.values_list('banner_id', 'banner_name')}
+
+        sets, achievement_ids, by_student = {}, {}, {}
+        batch, counters = [], []
+        rows = Achievement.objects.filter(achievement_rule__isnull=False).values_list('achievement_id', 'achievement_key', 'achievement_rule')
+        for achievement_id, unlock_key, rule in rows:
+            try:
+                kind = rule.get('kind', 'collection')
+                if kind == 'collection':
+                    required = [(req['name'], req['version']) for req in rule['students']]
+                    if not required:
+                        raise ValueError('it names no students')
+                    missing = [req for req in required if req not in student_ids]
+                    if missing:
+                        # A rule naming a student that does not exist can never be completed.
+                        raise ValueError(f'it refers to unknown students {missing}')
+                    sets[unlock_key] = frozenset(student_ids[req] for req in required)
+                    achievement_ids[unlock_key] = achievement_id
+                    for student_id in sets[unlock_key]:
+                        by_student.setdefault(student_id, ())
+                        by_student[student_id] += (unlock_key,)
+                elif kind == 'batch':
+                    batch.append((unlock_key, cls._rarity(rule), int(rule['at_least'])))
+                elif kind in ('counter', 'streak'):
+                    counters.append((unlock_key, cls._counter(rule, banner_ids), int(rule['at_least'])))
+                else:
+                    raise ValueError(f'unknown kind {kind!r}')
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                print(f"WARNING: Achievement rule {unlock_key} is disabled: {e}")
+
+        signatures = {unlock_key: cls.signature(required) for unlock_key, required in sets.items()}
+        return CompiledRules(CollectionIndex(sets, by_student, signatures, achievement_ids), tuple(batch), tuple(counters))
+
+    @staticmethod
+    def _rarity(rule: dict) -> int:
+        if rule['rarity'] not in RARITIES:
+            raise ValueError(f"unknown rarity {rule['rarity']!r}")
+        return rule['rarity']
+
+    @classmethod
+    def _counter(cls, rule: dict, banner_ids: Dict[str, int]) -> str:
+        """The Rollup counter a counter or streak rule is checked against."""
+        if rule['kind'] == 'streak':
+            return f"longest_{'dry' if rule.get('without') else 'streak'}_r{cls._rarity(rule)}"
+        if rule['counter'] == 'banner_pulls':
+            if rule['banner'] not in banner_ids:
+                raise ValueError(f"it refers to unknown banner {rule['banner']!r}")
+            return f"banner:{banner_ids[rule['banner']]}"
+        if rule['counter'] not in cls.COUNTERS:
+            raise ValueError(f"unknown counter {rule['counter']!r}")
+        return rule['counter']
+
+class Rollup:
+    """
+    The counters a user's pulls add up to, kept in AchievementRollup and folded
+    forward one transaction at a time, in pull order:
+
+        pulls, pulls_r1 .. pulls_r3         pulls overall and per rarity
+        banner:<banner id>                  pulls on one banner
+        streak_r3, dry_r3                   the current run of pulls with / without that rarity
+        longest_streak_r3, longest_dry_r3   the longest such runs so far
+    """
+
+    @staticmethod
+    def transactions(**filters):
+        """(user id, transaction id, banner id, rarity) of the matching transactions, in pull order per user."""
+        return GachaTransaction.objects.filter(**filters).order_by('transaction_user_id', 'transaction_id').values_list(
+            'transaction_user_id', 'transaction_id', 'banner_id', 'student_id__student_rarity'
+        )
+
+    @staticmethod
+    def fold(counters: Dict[str, int], banner_id: int, rarity: int) -> None:
+        counters['pulls'] = counters.get('pulls', 0) + 1
+        counters[f'pulls_r{rarity}'] = counters.get(f'pulls_r{rarity}', 0) + 1
+        counters[f'banner:{banner_id}'] = counters.get(f'banner:{banner_id}', 0) + 1
+        for other in RARITIES:
+            run, reset = ('streak', 'dry') if other == rarity else ('dry', 'streak')
+            counters[f'{run}_r{other}'] = length = counters.get(f'{run}_r{other}', 0) + 1
+            counters[f'{reset}_r{other}'] = 0
+            if length > counters.get(f'longest_{run}_r{other}', 0):
+                counters[f'longest_{run}_r{other}'] = length
+
+    @classmethod
+    def update(cls, user: User) -> Dict[str, int]:
+        """
+        Folds the user's transactions since the last update into their rollup and
+        returns the counters: a read of the row, a read of the new transactions and
+        one write. A missing rollup is built from the whole history.
+        """
+        rollup = AchievementRollup.objects.filter(rollup_user=user).first() or AchievementRollup(rollup_user=user)
+        counters, last = dict(rollup.rollup_counters), rollup.rollup_last_transaction
+        for _, transaction_id, banner_id, rarity in cls.transactions(transaction_user=user, transaction_id__gt=last).iterator():
+            cls.fold(counters, banner_id, rarity)
+            last = transaction_id
+        if last == rollup.rollup_last_transaction:
+            return counters
+
+        if rollup.pk is None:
+            AchievementRollup.objects.bulk_create(
+                [AchievementRollup(rollup_user=user, rollup_counters=counters, rollup_last_transaction=last)], ignore_conflicts=True
+            )
+        else:
+            # Conditional, so a concurrent evaluation that already moved the rollup forward is not rolled back.
+            AchievementRollup.objects.filter(pk=rollup.pk, rollup_last_transaction=rollup.rollup_last_transaction).update(
+                rollup_counters=counters, rollup_last_transaction=last, rollup_update_on=timezone.now()
+            )
+        return counters
 
 # --- =============================================================== ---
 # --- CORE ACHIEVEMENT SERVICE                                        ---
 # --- =============================================================== ---
 
 class AchievementEngine:
+    # user id -> keys of the user's unlocked achievements
+    UNLOCKED_CACHE = CacheNamespace('user_unlocked_achievements', timeout=300, codec=JsonCodec(as_set=True))
+
     def __init__(self, user: User):
         if not user or not user.is_authenticated:
             raise ValueError("A valid, authenticated user is required.")
         self.user = user
-        # This is a crucial optimization. We get all unlocked achievements once.
-        self.unlocked_keys = set(
-            UnlockAchievement.objects.filter(unlock_user=user).values_list('achievement_id__achievement_key', flat=True)
-        )
+        self._unlocked_keys: Optional[set] = None
+        # Achievements awarded by the checks, written together by save_unlocks().
+        self._pending: Dict[str, Achievement] = {}
+
+    @property
+    def unlocked_keys(self) -> set:
+        """The keys of the user's unlocked achievements, from the cache or primed from the DB on first use."""
+        if self._unlocked_keys is None:
+            # A copy: save_unlocks() adds to it, and waiting callers may share the computed set.
+            self._unlocked_keys = set(self.UNLOCKED_CACHE.get_or_set(self.user.id, compute=lambda: set(
+                UnlockAchievement.objects.filter(unlock_user=self.user).values_list('achievement_id__achievement_key', flat=True)
+            )))
+        return self._unlocked_keys
 
-        # --- NEW: Define a specific cache key for this user's pull count ---
-        self.pull_count_cache_key = f"user_pull_count:{self.user.id}"
-    
     def _award(self, unlock_key: str) -> Optional[Achievement]:
         """
-        A private helper to safely award an achievement if it's not already unlocked.
+        A private helper to award an achievement if it's not already unlocked.
+        Nothing is written yet: the award is queued for save_unlocks().
         """
-        # 1. Check our in-memory set first. This is extremely fast.
-        if unlock_key in self.unlocked_keys:
+        if unlock_key in self.unlocked_keys or unlock_key in self._pending:
             return None # User already has it.
 
-        try:
-            # 2. If they don't have it, get the achievement from the database.
-            achievement_to_award = Achievement.objects.get(achievement_key=unlock_key)
-            
-            # 3. Award it.
-            UnlockAchievement.objects.create(unlock_user=self.user, achievement_id=achievement_to_award)
-            
-            # 4. Update our in-memory set so we don't try to award it again in the same session.
-            self.unlocked_keys.add(unlock_key)
-            print(f"ACHIEVEMENT UNLOCKED for {self.user.username}: {achievement_to_award.achievement_name}")
-            
-            # You can add logic here to send a notification to the user.
-            return achievement_to_award
-
-        except Achievement.DoesNotExist:
+        achievement_to_award = AchievementCatalog.get().get(unlock_key)
+        if achievement_to_award is None:
             print(f"ERROR: Achievement with key '{unlock_key}' not found in DB.")
             return None
 
-    # --- NEW: A dedicated, cached method to get the total pull count ---
-    def _get_total_pull_count(self) -> int:
+        self._pending[unlock_key] = achievement_to_award
+        return achievement_to_award
+
+    def save_unlocks(self) -> List[Achievement]:
         """
-        Gets the total pull count for the user from the cache, or primes it from the DB.
+        Writes every achievement queued by the checks with a single insert and
+        returns the ones the user did not have yet. Call it once after the checks.
         """
-        count = cache.get(self.pull_count_cache_key)
-        if count is None:
-            count = GachaTransaction.objects.filter(transaction_user=self.user).count()
-            cache.set(self.pull_count_cache_key, count, timeout=60)
-        return count
-    
-    # --- "RULE" METHODS, ORGANIZED BY CATEGORY ---
+        if not self._pending:
+            return []
+        pending, self._pending = self._pending, {}
+
+        # The cached set may be stale (another worker, or an expired entry); only report real first unlocks.
+        already_unlocked = set(
+            UnlockAchievement.objects.filter(
+                unlock_user=self.user, achievement_id__in=[achievement.achievement_id for achievement in pending.values()]
+            ).values_list('achievement_id', flat=True)
+        )
+        new_unlocks = [achievement for achievement in pending.values() if achievement.achievement_id not in already_unlocked]
+
+        UnlockAchievement.objects.bulk_create(
+            [UnlockAchievement(unlock_user=self.user, achievement_id=achievement) for achievement in new_unlocks],
+            ignore_conflicts=True,
+        )
+        self.unlocked_keys.update(pending)
+        self.UNLOCKED_CACHE.delete(self.user.id)
+        for achievement in new_unlocks:
+            print(f"ACHIEVEMENT UNLOCKED for {self.user.username}: {achievement.achievement_name}")
+        return new_unlocks
 
-    def check_luck_achievements(self, pulled_students: List[Student]) -> List[Achievement]:
+    # --- "RULE" METHODS ---
+
+    def evaluate_pull(self, pulled_students: List[Student], new_student_ids: Iterable[int]) -> List[Achievement]:
         """
-        Checks for achievements related to a single gacha pull (e.g., multi-3-star).
-        TRIGGER: Called from the pull_gacha view.
+        Runs every rule for one saved pull and writes the unlocks.
+        Returns the achievements the user just unlocked.
+        TRIGGER: Called from the pull view after the pull is saved.
         """
-        newly_unlocked = []
-        r3_count = sum(1 for student in pulled_students if student.student_rarity == 3)
-        
-        # --- THE LOGIC FIX ---
-        # We use two separate 'if' statements instead of 'if/elif'.
-        # This correctly awards the Double achievement even if the Triple is also awarded.
-        if r3_count >= 2:
-            achievement_obj = self._award('LUCK_DOUBLE_R3')
-            if achievement_obj:
-                newly_unlocked.append(achievement_obj)
-        
-        if r3_count >= 3:
-            achievement_obj = self._award('LUCK_TRIPLE_R3')
-            if achievement_obj:
-                newly_unlocked.append(achievement_obj)
-        
-        return newly_unlocked
-    
-    def check_collection_achievements(self) -> List[Achievement]:
+        return self.evaluate([pulled_students], new_student_ids)
+
+    def evaluate(self, batches: Iterable[Iterable[Student]], new_student_ids: Iterable[int]) -> List[Achievement]:
+        """
+        Runs every rule for one or more saved pulls (`batches`, each the students
+        of one pull) through the compiled evaluator, then the incremental
+        collection check, and writes the unlocks in one insert.
+        """
+        rules = AchievementRules.get()
+        # Counter rules need the rollup; skip it entirely once the user has unlocked them all.
+        counters = Rollup.update(self.user) if any(rule[0] not in self.unlocked_keys for rule in rules.counters) else {}
+        rarities = ([student.student_rarity for student in batch] for batch in batches)
+        for unlock_key in rules.evaluate(rarities, counters, skip=frozenset(self.unlocked_keys)):
+            self._award(unlock_key)
+        self.check_collection_achievements(new_student_ids)
+        return self.save_unlocks()
+
+    def check_collection_achievements(self, new_student_ids: Optional[Iterable[int]] = None) -> List[Achievement]:
         """
-        Checks all collection-based achievements against the user's full inventory.
-        TRIGGER: Called from a signal when the user's inventory changes.
+        Checks collection-based achievements using the per-user progress counters.
+        TRIGGER: Called after a gacha pull is saved, with the ids of the students
+        the user did not own before it; only the sets containing them are touched,
+        each by comparing its counter with its size. Without ids, every set is
+        recounted from the user's inventory.
         """
+        index = AchievementRules.get().collections
+        if new_student_ids is None:
+            touched = Counter({unlock_key: 0 for unlock_key in index.sets})
+            recount_all = True
+        else:
+            # How many of the new students each touched set gained.
+            touched = Counter(unlock_key for student_id in set(new_student_ids) for unlock_key in index.by_student.get(student_id, ()))
+            recount_all = False
+        if not touched:
+            return []
+
+        owned_counts = self._update_progress(index, touched, recount_all)
+
         newly_unlocked = []
-        
-        owned_students = UserInventory.objects.filter(inventory_user=self.user).select_related('student_id')
-        user_owned_set = {f"{item.student_id.student_name}|{item.student_id.version}" for item in owned_students}
-
-        # --- THE OPTIMIZATION ---
-        # We now loop over the much smaller, pre-filtered dictionary.
-        for unlock_key, required_students in COLLECTION_SETS.items():
-            
-            # Skip if the user already has this achievement.
-            if unlock_key not in self.unlocked_keys:
-                # The check is now simpler and faster.
-                if all(f"{req['name']}|{req['version']}" in user_owned_set for req in required_students):
-                    achievement_obj = self._award(unlock_key)
-                    if achievement_obj:
-                        newly_unlocked.append(achievement_obj)
-        
+        for unlock_key, owned in owned_counts.items():
+            if owned >= len(index.sets[unlock_key]) and unlock_key not in self.unlocked_keys and self._owns_all(index.sets[unlock_key]):
+                achievement_obj = self._award(unlock_key)
+                if achievement_obj:
+                    newly_unlocked.append(achievement_obj)
         return newly_unlocked
 
-    def check_milestone_achievements(self) -> List[Achievement]:
+    def _update_progress(self, index: CollectionIndex, gained: Counter, recount_all: bool) -> Dict[str, int]:
         """
-        Checks for achievements related to overall account progression.
-        TRIGGER: Called after a gacha pull is saved.
+        Adds the gained students to the user's counters for the touched sets and
+        returns the new counts. Missing rows, and rows counted for an older version
+        of the rule, are recounted from the inventory instead.
         """
-        newly_unlocked = []
+        progress = {
+            row.achievement_id_id: row
+            for row in CollectionProgress.objects.filter(
+                progress_user=self.user, achievement_id__in=[index.achievement_ids[unlock_key] for unlock_key in gained]
+            )
+        }
 
-        # Fetching the count here is acceptable as it's a single, fast query.
-        total_pulls = self._get_total_pull_count()
-        
-        # --- Check for Total Pulls Milestones ---
-        # The order here is important to prevent multiple awards in one go.
-        if total_pulls >= 10:
-            achievement_obj = self._award('MILESTONE_PULLS_10')
-            if achievement_obj: newly_unlocked.append(achievement_obj)
-        
-        if total_pulls >= 1000:
-            achievement_obj = self._award('MILESTONE_PULLS_1000')
-            if achievement_obj: newly_unlocked.append(achievement_obj)
-            
-        return newly_unlocked
-    # NEW: A method to handle updating the counter.
-    def increment_pull_count(self, amount: int):
-        """
-        Atomically increments the user's pull count in the cache.
-        This is the only method external code should call to update the count.
-        """
-        try:
-            # This is the primary, high-performance operation.
-            cache.incr(self.pull_count_cache_key, amount)
-        except ValueError:
-            # This is a self-healing fallback. If the key expired, this will
-            # force _get_total_pull_count() to re-prime it from the DB on the next call.
-            cache.delete(self.pull_count_cache_key)
-            print(f"Cache key for {self.pull_count_cache_key} expired or was missing. It will be re-primed.")
+        counts, to_recount, increments = {}, [], {}
+        for unlock_key, amount in gained.items():
+            row = progress.get(index.achievement_ids[unlock_key])
+            if recount_all or row is None or row.progress_signature != index.signatures[unlock_key]:
+                to_recount.append(unlock_key)
+            else:
+                counts[unlock_key] = row.progress_owned + amount
+                increments.setdefault(amount, []).append(row.progress_id)
+
+        # Increments are applied in the database, so concurrent pulls never lose one.
+        for amount, progress_ids in increments.items():
+            CollectionProgress.objects.filter(progress_id__in=progress_ids).update(progress_owned=F('progress_owned') + amount)
+
+        if to_recount:
+            required = set().union(*(index.sets[unlock_key] for unlock_key in to_recount))
+            owned = set(UserInventory.objects.filter(inventory_user=self.user, student_id__in=required).values_list('student_id', flat=True))
+            to_create, to_update = [], []
+            for unlock_key in to_recount:
+                counts[unlock_key] = len(index.sets[unlock_key] & owned)
+                row = progress.get(index.achievement_ids[unlock_key])
+                if row is None:
+                    to_create.append(CollectionProgress(
+                        progress_user=self.user, achievement_id_id=index.achievement_ids[unlock_key],
+                        progress_owned=counts[unlock_key], progress_signature=index.signatures[unlock_key],
+                    ))
+                else:
+                    row.progress_owned, row.progress_signature = counts[unlock_key], index.signatures[unlock_key]
+                    to_update.append(row)
+            CollectionProgress.objects.bulk_create(to_create, ignore_conflicts=True)
+            CollectionProgress.objects.bulk_update(to_update, ['progress_owned', 'progress_signature'])
+        return counts
+
+    def _owns_all(self, required_ids: FrozenSet[int]) -> bool:
+        """Confirms a full counter against the inventory before awarding (rare: once per set and user)."""
+        return UserInventory.objects.filter(inventory_user=self.user, student_id__in=required_ids).count() == len(required_ids)
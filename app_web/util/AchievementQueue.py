@@ -0,0 +1,103 @@
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from typing import Iterable, List
+from django.contrib.auth.models import User
+from django.db.models import F, Q
+from django.utils import timezone
+from ..models import TASK_MAX_ATTEMPTS, AchievementTask, Student
+from .AchievementEngine import AchievementEngine
+from .Metrics import ACHIEVEMENT_EVALUATION_SECONDS
+
+class AchievementQueue:
+    """
+    A database-backed queue that moves achievement evaluation off the pull
+    request path, so no external broker is needed. With ACHIEVEMENTS_ASYNC on,
+    the pull view enqueues one AchievementTask in the same transaction as the
+    pull, and `manage.py process_achievements` works through the queue:
+
+        ```python
+        AchievementQueue.enqueue(user, pulled_students, new_student_ids)  # in the view
+        AchievementQueue.process_batch()                                  # in the worker
+        ```
+
+    Workers claim tasks with a random token, so several can run side by side;
+    a claim older than CLAIM_TIMEOUT (a crashed worker) is taken over. A task
+    that keeps failing is kept for inspection after MAX_ATTEMPTS.
+
+    The outcome matches the synchronous path: batch rules are judged per
+    pull, counter and streak rules on the user's rollup, which includes every
+    committed pull, and collections on every new student of the queued pulls.
+    """
+    BATCH_SIZE = 200
+    CLAIM_TIMEOUT = timedelta(minutes=5)
+    MAX_ATTEMPTS = TASK_MAX_ATTEMPTS
+
+    @staticmethod
+    def enqueue(user: User, pulled_students: List[Student], new_student_ids: Iterable[int]) -> AchievementTask:
+        return AchievementTask.objects.create(
+            task_user=user,
+            task_pulled=[student.student_id for student in pulled_students],
+            task_new_students=sorted(set(new_student_ids)),
+        )
+
+    @classmethod
+    def pending(cls, user: User) -> bool:
+        """Whether the user still has pulls waiting to be evaluated."""
+        return AchievementTask.objects.filter(task_user=user, task_attempts__lt=cls.MAX_ATTEMPTS).exists()
+
+    @classmethod
+    def claim(cls, batch_size: int = BATCH_SIZE) -> List[AchievementTask]:
+        """Takes up to `batch_size` of the oldest unclaimed (or abandoned) tasks."""
+        now = timezone.now()
+        available = Q(task_claimed_on__isnull=True) | Q(task_claimed_on__lt=now - cls.CLAIM_TIMEOUT)
+        candidates = AchievementTask.objects.filter(available, task_attempts__lt=cls.MAX_ATTEMPTS).order_by('task_id')
+        task_ids = list(candidates.values_list('task_id', flat=True)[:batch_size])
+        if not task_ids:
+            return []
+
+        # Another worker may have claimed some of them meanwhile; the token tells which ones are ours.
+        token = uuid.uuid4().hex
+        AchievementTask.objects.filter(available, task_id__in=task_ids).update(task_claimed_by=token, task_claimed_on=now)
+        return list(AchievementTask.objects.filter(task_id__in=task_ids, task_claimed_by=token).order_by('task_id'))
+
+    @classmethod
+    def process_batch(cls, batch_size: int = BATCH_SIZE) -> int:
+        """Claims and evaluates one batch of tasks. Returns the number of tasks handled."""
+        tasks = cls.claim(batch_size)
+        if not tasks:
+            return 0
+
+        by_user = defaultdict(list)
+        for task in tasks:
+            by_user[task.task_user_id].append(task)
+        users = User.objects.in_bulk(list(by_user))
+        students = Student.objects.only('student_id', 'student_rarity').in_bulk(
+            {student_id for task in tasks for student_id in task.task_pulled}
+        )
+
+        done, failed = [], []
+        for user_id, user_tasks in by_user.items():
+            try:
+                if user_id in users:
+                    cls._evaluate(users[user_id], user_tasks, students)
+                done.extend(task.task_id for task in user_tasks)
+            except Exception as e:
+                print(f"ERROR: Achievement evaluation failed for user {user_id}: {e}")
+                failed.extend(task.task_id for task in user_tasks)
+
+        AchievementTask.objects.filter(task_id__in=done).delete()
+        if failed:
+            AchievementTask.objects.filter(task_id__in=failed).update(
+                task_claimed_by='', task_claimed_on=None, task_attempts=F('task_attempts') + 1
+            )
+        return len(tasks)
+
+    @staticmethod
+    def _evaluate(user: User, tasks: List[AchievementTask], students: dict) -> None:
+        # Each queued pull is its own batch; the rollup already includes every committed pull.
+        with ACHIEVEMENT_EVALUATION_SECONDS.time(mode='async'):
+            AchievementEngine(user).evaluate(
+                [[students[student_id] for student_id in task.task_pulled if student_id in students] for task in tasks],
+                {student_id for task in tasks for student_id in task.task_new_students},
+            )
@@ -0,0 +1,41 @@
+import threading
+from typing import Callable, Dict
+from django.db import connection
+
+# Pending timers, keyed by task name, so repeated triggers collapse into one run.
+_pending_tasks: Dict[str, threading.Timer] = {}
+_pending_lock = threading.Lock()
+# One lock per task name, held while it runs, so a run never overlaps the previous one.
+_run_locks: Dict[str, threading.Lock] = {}
+
+def debounce(name: str, func: Callable[[], None], delay: float = 2.0) -> None:
+    """
+    Schedules `func` to run once in a daemon thread after `delay` seconds.
+    Calling it again with the same `name` before the delay has passed restarts
+    the timer, so a burst of admin saves results in a single rebuild. A run
+    that comes due while the previous one is still going waits for it, then
+    runs against the newer data.
+    """
+    def _run():
+        with _pending_lock:
+            if _pending_tasks.get(name) is timer:
+                del _pending_tasks[name]
+            run_lock = _run_locks.setdefault(name, threading.Lock())
+        try:
+            with run_lock:
+                func()
+        except Exception as e:
+            print(f"Background task '{name}' failed: {e}")
+        finally:
+            # The thread opened its own DB connection; don't leak it.
+            connection.close()
+
+    with _pending_lock:
+        previous = _pending_tasks.pop(name, None)
+        if previous:
+            previous.cancel()
+
+        timer = threading.Timer(delay, _run)
+        timer.daemon = True
+        _pending_tasks[name] = timer
+        timer.start()
@@ -0,0 +1,320 @@
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple, Type
+from django.core.cache import caches
+from django.db import models
+from .Metrics import CACHE_COMPUTE_SECONDS, CACHE_GET_SECONDS, CACHE_REQUESTS
+from .Profiler import RequestProfile
+
+class Codec:
+    """Converts a value to what the cache stores and back. The base codec stores it as is (pickled by the backend)."""
+
+    def dumps(self, value: Any) -> Any:
+        return value
+
+    def loads(self, data: Any) -> Any:
+        return data
+
+class JsonCodec(Codec):
+    """Plain data (dicts, lists, strings, numbers) as compact JSON. Sets come back as lists unless `as_set`."""
+
+    def __init__(self, as_set: bool = False):
+        self.as_set = as_set
+
+    def dumps(self, value: Any) -> str:
+        return json.dumps(sorted(value) if self.as_set else value, separators=(',', ':'))
+
+    def loads(self, data: str) -> Any:
+        value = json.loads(data)
+        return set(value) if self.as_set else value
+
+class ModelCodec(Codec):
+    """
+    Model instances (a list of them) as row tuples of their loaded fields,
+    with the `related` select_related objects stored once per primary key and
+    the `attrs` annotations kept. Rebuilt with Model.from_db(), so the cached
+    bytes hold no ORM state, deferred fields stay deferred, and a user's ten
+    thousand pulls of a few hundred students store each Student once.
+
+    Example:
+        ```python
+        ModelCodec(GachaTransaction, related=('student_id', 'banner_id'))
+        ModelCodec(Student, attrs=('count', 'first_obtained'))
+        ```
+    """
+
+    def __init__(self, model: Type[models.Model], related: Sequence[str] = (), attrs: Sequence[str] = ()):
+        self.model = model
+        self.related = tuple(related)
+        self.attrs = tuple(attrs)
+
+    def dumps(self, instances: Iterable[models.Model]) -> dict:
+        instances = list(instances)
+        data = {'fields': self._loaded_fields(instances), 'rows': [], 'related': {}}
+        for name in self.related:
+            related = {}
+            for obj in instances:
+                target = self.model._meta.get_field(name).get_cached_value(obj, None)
+                if target is not None and target.pk not in related:
+                    related[target.pk] = target
+            fields = self._loaded_fields(related.values())
+            data['related'][name] = (fields, [tuple(getattr(obj, field) for field in fields) for obj in related.values()])
+        for obj in instances:
+            data['rows'].append(
+                tuple(getattr(obj, field) for field in data['fields']) + tuple(getattr(obj, attr, None) for attr in self.attrs)
+            )
+        return data
+
+    def loads(self, data: dict) -> List[models.Model]:
+        related = {}
+        for name, (fields, rows) in data['related'].items():
+            field = self.model._meta.get_field(name)
+            related_model = field.related_model
+            related[name] = (field, {row[fields.index(related_model._meta.pk.attname)]: related_model.from_db(None, fields, row) for row in rows})
+
+        fields, count = data['fields'], len(data['fields'])
+        instances = []
+        for row in data['rows']:
+            obj = self.model.from_db(None, fields, row[:count])
+            for attr, value in zip(self.attrs, row[count:]):
+                setattr(obj, attr, value)
+            for field, targets in related.values():
+                target = targets.get(getattr(obj, field.attname))
+                if target is not None:
+                    field.set_cached_value(obj, target)
+            instances.append(obj)
+        return instances
+
+    @staticmethod
+    def _loaded_fields(instances: Iterable[models.Model]) -> List[str]:
+        for obj in instances:
+            deferred = obj.get_deferred_fields()
+            return [field.attname for field in obj._meta.concrete_fields if field.attname not in deferred]
+        return []
+
+class CacheNamespace:
+    """
+    A namespaced, versioned slice of a Django cache with stampede protection.
+
+    Keys are `<name>:v<version>:<parts...>`; bump `version` when the cached
+    shape changes and old entries are simply never read again. Values go
+    through the namespace's Codec, and None is a cacheable "not found" result
+    kept for `miss_timeout` seconds. Hits, misses and latencies are recorded
+    per namespace in the metrics registry (see Metrics.py).
+
+    `get_or_set()` adds two protections against a popular key expiring under load:
+
+    1. Single flight: one caller per key computes the value; concurrent callers
+       in the same process wait for its result, and callers in other processes
+       (with a shared backend) wait on a short cache lock and then read it.
+    2. Probabilistic early refresh (XFetch): each hit recomputes slightly ahead
+       of expiry with a probability that grows as expiry nears and with how long
+       the value took to compute, so one request refreshes it before everyone
+       misses at once. Others keep getting the current value meanwhile.
+
+    Example:
+        ```python
+        DASHBOARD = CacheNamespace('dashboard_pulls', timeout=10, codec=ModelCodec(GachaTransaction))
+        pulls = DASHBOARD.get_or_set(user.id, compute=lambda: list(...))
+        DASHBOARD.delete(user.id)
+        ```
+    """
+    LOCK_TIMEOUT = 10.0 # seconds a computation may hold a key before others compute it themselves
+    POLL_INTERVAL = 0.05
+
+    _flights: Dict[str, '_Flight'] = {}
+    _flights_lock = threading.Lock()
+
+    def __init__(self, name: str, timeout: float, version: int = 1, codec: Optional[Codec] = None,
+                 miss_timeout: Optional[float] = 60, beta: float = 1.0, alias: str = 'default'):
+        self.name = name
+        self.timeout = timeout
+        self.version = version
+        self.codec = codec or Codec()
+        self.miss_timeout = miss_timeout
+        self.beta = beta
+        self.alias = alias
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def key(self, *parts: Hashable) -> str:
+        return ':'.join([self.name, f'v{self.version}', *map(str, parts)])
+
+    # ===================================================================
+    # --- BASIC ACCESS ---
+    # ===================================================================
+    def get(self, *parts: Hashable, default: Any = None) -> Any:
+        envelope = self._read(self.key(*parts))
+        self._record('hit' if envelope is not None else 'miss')
+        return default if envelope is None else self._unwrap(envelope)
+
+    def set(self, *parts: Hashable, value: Any, compute_time: float = 0.0) -> None:
+        self._set(self.key(*parts), value, compute_time)
+
+    def delete(self, *parts: Hashable) -> None:
+        self.backend.delete(self.key(*parts))
+
+    def get_many(self, parts_list: Iterable[Tuple]) -> Dict[Tuple, Any]:
+        """Looks up many keys in one round trip. Returns {parts: value} for the cached ones only."""
+        keys = {self.key(*parts): parts for parts in parts_list}
+        start = time.perf_counter()
+        found = self.backend.get_many(list(keys))
+        self._timed_read(time.perf_counter() - start)
+        self._record('hit', len(found))
+        self._record('miss', len(keys) - len(found))
+        return {keys[key]: self._unwrap(envelope) for key, envelope in found.items()}
+
+    def set_many(self, values: Dict[Tuple, Any]) -> None:
+        """Stores many values, grouped by their timeout (found values and "not found" Nones differ)."""
+        by_timeout: Dict[Optional[float], dict] = {}
+        for parts, value in values.items():
+            timeout = self.timeout if value is not None else self.miss_timeout
+            if timeout:
+                by_timeout.setdefault(timeout, {})[self.key(*parts)] = self._wrap(value, 0.0, timeout)
+        start = time.perf_counter()
+        for timeout, envelopes in by_timeout.items():
+            self.backend.set_many(envelopes, timeout=timeout)
+        RequestProfile.record('cache', time.perf_counter() - start)
+
+    # ===================================================================
+    # --- STAMPEDE-PROTECTED READ-THROUGH ---
+    # ===================================================================
+    def get_or_set(self, *parts: Hashable, compute: Callable[[], Any]) -> Any:
+        key = self.key(*parts)
+        envelope = self._read(key)
+        if envelope is not None:
+            _, compute_time, expires = envelope
+            # XFetch: -log(random()) is exponential, so early refreshes are rare until expiry is close.
+            if time.time() - compute_time * self.beta * math.log(random.random() or 1e-12) < expires:
+                self._record('hit')
+                return self._unwrap(envelope)
+            # Refresh early only if nobody else is; until then, the current value is still valid.
+            flight = self._join(key, wait=False)
+            if flight is None:
+                self._record('hit')
+                return self._unwrap(envelope)
+            self._record('refresh')
+            return self._lead(flight, key, compute, current=envelope)
+
+        self._record('miss')
+        flight = self._join(key, wait=True)
+        if isinstance(flight, _Result):
+            return flight.value
+        return self._lead(flight, key, compute)
+
+    def _join(self, key: str, wait: bool):
+        """
+        Returns a new _Flight if this caller leads the computation of `key`, the
+        leader's _Result after waiting for it if `wait`, or None when another
+        caller leads and `wait` is off.
+        """
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                return flight
+        if not wait:
+            return None
+        if flight.done.wait(self.LOCK_TIMEOUT) and flight.ok:
+            return _Result(flight.value)
+        # The leader failed or is stuck: compute without it (not registered, so nobody waits on us).
+        return _Flight()
+
+    def _lead(self, flight: '_Flight', key: str, compute: Callable[[], Any], current: Optional[tuple] = None) -> Any:
+        """Computes and stores `key` unless another process already is; `current` is the entry being refreshed early."""
+        lock_key, token = f'{key}:lock', uuid.uuid4().hex
+        owns_lock = self.backend.add(lock_key, token, timeout=self.LOCK_TIMEOUT)
+        try:
+            if not owns_lock:
+                # Another process is computing it: keep the current value, or wait for its value rather than query too.
+                envelope = current or self._wait_for(key)
+                if envelope is not None:
+                    flight.finish(self._unwrap(envelope))
+                    return flight.value
+            start = time.perf_counter()
+            value = compute()
+            compute_time = time.perf_counter() - start
+            CACHE_COMPUTE_SECONDS.observe(compute_time, namespace=self.name)
+            self._set(key, value, compute_time)
+            flight.finish(value)
+            return value
+        finally:
+            with self._flights_lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            if owns_lock and self.backend.get(lock_key) == token:
+                self.backend.delete(lock_key)
+            if not flight.ok:
+                # Wake the waiters only once the lock is free, so one of them takes over at once
+                # instead of all of them waiting out LOCK_TIMEOUT on a lock nobody holds.
+                flight.fail()
+
+    def _wait_for(self, key: str):
+        deadline = time.monotonic() + self.LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(self.POLL_INTERVAL)
+            envelope = self.backend.get(key)
+            if envelope is not None:
+                return envelope
+        return None
+
+    # ===================================================================
+    # --- ENVELOPES ---
+    # ===================================================================
+    def _set(self, key: str, value: Any, compute_time: float) -> None:
+        timeout = self.timeout if value is not None else self.miss_timeout
+        if timeout:
+            envelope = self._wrap(value, compute_time, timeout)
+            start = time.perf_counter()
+            self.backend.set(key, envelope, timeout=timeout)
+            RequestProfile.record('cache', time.perf_counter() - start)
+
+    def _wrap(self, value: Any, compute_time: float, timeout: float) -> tuple:
+        # (stored value, seconds it took to compute, absolute expiry) for XFetch.
+        return (None if value is None else self.codec.dumps(value), compute_time, time.time() + timeout)
+
+    def _unwrap(self, envelope: tuple) -> Any:
+        data = envelope[0]
+        return None if data is None else self.codec.loads(data)
+
+    # ===================================================================
+    # --- METRICS ---
+    # ===================================================================
+    def _read(self, key: str):
+        start = time.perf_counter()
+        envelope = self.backend.get(key)
+        self._timed_read(time.perf_counter() - start)
+        return envelope
+
+    def _timed_read(self, seconds: float) -> None:
+        CACHE_GET_SECONDS.observe(seconds, namespace=self.name)
+        RequestProfile.record('cache', seconds)
+
+    def _record(self, result: str, amount: int = 1) -> None:
+        if amount:
+            CACHE_REQUESTS.inc(amount, namespace=self.name, result=result)
+
+class _Result:
+    def __init__(self, value):
+        self.value = value
+
+class _Flight:
+    """One in-process computation of a key that concurrent callers wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.ok = False
+        self.value = None
+
+    def finish(self, value) -> None:
+        self.value, self.ok = value, True
+        self.done.set()
+
+    def fail(self) -> None:
+        self.done.set()
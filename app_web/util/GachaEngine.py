@@ -1,9 +1,12 @@
 # your_app/services/gacha_engine.py
 
 import random
-from typing import List
+from typing import TYPE_CHECKING, Dict, List
 from ..models import GachaBanner, Student
 
+if TYPE_CHECKING:
+    import numpy as np
+
 class GachaEngine:
     """
     A stateless service class that handles the logic of performing gacha pulls,
@@ -102,4 +105,61 @@ class GachaEngine:
         
         # 4. Convert all 10 student objects to the final JSON format.
         return pulled_students
-    
\ No newline at end of file
+
+    # ===================================================================
+    # --- VECTORIZED SAMPLING ---
+    # ===================================================================
+    def distribution(self, *, guarantee_r2_or_higher: bool = False) -> Dict[int, float]:
+        """
+        The chance of each student (by id) on one pull: the same rates, pools,
+        weights and fallbacks as `_draw_one()`, as one table.
+        """
+        rates = self.guaranteed_r2_rates if guarantee_r2_or_higher else self.rates
+        total = float(sum(rates.values()))
+        chances: Dict[int, float] = {}
+
+        def spread(mass: float, pool: List[Student], weights: List = ()) -> None:
+            weights = [float(weight) for weight in weights]
+            if not sum(weights):
+                weights = [1.0] * len(pool) # random.choice(): every student alike
+            pool_total = sum(weights)
+            for student, weight in zip(pool, weights):
+                chances[student.student_id] = chances.get(student.student_id, 0.0) + mass * weight / pool_total
+
+        r3_mass = float(rates['r3']) / total
+        r2_mass = float(rates['r2']) / total
+        r1_mass = float(rates.get('r1', 0)) / total
+        if not self.pools['r2'] and guarantee_r2_or_higher:
+            # _draw_one() redraws until it lands on the R3 branch.
+            r3_mass, r2_mass = r3_mass + r2_mass, 0.0
+
+        if self.pools['pickup'] or self.pools['r3']:
+            spread(r3_mass, self.pools['pickup'] + self.pools['r3'], self.weights['pickup'] + self.weights['r3'])
+        else:
+            spread(r3_mass, self.pools['r2'])
+        if self.pools['r2']:
+            spread(r2_mass, self.pools['r2'])
+        else:
+            spread(r2_mass, self.pools['r1'])
+        if r1_mass:
+            if not self.pools['r1']:
+                raise Exception("Gacha Error: R1 Pool is empty.")
+            spread(r1_mass, self.pools['r1'])
+        return chances
+
+    def sample_ten_pulls(self, count: int, rng: 'np.random.Generator') -> 'np.ndarray':
+        """
+        `count` ten pulls at once, as a (count, 10) array of student ids with the
+        guaranteed pull last, like `draw_10()`. For generating large datasets,
+        where drawing one student at a time is far too slow. Needs numpy, which
+        the pull views never import.
+        """
+        import numpy as np
+
+        columns = []
+        for guarantee, size in ((False, 9), (True, 1)):
+            chances = self.distribution(guarantee_r2_or_higher=guarantee)
+            student_ids = np.fromiter(chances.keys(), dtype=np.int64, count=len(chances))
+            p = np.fromiter(chances.values(), dtype=np.float64, count=len(chances))
+            columns.append(rng.choice(student_ids, size=(count, size), p=p / p.sum()))
+        return np.hstack(columns)
@@ -0,0 +1,220 @@
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+from django.conf import settings
+
+from ..models import School, Student, GachaBanner, Achievement
+
+class PackedImage(NamedTuple):
+    data: memoryview
+    filename: str
+
+    @property
+    def content_type(self) -> str:
+        return 'image/webp' if self.filename.endswith('.webp') else 'image/png'
+
+class ImagePack:
+    """
+    A read-only pack of every image in the catalog: one contiguous binary file
+    with a JSON offset index at the front.
+
+    Each worker `mmap`s the same file, so the bytes live once in the OS page
+    cache instead of once per worker in LocMemCache, and a freshly deployed
+    worker never has to go to the database for an image.
+
+    File layout:
+        MAGIC (8 bytes) | index length (uint64, little endian) | index JSON | blobs...
+
+    The index maps keys such as `student/12/portrait` (or `student/12/portrait.webp`
+    for the lossy variant) to `[offset, length, filename]`, with offsets relative
+    to the start of the blob section.
+
+    Example:
+        ```python
+        ImagePack.build()
+        pack = ImagePack.default()
+        image = pack.get(ImagePack.student_key(12, 'portrait')) if pack else None
+        ```
+    """
+    MAGIC = b'BAIMGPK1'
+    HEADER = struct.Struct('<8sQ')
+    PACK_PATH = str(getattr(settings, 'IMAGE_PACK_PATH', os.path.join(settings.BASE_DIR, 'images.pack')))
+
+    # The pack shared by this process, reopened when the file on disk is replaced.
+    _default: Optional['ImagePack'] = None
+    _default_stat: Optional[Tuple[int, int]] = None
+    _default_checked_at: float = 0.0
+    CHECK_INTERVAL = 1.0 # seconds
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            # The mapping stays valid after the file object is closed.
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, index_length = self.HEADER.unpack_from(self._mmap, 0)
+        if magic != self.MAGIC:
+            raise ValueError(f"{path} is not an image pack.")
+
+        index_start = self.HEADER.size
+        self._index: Dict[str, list] = json.loads(self._mmap[index_start:index_start + index_length])
+        self._data_start = index_start + index_length
+        self._view = memoryview(self._mmap)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def get(self, key: str) -> Optional[PackedImage]:
+        """Returns a zero-copy view of the image bytes, or None if the key is not packed."""
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        offset, length, filename = entry
+        start = self._data_start + offset
+        return PackedImage(self._view[start:start + length], filename)
+
+    # ===================================================================
+    # --- KEYS ---
+    # ===================================================================
+    @staticmethod
+    def student_key(student_id: int, image_type: str, webp: bool = False) -> str:
+        return f'student/{student_id}/{image_type}' + ('.webp' if webp else '')
+
+    @staticmethod
+    def school_key(school_id: int) -> str:
+        return f'school/{school_id}'
+
+    @staticmethod
+    def banner_key(banner_id: int) -> str:
+        return f'banner/{banner_id}'
+
+    @staticmethod
+    def achievement_key(achievement_id: int) -> str:
+        return f'achievement/{achievement_id}'
+
+    # ===================================================================
+    # --- SHARED INSTANCE ---
+    # ===================================================================
+    @classmethod
+    def default(cls) -> Optional['ImagePack']:
+        """
+        Returns the pack at PACK_PATH, or None if it has not been built.
+        The file is re-checked at most once per CHECK_INTERVAL; a rebuilt pack
+        (a new inode after the atomic replace) is mapped again.
+        """
+        now = time.monotonic()
+        if now - cls._default_checked_at < cls.CHECK_INTERVAL:
+            return cls._default
+        cls._default_checked_at = now
+
+        try:
+            stat = os.stat(cls.PACK_PATH)
+        except FileNotFoundError:
+            cls._default, cls._default_stat = None, None
+            return None
+
+        file_id = (stat.st_ino, stat.st_mtime_ns)
+        if file_id != cls._default_stat:
+            try:
+                # Views handed out by the previous mapping keep it alive until released.
+                cls._default = cls(cls.PACK_PATH)
+                cls._default_stat = file_id
+            except (OSError, ValueError, struct.error) as e:
+                print(f"Could not open image pack {cls.PACK_PATH}: {e}")
+                cls._default, cls._default_stat = None, None
+        return cls._default
+
+    # ===================================================================
+    # --- BUILD ---
+    # ===================================================================
+    @classmethod
+    def build(cls, path: Optional[str] = None) -> dict:
+        """
+        Writes every school, banner, achievement and student image into a new
+        pack and atomically replaces the old one. Returns a small summary.
+        """
+        path = str(path or cls.PACK_PATH)
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+
+        index = {}
+        total_bytes = 0
+
+        # --- Step 1: Stream the blobs into a scratch file, recording offsets ---
+        # Images with the same content hash (students sharing artwork) are stored once.
+        stored: Dict[str, Tuple[int, int]] = {}
+        with tempfile.TemporaryFile(dir=directory) as blobs:
+            for key, filename, image_bytes, content_key in cls._iter_images():
+                if not image_bytes:
+                    continue
+                if content_key and content_key in stored:
+                    index[key] = [*stored[content_key], filename]
+                    continue
+                data = bytes(image_bytes) # bytes() in case of PostgreSQL memoryview
+                index[key] = [total_bytes, len(data), filename]
+                if content_key:
+                    stored[content_key] = (total_bytes, len(data))
+                blobs.write(data)
+                total_bytes += len(data)
+
+            # --- Step 2: Header + index, followed by the blob section ---
+            index_bytes = json.dumps(index, separators=(',', ':')).encode()
+            # A temporary name of its own: two builds in one process (a debounced rebuild during
+            # `unpack`) must never write into the same file before it is published.
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as out:
+                    out.write(cls.HEADER.pack(cls.MAGIC, len(index_bytes)))
+                    out.write(index_bytes)
+                    blobs.seek(0)
+                    shutil.copyfileobj(blobs, out, length=1024 * 1024)
+                os.chmod(tmp_path, 0o644) # mkstemp creates it private to this user
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+        # Make the next lookup in this process map the new file.
+        cls._default_checked_at = 0.0
+        return {'path': path, 'images': len(index), 'bytes': total_bytes}
+
+    @classmethod
+    def schedule_rebuild(cls) -> None:
+        """Rebuilds the pack in the background once a burst of image changes settles."""
+        from .BackgroundTask import debounce
+        debounce('image_pack', cls.build)
+
+    @classmethod
+    def _iter_images(cls) -> Iterator[Tuple[str, str, bytes, str]]:
+        """
+        Yields (key, filename, bytes, content key) for every image, one row at
+        a time. The content key identifies identical images ('' when unknown).
+        """
+        for school_id, name, image in School.objects.values_list('school_id', 'school_name', 'school_image').iterator(chunk_size=50):
+            yield cls.school_key(school_id), f'{name}.png', image, ''
+
+        for banner_id, name, image in GachaBanner.objects.values_list('banner_id', 'banner_name', 'banner_image').iterator(chunk_size=50):
+            yield cls.banner_key(banner_id), f'{name}.png', image, ''
+
+        for achievement_id, name, image in Achievement.objects.values_list('achievement_id', 'achievement_name', 'achievement_image').iterator(chunk_size=50):
+            yield cls.achievement_key(achievement_id), f'{name}.png', image, ''
+
+        students = Student.objects.filter(asset_id__isnull=False).values_list(
+            'student_id', 'student_name', 'version_id__version_name',
+            'asset_id__asset_portrait_hash', 'asset_id__asset_artwork_hash',
+            'asset_id__asset_portrait_data', 'asset_id__asset_artwork_data',
+            'asset_id__asset_portrait_webp', 'asset_id__asset_artwork_webp',
+        )
+        for student_id, name, version, portrait_hash, artwork_hash, portrait, artwork, portrait_webp, artwork_webp in students.iterator(chunk_size=20):
+            yield cls.student_key(student_id, 'portrait'), f'{name}_{version}_portrait.png', portrait, portrait_hash
+            yield cls.student_key(student_id, 'artwork'), f'{name}_{version}_artwork.png', artwork, artwork_hash
+            # The WebP variant is derived from the image, so the same hash identifies it.
+            yield cls.student_key(student_id, 'portrait', webp=True), f'{name}_{version}_portrait.webp', portrait_webp, portrait_hash and f'{portrait_hash}.webp'
+            yield cls.student_key(student_id, 'artwork', webp=True), f'{name}_{version}_artwork.webp', artwork_webp, artwork_hash and f'{artwork_hash}.webp'
@@ -0,0 +1,200 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, NamedTuple, Optional, Tuple
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from ..models import School, Student, GachaBanner, Achievement
+from .ImagePack import ImagePack
+from .Metrics import IMAGE_BYTES_SERVED
+
+class ImageResponse(NamedTuple):
+    body: bytes
+    headers: List[Tuple[str, str]]
+
+class ImageServer:
+    """
+    A minimal image server for the public `/image/...` URLs that answers
+    before Django's middleware stack (sessions, CSRF, auth, CORS, messages...)
+    ever runs. It uses the same URL scheme as `app_web/urls.py`:
+
+        /image/school/<id>/
+        /image/banner/<id>/
+        /image/achievement/<id>/
+        /image/student/<id>/<portrait|artwork>/
+
+    Lookups go to the shared ImagePack index first, then to a small per-process
+    LRU of recently loaded images, and finally to the database. Anything it
+    cannot answer (other methods, other paths, missing images, the atlas and
+    batch endpoints) is passed through to the Django application unchanged.
+
+    Mounted in `wsgi.py` and `asgi.py`:
+        ```python
+        application = ImageWSGIApp(get_wsgi_application())
+        ```
+    """
+    PREFIX = '/image/'
+    ROUTE = re.compile(r'^/image/(?:(school|banner|achievement)/(\d+)|student/(\d+)/(portrait|artwork))/?$')
+
+    CACHE_MAX_BYTES = getattr(settings, 'IMAGE_SERVER_CACHE_BYTES', 64 * 1024 * 1024)
+    CACHE_TIMEOUT = 300 # seconds, same as CACHE_IMAGE_TIMEOUT in views
+
+    def __init__(self):
+        self._cache: 'OrderedDict[str, Tuple[float, ImageResponse]]' = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+
+    # ===================================================================
+    # --- LOOKUP ---
+    # ===================================================================
+    def match(self, method: str, path: str, accept: str) -> Optional[Tuple[str, bool]]:
+        """Returns (pack key, is_student) when this server should try the request."""
+        if method not in ('GET', 'HEAD') or not path.startswith(self.PREFIX):
+            return None
+        route = self.ROUTE.match(path)
+        if not route:
+            return None
+
+        kind, object_id, student_id, image_type = route.groups()
+        if kind:
+            return f'{kind}/{object_id}', False
+        return ImagePack.student_key(int(student_id), image_type, webp='image/webp' in accept), True
+
+    def from_memory(self, key: str, is_student: bool) -> Optional[ImageResponse]:
+        """Answers from the memory-mapped pack or the LRU, without touching the database."""
+        pack = ImagePack.default()
+        if pack:
+            image = pack.get(key) or (is_student and pack.get(self._png_key(key)))
+            if image:
+                return self._response(bytes(image.data), image.filename, is_student)
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                return entry[1]
+        return None
+
+    def from_database(self, key: str, is_student: bool) -> Optional[ImageResponse]:
+        """Loads one image with a single query and remembers it in the LRU."""
+        try:
+            loaded = self._query(key)
+        finally:
+            close_old_connections()
+        if not loaded:
+            return None
+
+        response = self._response(loaded[0], loaded[1], is_student)
+        self._remember(key, response)
+        return response
+
+    # ===================================================================
+    # --- HELPERS ---
+    # ===================================================================
+    @staticmethod
+    def _png_key(key: str) -> str:
+        return key[:-len('.webp')] if key.endswith('.webp') else key
+
+    @staticmethod
+    def _response(body: bytes, filename: str, is_student: bool) -> ImageResponse:
+        headers = [
+            ('Content-Type', 'image/webp' if filename.endswith('.webp') else 'image/png'),
+            ('Content-Length', str(len(body))),
+            ('Content-Disposition', f'inline; filename="{filename}"'),
+            ('X-Content-Type-Options', 'nosniff'),
+        ]
+        if is_student:
+            headers.append(('Vary', 'Accept'))
+        return ImageResponse(body, headers)
+
+    def _remember(self, key: str, response: ImageResponse) -> None:
+        size = len(response.body)
+        if size > self.CACHE_MAX_BYTES:
+            return
+        with self._lock:
+            previous = self._cache.pop(key, None)
+            if previous:
+                self._cache_bytes -= len(previous[1].body)
+            self._cache[key] = (time.monotonic() + self.CACHE_TIMEOUT, response)
+            self._cache_bytes += size
+            while self._cache_bytes > self.CACHE_MAX_BYTES:
+                _, (_, evicted) = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted.body)
+
+    @classmethod
+    def _query(cls, key: str) -> Optional[Tuple[bytes, str]]:
+        """Returns (bytes, filename) for a pack key, or None if there is no such image."""
+        parts = key.split('/')
+        kind, object_id = parts[0], int(parts[1])
+
+        if kind == 'student':
+            image_type, _, variant = parts[2].partition('.')
+            fields = [f'asset_id__asset_{image_type}_data']
+            if variant == 'webp':
+                fields.insert(0, f'asset_id__asset_{image_type}_webp')
+            row = Student.objects.filter(student_id=object_id).values_list(
+                'student_name', 'version_id__version_name', *fields
+            ).first()
+            if not row:
+                return None
+            name, version, *images = row
+            for field, image_bytes in zip(fields, images):
+                if image_bytes:
+                    extension = 'webp' if field.endswith('_webp') else 'png'
+                    return bytes(image_bytes), f'{name}_{version}_{image_type}.{extension}'
+            return None
+
+        model, pk, name_field, image_field = {
+            'school': (School, 'school_id', 'school_name', 'school_image'),
+            'banner': (GachaBanner, 'banner_id', 'banner_name', 'banner_image'),
+            'achievement': (Achievement, 'achievement_id', 'achievement_name', 'achievement_image'),
+        }[kind]
+        row = model.objects.filter(**{pk: object_id}).values_list(name_field, image_field).first()
+        if not row or not row[1]:
+            return None
+        return bytes(row[1]), f'{row[0]}.png'
+
+class ImageWSGIApp:
+    """WSGI wrapper: serves images through ImageServer, everything else through `app`."""
+
+    def __init__(self, app: Callable, server: Optional[ImageServer] = None):
+        self.app = app
+        self.server = server or ImageServer()
+
+    def __call__(self, environ, start_response):
+        matched = self.server.match(environ['REQUEST_METHOD'], environ.get('PATH_INFO', ''), environ.get('HTTP_ACCEPT', ''))
+        if matched:
+            response = self.server.from_memory(*matched) or self.server.from_database(*matched)
+            if response:
+                IMAGE_BYTES_SERVED.inc(len(response.body), kind=matched[0].split('/', 1)[0])
+                start_response('200 OK', response.headers)
+                return [b''] if environ['REQUEST_METHOD'] == 'HEAD' else [response.body]
+        return self.app(environ, start_response)
+
+class ImageASGIApp:
+    """ASGI wrapper: serves images through ImageServer, everything else through `app`."""
+
+    def __init__(self, app: Callable, server: Optional[ImageServer] = None):
+        self.app = app
+        self.server = server or ImageServer()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            accept = next((value.decode('latin-1') for name, value in scope['headers'] if name == b'accept'), '')
+            matched = self.server.match(scope['method'], scope['path'], accept)
+            if matched:
+                response = self.server.from_memory(*matched) \
+                    or await sync_to_async(self.server.from_database, thread_sensitive=True)(*matched)
+                if response:
+                    IMAGE_BYTES_SERVED.inc(len(response.body), kind=matched[0].split('/', 1)[0])
+                    await send({
+                        'type': 'http.response.start',
+                        'status': 200,
+                        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers],
+                    })
+                    await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else response.body})
+                    return
+        await self.app(scope, receive, send)
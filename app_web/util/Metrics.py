@@ -0,0 +1,341 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+
+class Metric:
+    TYPE = ''
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, help: str, labels: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        # label values -> value
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels[label]) for label in self.labels)
+
+class Counter(Metric):
+    """A total that only goes up, e.g. requests or bytes served."""
+    TYPE = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self.registry.lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self.registry.maybe_flush()
+
+class Histogram(Metric):
+    """
+    Observations counted into fixed `buckets` (upper bounds, in seconds for
+    latencies), with their sum and count, e.g. request durations.
+    """
+    TYPE = 'histogram'
+
+    def __init__(self, registry, name, help, labels=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self.registry.lock:
+            # Per-bucket counts (the last one is +Inf), then sum and count.
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            values[bisect.bisect_left(self.buckets, value)] += 1
+            values[-2] += value
+            values[-1] += 1
+        self.registry.maybe_flush()
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+class MetricsRegistry:
+    """
+    Counters and latency histograms for the hot paths, rendered in the
+    Prometheus text format by the staff-only `metrics` view.
+
+    Updates only touch this process's memory. Every FLUSH_INTERVAL seconds
+    (on the next update) the process writes a snapshot of its values to
+    `<directory>/<pid>-<start time>.json`; rendering merges the snapshots of
+    every process, so whichever gunicorn worker answers the scrape reports the
+    totals of all of them. A forked child starts from zero, since its parent
+    reports its own. The start time keeps a process that reuses an old pid
+    from overwriting a snapshot.
+
+    Every process that records a metric writes one (recycled workers,
+    runserver reloads, management commands). When a process has exited, the
+    next flush of a running one adopts its snapshot: the values are added to
+    the adopter's own snapshot, which lists the adopted file so readers skip
+    it, and the file is deleted. Totals never go backwards and the directory
+    holds about one file per running process. The gunicorn master calls
+    `clear()` before it starts its workers (see gunicorn.conf.py), so a
+    restart begins from zero.
+
+        ```python
+        PULLS = REGISTRY.counter('gacha_pulls_total', 'Students pulled.', ('draw',))
+        PULLS.inc(10, draw='ten')
+        with ENGINE_BUILD_SECONDS.time():
+            engine = GachaEngine(banner)
+        ```
+    """
+    FLUSH_INTERVAL = 5.0 # seconds
+    # Snapshot entry listing the files of exited processes whose values it includes.
+    ADOPTED_KEY = '_adopted'
+
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+        self.metrics: Dict[str, Metric] = {}
+        self.lock = threading.Lock()
+        self._next_flush = 0.0
+        self._snapshot_name = self._process_name()
+        # Values and file names of the snapshots this process adopted.
+        self._inherited: Dict[str, Dict[Tuple[str, ...], object]] = {}
+        self._adopted: List[str] = []
+        os.register_at_fork(after_in_child=self._reset)
+
+    @property
+    def directory(self) -> Optional[str]:
+        return self._directory or getattr(settings, 'METRICS_DIR', None)
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help, labels, buckets))
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered.")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def _reset(self) -> None:
+        self.lock = threading.Lock()
+        for metric in self.metrics.values():
+            metric._values = {}
+        self._next_flush = 0.0
+        self._snapshot_name = self._process_name()
+        # The parent keeps reporting what it adopted.
+        self._inherited, self._adopted = {}, []
+
+    @staticmethod
+    def _process_name() -> str:
+        return f'{os.getpid()}-{time.time_ns()}.json'
+
+    # ===================================================================
+    # --- SHARING BETWEEN WORKERS ---
+    # ===================================================================
+    def maybe_flush(self) -> None:
+        if time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes this process's snapshot for the other workers to read."""
+        self._next_flush = time.monotonic() + self.FLUSH_INTERVAL
+        directory = self.directory
+        if not directory:
+            return
+        path = os.path.join(directory, self._snapshot_name)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            adopted = self._adopt_exited(directory)
+            # Replaced in one step, so a reader never sees a half-written snapshot.
+            with open(f'{path}.tmp', 'w') as file:
+                json.dump(self._snapshot(), file, separators=(',', ':'))
+            os.replace(f'{path}.tmp', path)
+            # Only now that our snapshot lists them can the adopted files go.
+            for adopted_path in adopted:
+                for leftover in (adopted_path, f'{adopted_path}.claim'):
+                    try:
+                        os.remove(leftover)
+                    except FileNotFoundError:
+                        pass
+        except OSError as e:
+            print(f"WARNING: Could not write metrics to {directory}: {e}")
+
+    def _adopt_exited(self, directory: str) -> List[str]:
+        """
+        Adds the snapshots of exited processes to this process's values.
+        Returns their paths, to delete once our own snapshot has been written.
+        """
+        adopted = []
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            name = os.path.basename(path)
+            if name == self._snapshot_name or name in self._adopted or self._is_running(name):
+                continue
+            # The claim file makes sure a single process adopts each snapshot.
+            try:
+                os.close(os.open(f'{path}.claim', os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            except FileExistsError:
+                continue
+            try:
+                with open(path) as file:
+                    snapshot = json.load(file)
+            except (OSError, ValueError):
+                os.remove(f'{path}.claim')
+                continue
+            with self.lock:
+                self._merge(self._inherited, snapshot)
+                # An adopter that exited before deleting what it adopted hands that on too.
+                self._adopted.extend([name, *snapshot.get(self.ADOPTED_KEY, [])])
+            adopted.extend([path, *(os.path.join(directory, other) for other in snapshot.get(self.ADOPTED_KEY, []))])
+        return adopted
+
+    @staticmethod
+    def _is_running(name: str) -> bool:
+        try:
+            pid = int(name.split('-', 1)[0])
+        except ValueError:
+            return True # not a snapshot name: leave it alone
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass # running, as another user
+        return True
+
+    def clear(self) -> None:
+        """Deletes every snapshot. Call once per server start, before the workers fork."""
+        directory = self.directory
+        if not directory:
+            return
+        for path in (
+            glob.glob(os.path.join(directory, '*.json')) + glob.glob(os.path.join(directory, '*.json.tmp'))
+            + glob.glob(os.path.join(directory, '*.json.claim'))
+        ):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+
+    def _snapshot(self) -> Dict[str, list]:
+        with self.lock:
+            values: Dict[str, Dict[Tuple[str, ...], object]] = {name: {} for name in self.metrics}
+            self._merge(values, {name: list(metric._values.items()) for name, metric in self.metrics.items()})
+            self._merge(values, {name: list(entries.items()) for name, entries in self._inherited.items()})
+            snapshot = {name: [[list(key), value] for key, value in entries.items()] for name, entries in values.items()}
+            snapshot[self.ADOPTED_KEY] = list(self._adopted)
+            return snapshot
+
+    def collect(self) -> Dict[str, Dict[Tuple[str, ...], object]]:
+        """The values of every process, summed: metric name -> label values -> value."""
+        self.flush()
+        snapshots = self._read_snapshots()
+        adopted = set(self._adopted).union(*(snapshot.get(self.ADOPTED_KEY, []) for snapshot in snapshots.values()))
+
+        totals: Dict[str, Dict[Tuple[str, ...], object]] = {name: {} for name in self.metrics}
+        self._merge(totals, self._snapshot())
+        for name, snapshot in snapshots.items():
+            if name not in adopted:
+                self._merge(totals, snapshot)
+        return totals
+
+    def _read_snapshots(self) -> Dict[str, dict]:
+        """The snapshots of the other processes, by file name."""
+        if not self.directory:
+            return {}
+        for _ in range(3):
+            snapshots, vanished = {}, False
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                name = os.path.basename(path)
+                if name == self._snapshot_name:
+                    continue
+                try:
+                    with open(path) as file:
+                        snapshots[name] = json.load(file)
+                except FileNotFoundError:
+                    # Adopted while we were reading: its adopter's snapshot may have been read before it took it.
+                    vanished = True
+                except (OSError, ValueError):
+                    continue # written by a worker that exited mid-flush
+            if not vanished:
+                break
+        return snapshots
+
+    def _merge(self, totals: Dict[str, Dict[Tuple[str, ...], object]], snapshot: Dict[str, list]) -> None:
+        """Adds a snapshot's [label values, value] entries to `totals`, for the registered metrics only."""
+        for name, entries in snapshot.items():
+            if name not in self.metrics:
+                continue
+            metric_totals = totals.setdefault(name, {})
+            for key, value in entries:
+                key = tuple(key)
+                current = metric_totals.get(key)
+                if current is None:
+                    metric_totals[key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    if len(value) == len(current): # skip snapshots from an older bucket layout
+                        metric_totals[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    metric_totals[key] = current + value
+
+    # ===================================================================
+    # --- PROMETHEUS TEXT FORMAT ---
+    # ===================================================================
+    def render(self) -> str:
+        totals = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.TYPE}')
+            for key, value in sorted(totals[name].items()):
+                labels = list(zip(metric.labels, key))
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip((*metric.buckets, '+Inf'), value[:-2]):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{self._labels(labels + [("le", bound)])} {cumulative}')
+                    lines.append(f'{name}_sum{self._labels(labels)} {value[-2]}')
+                    lines.append(f'{name}_count{self._labels(labels)} {value[-1]}')
+                else:
+                    lines.append(f'{name}{self._labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _labels(labels: List[Tuple[str, object]]) -> str:
+        if not labels:
+            return ''
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+        return '{' + ','.join(f'{label}="{value}"' for (label, _), value in zip(labels, escaped)) + '}'
+
+REGISTRY = MetricsRegistry()
+
+# --- =============================================================== ---
+# --- APPLICATION METRICS                                             ---
+# --- =============================================================== ---
+CACHE_REQUESTS = REGISTRY.counter(
+    'gacha_cache_requests_total', 'Cache lookups per CacheNamespace, by result (hit, miss, refresh).', ('namespace', 'result')
+)
+CACHE_GET_SECONDS = REGISTRY.histogram(
+    'gacha_cache_get_seconds', 'Time to read from the cache backend, per CacheNamespace.', ('namespace',), FAST_BUCKETS
+)
+CACHE_COMPUTE_SECONDS = REGISTRY.histogram(
+    'gacha_cache_compute_seconds', 'Time to compute a value on a cache miss or early refresh, per CacheNamespace.', ('namespace',)
+)
+PULLS = REGISTRY.counter('gacha_pulls_total', 'Students pulled, by draw (one, ten).', ('draw',))
+PULL_SECONDS = REGISTRY.histogram('gacha_pull_seconds', 'Time to handle a pull request, by draw (one, ten).', ('draw',))
+ENGINE_BUILD_SECONDS = REGISTRY.histogram('gacha_engine_build_seconds', 'Time to build the GachaEngine of a banner.', (), FAST_BUCKETS)
+ACHIEVEMENT_EVALUATION_SECONDS = REGISTRY.histogram(
+    'gacha_achievement_evaluation_seconds', 'Time to evaluate achievements, in the pull request (sync) or the worker (async).', ('mode',)
+)
+IMAGE_BYTES_SERVED = REGISTRY.counter(
+    'gacha_image_bytes_served_total', 'Image bytes served, by kind (school, banner, achievement, student, batch, atlas).', ('kind',)
+)
@@ -0,0 +1,201 @@
+import functools
+import json
+import logging
+import os
+import random
+import re
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+from django.template.base import Template
+
+logger = logging.getLogger('app_web.profiling')
+
+_current: ContextVar[Optional['RequestProfile']] = ContextVar('request_profile', default=None)
+
+class RequestProfile:
+    """
+    Where one request spent its time: SQL (with every query), cache, template
+    rendering and the view. Code outside the middleware reports into the
+    active profile with `RequestProfile.record()`, which does nothing when no
+    request is being profiled.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view_start: Optional[float] = None
+        self.timings: Dict[str, float] = {'db': 0.0, 'cache': 0.0, 'template': 0.0}
+        self.queries: List[dict] = []
+        self.rendering = False
+
+    @staticmethod
+    def record(name: str, seconds: float) -> None:
+        profile = _current.get()
+        if profile is not None:
+            profile.timings[name] = profile.timings.get(name, 0.0) + seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        # A connection.execute_wrapper(): times every query the request runs.
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings['db'] += elapsed
+            self.queries.append({
+                'alias': context['connection'].alias, 'sql': sql, 'params': params, 'many': many, 'ms': elapsed * 1000,
+            })
+
+class ProfilingMiddleware:
+    """
+    Profiles every request when PROFILING_ENABLED is on:
+
+    - A `Server-Timing` header (total, view, db with the query count, cache,
+      template), shown per request in the browser's network panel.
+    - A JSON log line on the `app_web.profiling` logger for a
+      PROFILING_SAMPLE_RATE fraction of requests, and for every slow one.
+    - Requests slower than PROFILING_SLOW_MS are saved to PROFILING_SLOW_DIR
+      with every query and its timing, and the EXPLAIN output of each distinct
+      SELECT. The newest PROFILING_SLOW_KEEP captures are kept. Query
+      parameters (session keys, usernames) are only saved with
+      PROFILING_CAPTURE_PARAMS on; the EXPLAIN uses them either way.
+
+    When disabled it raises MiddlewareNotUsed, so Django leaves it out of the
+    stack and requests pay nothing. The view time runs from the view's call to
+    the response, so it includes the template time.
+    """
+    MAX_EXPLAINS = 50 # distinct statements explained per slow request
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.slow_seconds = settings.PROFILING_SLOW_MS / 1000
+        self.slow_dir = str(settings.PROFILING_SLOW_DIR)
+        self.slow_keep = settings.PROFILING_SLOW_KEEP
+        self.capture_params = getattr(settings, 'PROFILING_CAPTURE_PARAMS', False)
+        _instrument_templates()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        total = time.perf_counter() - profile.start
+        view = time.perf_counter() - profile.view_start if profile.view_start else 0.0
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={total * 1000:.1f}',
+            f'view;dur={view * 1000:.1f}',
+            f'db;dur={profile.timings["db"] * 1000:.1f};desc="{len(profile.queries)} queries"',
+            *(f'{name};dur={seconds * 1000:.1f}' for name, seconds in profile.timings.items() if name != 'db'),
+        ])
+
+        slow = total >= self.slow_seconds
+        if slow or random.random() < self.sample_rate:
+            entry = {
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 2),
+                'view_ms': round(view * 1000, 2),
+                'queries': len(profile.queries),
+                **{f'{name}_ms': round(seconds * 1000, 2) for name, seconds in profile.timings.items()},
+            }
+            if slow:
+                entry['capture'] = self._capture(request, profile, entry)
+            logger.info(json.dumps(entry))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current.get()
+        if profile is not None:
+            profile.view_start = time.perf_counter()
+        return None
+
+    # ===================================================================
+    # --- SLOW REQUEST CAPTURE ---
+    # ===================================================================
+    def _capture(self, request, profile: RequestProfile, entry: dict) -> Optional[str]:
+        """Saves the request's queries with their EXPLAIN output. Returns the capture's path."""
+        explains = {}
+        for query in profile.queries:
+            statement = (query['alias'], query['sql'])
+            if statement in explains or len(explains) >= self.MAX_EXPLAINS or query['many']:
+                continue
+            if query['sql'].lstrip()[:6].upper() == 'SELECT':
+                explains[statement] = self._explain(query)
+
+        capture = {
+            **entry,
+            'query_string': request.META.get('QUERY_STRING', ''),
+            'captured_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'statements': [
+                {
+                    **{key: value for key, value in query.items() if key != 'params' or self.capture_params},
+                    'explain': explains.get((query['alias'], query['sql'])),
+                }
+                for query in profile.queries
+            ],
+        }
+        slug = re.sub(r'[^a-zA-Z0-9]+', '-', request.path).strip('-')[:60] or 'root'
+        path = os.path.join(self.slow_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{int(entry['total_ms'])}ms-{slug}.json")
+        try:
+            os.makedirs(self.slow_dir, exist_ok=True)
+            with open(path, 'w') as file:
+                json.dump(capture, file, indent=2, default=str)
+            self._trim()
+        except OSError as e:
+            logger.warning(f"Could not save slow request capture to {self.slow_dir}: {e}")
+            return None
+        return path
+
+    @staticmethod
+    def _explain(query: dict) -> List[str]:
+        connection = connections[query['alias']]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"{connection.ops.explain_query_prefix()} {query['sql']}", query['params'])
+                return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+        except DatabaseError as e:
+            return [f'EXPLAIN failed: {e}']
+
+    def _trim(self) -> None:
+        captures = sorted(
+            (entry for entry in os.scandir(self.slow_dir) if entry.name.endswith('.json')),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in captures[:max(len(captures) - self.slow_keep, 0)]:
+            os.remove(entry.path)
+
+def _instrument_templates() -> None:
+    """Times Template.render() into the active profile; includes inside a template count towards it."""
+    original = Template.render
+    if getattr(original, 'profiled', False):
+        return
+
+    @functools.wraps(original)
+    def render(self, context):
+        profile = _current.get()
+        if profile is None or profile.rendering:
+            return original(self, context)
+        profile.rendering = True
+        start = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            profile.rendering = False
+            profile.timings['template'] += time.perf_counter() - start
+
+    render.profiled = True
+    Template.render = render
@@ -0,0 +1,201 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+class SQLiteCache(BaseCache):
+    """
+    A Django cache backend stored in one SQLite file in WAL mode, shared by
+    every process on the host that points at the same LOCATION: the gunicorn
+    workers see each other's entries, `add()` locks and `incr()` counters,
+    without running a cache server.
+
+    WAL lets readers run alongside the single writer, so a get never waits
+    for a set. Each thread of each process keeps its own connection. Writes
+    that read first (`incr()`, culling) take the write lock up front with
+    BEGIN IMMEDIATE, which makes them atomic across processes.
+
+    Expiry times are absolute (None for "forever"; a zero timeout stores a
+    past time). Entries past their expiry are ignored on read and removed by
+    the periodic cull, which also trims the table back under MAX_ENTRIES by
+    dropping the least recently written 1/CULL_FREQUENCY of it.
+
+        ```python
+        CACHES = {
+            'default': {
+                'BACKEND': 'app_web.util.SQLiteCache.SQLiteCache',
+                'LOCATION': BASE_DIR / 'cache.sqlite3',
+                'OPTIONS': {'MAX_ENTRIES': 5000},
+            }
+        }
+        ```
+    """
+    CULL_EVERY = 100 # writes between two culls, per process
+    BUSY_TIMEOUT = 5.0 # seconds a write waits for the lock before failing
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS cache_entry (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+        'CREATE INDEX IF NOT EXISTS cache_entry_expires ON cache_entry (expires)',
+    )
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = str(location)
+        self._local = threading.local()
+        self._writes = 0
+
+    # ===================================================================
+    # --- CONNECTION ---
+    # ===================================================================
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        # Never reuse a connection inherited from the parent across a fork.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.BUSY_TIMEOUT, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # A cache can lose its last writes on power loss; no fsync per commit.
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def close(self, **kwargs):
+        # Called after every request: keep the connection, like a persistent database connection.
+        pass
+
+    # ===================================================================
+    # --- CACHE API ---
+    # ===================================================================
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection.execute(
+            'SELECT value FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def get_many(self, keys, version=None) -> Dict[str, Any]:
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not keys:
+            return {}
+        rows = self._connection.execute(
+            f"SELECT key, value FROM cache_entry WHERE key IN ({','.join('?' * len(keys))}) AND (expires IS NULL OR expires > ?)",
+            (*keys, time.time()),
+        ).fetchall()
+        return {keys[key]: pickle.loads(value) for key, value in rows}
+
+    def has_key(self, key, version=None) -> bool:
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection.execute(
+            'SELECT 1 FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone() is not None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._connection.execute(
+            'INSERT OR REPLACE INTO cache_entry (key, value, expires) VALUES (?, ?, ?)',
+            (key, self._dumps(value), self.get_backend_timeout(timeout)),
+        )
+        self._wrote()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None) -> List[str]:
+        expires = self.get_backend_timeout(timeout)
+        rows = [(self.make_and_validate_key(key, version=version), self._dumps(value), expires) for key, value in data.items()]
+        if not rows:
+            return []
+        with self._transaction() as connection:
+            connection.executemany('INSERT OR REPLACE INTO cache_entry (key, value, expires) VALUES (?, ?, ?)', rows)
+        self._wrote(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        key = self.make_and_validate_key(key, version=version)
+        # One statement: only replaces an entry that has expired, so concurrent add()s elect a single winner.
+        cursor = self._connection.execute(
+            'INSERT INTO cache_entry (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+            'WHERE cache_entry.expires IS NOT NULL AND cache_entry.expires <= ?',
+            (key, self._dumps(value), self.get_backend_timeout(timeout), time.time()),
+        )
+        self._wrote()
+        return cursor.rowcount > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection.execute(
+            'UPDATE cache_entry SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        cache_key = self.make_and_validate_key(key, version=version)
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT value FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)', (cache_key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found.")
+            value = pickle.loads(row[0]) + delta
+            connection.execute('UPDATE cache_entry SET value = ? WHERE key = ?', (self._dumps(value), cache_key))
+        return value
+
+    def delete(self, key, version=None) -> bool:
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection.execute('DELETE FROM cache_entry WHERE key = ?', (key,)).rowcount > 0
+
+    def delete_many(self, keys, version=None) -> None:
+        keys = [(self.make_and_validate_key(key, version=version),) for key in keys]
+        if keys:
+            with self._transaction() as connection:
+                connection.executemany('DELETE FROM cache_entry WHERE key = ?', keys)
+
+    def clear(self) -> None:
+        self._connection.execute('DELETE FROM cache_entry')
+
+    # ===================================================================
+    # --- HELPERS ---
+    # ===================================================================
+    def _transaction(self) -> '_ImmediateTransaction':
+        return _ImmediateTransaction(self._connection)
+
+    @staticmethod
+    def _dumps(value: Any) -> bytes:
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _wrote(self, count: int = 1) -> None:
+        self._writes += count
+        if self._writes >= self.CULL_EVERY:
+            self._writes = 0
+            self._cull()
+
+    def _cull(self) -> None:
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM cache_entry WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+            count = connection.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+            if count <= self._max_entries:
+                return
+            if self._cull_frequency == 0:
+                connection.execute('DELETE FROM cache_entry')
+                return
+            # INSERT OR REPLACE gives a rewritten entry a new rowid, so the lowest rowids were written longest ago.
+            connection.execute(
+                'DELETE FROM cache_entry WHERE rowid IN (SELECT rowid FROM cache_entry ORDER BY rowid LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
+
+class _ImmediateTransaction:
+    """BEGIN IMMEDIATE ... COMMIT (or ROLLBACK on error) on an autocommit connection."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
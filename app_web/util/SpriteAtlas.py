@@ -0,0 +1,306 @@
+import hashlib
+import json
+import math
+import os
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, List, Optional
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.urls import reverse
+
+from ..models import Student
+
+class SpriteAtlas:
+    """
+    Packs every student portrait into a handful of versioned sprite sheets
+    (one per school, one per rarity and one for the whole catalog) and keeps a
+    JSON coordinate map next to them.
+
+    Pages that show many portraits (the collection tab, the student page) can
+    then render each portrait as a slice of a sheet instead of issuing one
+    `serve_student_image` request per student.
+
+    Example:
+        ```python
+        SpriteAtlas.build()                          # Only rebuilds if the catalog changed
+        sprite = SpriteAtlas.sprite(12, 'rarity')    # None if the atlas is not built
+        ```
+    """
+    ATLAS_DIR = getattr(settings, 'SPRITE_ATLAS_DIR', os.path.join(settings.BASE_DIR, 'atlas'))
+    MANIFEST_NAME = 'manifest.json'
+    FORMAT = 'WEBP'
+    EXTENSION = 'webp'
+    QUALITY = 85
+
+    # Native portrait size. Sheets store scaled-down tiles with the same aspect.
+    PORTRAIT_SIZE = (404, 456)
+    TILE_WIDTH = {
+        'school': 404,  # The student page shows large portraits, keep full size.
+        'rarity': 202,  # The collection grid shows ~200px cards.
+        'all': 202,
+    }
+
+    # Per-process copy of the manifest, refreshed when the file changes on disk.
+    _manifest: Optional[dict] = None
+    _manifest_mtime: Optional[float] = None
+    _manifest_checked_at: float = 0.0
+    MANIFEST_CHECK_INTERVAL = 1.0 # seconds
+    # Sheets of older generations are deleted once they are this old (see _remove_stale_sheets()).
+    STALE_SHEET_AGE = 3600 # seconds
+
+    # ===================================================================
+    # --- BUILD ---
+    # ===================================================================
+    @classmethod
+    def catalog_signature(cls) -> str:
+        """A fingerprint of everything that affects the sheets' content or layout."""
+        rows = Student.objects.order_by('student_id').values_list(
+            'student_id', 'school_id', 'student_rarity', 'asset_id__asset_pair_hash'
+        )
+        digest = hashlib.sha256()
+        for row in rows:
+            digest.update(repr(row).encode())
+        digest.update(repr(sorted(cls.TILE_WIDTH.items())).encode())
+        return digest.hexdigest()
+
+    @classmethod
+    def build(cls, force: bool = False) -> dict:
+        """
+        Builds the sprite sheets and the manifest. When the catalog signature
+        matches the existing manifest nothing is rebuilt, unless `force` is set.
+        """
+        signature = cls.catalog_signature()
+        current = cls._read_manifest_file()
+        if current and current.get('signature') == signature and not force:
+            return current
+
+        os.makedirs(cls.ATLAS_DIR, exist_ok=True)
+
+        # --- Step 1: Work out which sheet every student belongs to ---
+        students = list(
+            Student.objects.filter(asset_id__isnull=False)
+            .order_by('student_id')
+            .values_list('student_id', 'school_id', 'student_rarity')
+        )
+        groups: Dict[str, List[int]] = defaultdict(list)
+        for student_id, school_id, rarity in students:
+            groups[f'school-{school_id}'].append(student_id)
+            groups[f'rarity-{rarity}'].append(student_id)
+            groups['all'].append(student_id)
+
+        # --- Step 2: Lay out a near-square grid and allocate a canvas per sheet ---
+        layouts = {}
+        canvases = {}
+        for group_name, student_ids in groups.items():
+            kind = cls._kind(group_name)
+            tile_w, tile_h = cls._tile_size(kind)
+            columns = math.ceil(math.sqrt(len(student_ids)))
+            rows = math.ceil(len(student_ids) / columns)
+            layouts[group_name] = {
+                'kind': kind,
+                'tile': [tile_w, tile_h],
+                'columns': columns,
+                'rows': rows,
+                'cells': {sid: divmod(i, columns)[::-1] for i, sid in enumerate(student_ids)},
+            }
+            canvases[group_name] = Image.new('RGBA', (columns * tile_w, rows * tile_h), (0, 0, 0, 0))
+
+        # --- Step 3: Decode each portrait once and paste it into all its sheets ---
+        portraits = (
+            Student.objects.filter(asset_id__isnull=False)
+            .values_list('student_id', 'school_id', 'student_rarity', 'asset_id__asset_portrait_data')
+            .iterator(chunk_size=20)
+        )
+        for student_id, school_id, rarity, portrait_bytes in portraits:
+            if not portrait_bytes:
+                continue
+            portrait = Image.open(BytesIO(bytes(portrait_bytes))).convert('RGBA')
+            tiles = {}
+            for group_name in (f'school-{school_id}', f'rarity-{rarity}', 'all'):
+                layout = layouts[group_name]
+                tile_size = tuple(layout['tile'])
+                if tile_size not in tiles:
+                    tiles[tile_size] = ImageOps.fit(portrait, tile_size, Image.LANCZOS)
+                col, row = layout['cells'][student_id]
+                canvases[group_name].paste(tiles[tile_size], (col * tile_size[0], row * tile_size[1]))
+
+        # --- Step 4: Encode the sheets in parallel and write them under content-hashed names ---
+        # Pillow releases the GIL while encoding, so threads use every core here.
+        with ThreadPoolExecutor() as executor:
+            encoded = dict(zip(canvases.keys(), executor.map(cls._encode, canvases.values())))
+
+        sheets = {}
+        for group_name, data in encoded.items():
+            filename = f'{group_name}.{hashlib.sha256(data).hexdigest()[:12]}.{cls.EXTENSION}'
+            cls._atomic_write(os.path.join(cls.ATLAS_DIR, filename), data)
+
+            layout = layouts[group_name]
+            sheets[group_name] = {
+                'file': filename,
+                'tile': layout['tile'],
+                'columns': layout['columns'],
+                'rows': layout['rows'],
+            }
+
+        # --- Step 5: Write the coordinate map last, so readers never see a half-built atlas ---
+        students_map = defaultdict(dict)
+        for group_name, layout in layouts.items():
+            for student_id, (col, row) in layout['cells'].items():
+                students_map[str(student_id)][layout['kind']] = [group_name, col, row]
+
+        manifest = {
+            'signature': signature,
+            'version': signature[:12],
+            'sheets': sheets,
+            'students': students_map,
+        }
+        cls._atomic_write(os.path.join(cls.ATLAS_DIR, cls.MANIFEST_NAME), json.dumps(manifest).encode())
+
+        # Keep the previous generation too: other workers may still be serving
+        # pages that reference it until they notice the new manifest. Anything
+        # older is deleted once it has aged out.
+        keep = {sheet['file'] for sheet in sheets.values()}
+        if current:
+            keep |= {sheet['file'] for sheet in current.get('sheets', {}).values()}
+        cls._remove_stale_sheets(keep)
+
+        # Force the next lookup in this process to pick up the new manifest.
+        cls._manifest_checked_at = 0.0
+        return manifest
+
+    # ===================================================================
+    # --- LOOKUP ---
+    # ===================================================================
+    @classmethod
+    def get_manifest(cls) -> Optional[dict]:
+        """
+        Returns the current manifest, or None if the atlas has not been built.
+        The file is re-checked at most once per MANIFEST_CHECK_INTERVAL, so a
+        rebuild in one worker is picked up by the others shortly after.
+        """
+        now = time.monotonic()
+        if now - cls._manifest_checked_at < cls.MANIFEST_CHECK_INTERVAL:
+            return cls._manifest
+        cls._manifest_checked_at = now
+
+        path = os.path.join(cls.ATLAS_DIR, cls.MANIFEST_NAME)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            cls._manifest, cls._manifest_mtime = None, None
+            return None
+
+        if mtime != cls._manifest_mtime:
+            cls._manifest = cls._read_manifest_file()
+            cls._manifest_mtime = mtime
+        return cls._manifest
+
+    @classmethod
+    def sprite(cls, student_id: int, kind: str) -> Optional[dict]:
+        """
+        Returns the CSS needed to draw a student's portrait from the sheet of
+        the given kind ('school', 'rarity' or 'all'), or None if the student
+        is not in the atlas and the caller should fall back to the image URL.
+        """
+        manifest = cls.get_manifest()
+        if not manifest:
+            return None
+
+        entry = manifest['students'].get(str(student_id), {}).get(kind)
+        if not entry:
+            return None
+
+        group_name, col, row = entry
+        sheet = manifest['sheets'][group_name]
+        columns, rows = sheet['columns'], sheet['rows']
+        tile_w, tile_h = sheet['tile']
+
+        # Percentage positions keep the sprite correct at any rendered size.
+        x = (col / (columns - 1) * 100) if columns > 1 else 0
+        y = (row / (rows - 1) * 100) if rows > 1 else 0
+        url = reverse('serve_atlas_image', args=[sheet['file']])
+        sprite = {
+            'url': url,
+            'size': f'{columns * 100}% {rows * 100}%',
+            'position': f'{x:.4f}% {y:.4f}%',
+            'aspect': f'{tile_w} / {tile_h}',
+        }
+        sprite['style'] = (
+            f"background-image: url('{url}'); background-size: {sprite['size']}; "
+            f"background-position: {sprite['position']}; aspect-ratio: {sprite['aspect']};"
+        )
+        return sprite
+
+    @classmethod
+    def sheet_path(cls, filename: str) -> Optional[str]:
+        """Resolves a sheet filename to a path inside ATLAS_DIR, rejecting anything else."""
+        if os.path.basename(filename) != filename or not filename.endswith(f'.{cls.EXTENSION}'):
+            return None
+        path = os.path.join(cls.ATLAS_DIR, filename)
+        return path if os.path.isfile(path) else None
+
+    @classmethod
+    def schedule_rebuild(cls) -> None:
+        """Rebuilds the atlas in the background once a burst of catalog changes settles."""
+        from .BackgroundTask import debounce
+        debounce('sprite_atlas', cls.build)
+
+    # ===================================================================
+    # --- HELPERS ---
+    # ===================================================================
+    @classmethod
+    def _encode(cls, canvas: Image.Image) -> bytes:
+        buffer = BytesIO()
+        canvas.save(buffer, format=cls.FORMAT, quality=cls.QUALITY)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _kind(group_name: str) -> str:
+        return group_name.split('-', 1)[0]
+
+    @classmethod
+    def _tile_size(cls, kind: str):
+        tile_w = cls.TILE_WIDTH[kind]
+        base_w, base_h = cls.PORTRAIT_SIZE
+        return tile_w, round(tile_w * base_h / base_w)
+
+    @classmethod
+    def _read_manifest_file(cls) -> Optional[dict]:
+        try:
+            with open(os.path.join(cls.ATLAS_DIR, cls.MANIFEST_NAME)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes) -> None:
+        # A temporary name of its own, so overlapping builds never write into each other's file.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o644) # mkstemp creates it private to this user
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def _remove_stale_sheets(cls, keep: set) -> None:
+        """
+        Deletes the sheets in neither `keep` nor written in the last
+        STALE_SHEET_AGE seconds, so pages rendered between two quick rebuilds
+        still find theirs.
+        """
+        cutoff = time.time() - cls.STALE_SHEET_AGE
+        for entry in os.scandir(cls.ATLAS_DIR):
+            if entry.name.endswith(f'.{cls.EXTENSION}') and entry.name not in keep:
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
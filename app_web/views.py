@@ -1,28 +1,58 @@
+import functools
 import itertools
 import json
 import statistics
 import tempfile
 from decimal import Decimal
-from django.core.cache import cache
+from django.conf import settings
 from django.core.paginator import Paginator
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.staticfiles import finders
 from django.db import transaction
-from django.db.models import Count, Min
-from django.http import JsonResponse, HttpRequest, HttpResponse, FileResponse, HttpResponseNotFound, HttpResponseBadRequest, HttpResponseRedirect
+from django.db.models import Case, Count, Min, F, IntegerField, Prefetch, Value, When
+from django.http import JsonResponse, HttpRequest, HttpResponse, FileResponse, HttpResponseNotFound, HttpResponseBadRequest, HttpResponseRedirect, HttpResponseForbidden
 from django.shortcuts import render, get_object_or_404, redirect
 from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.views.decorators.http import require_POST, require_GET
 from collections import Counter, defaultdict
 
 from .models import School, Student, Version, GachaBanner, GachaTransaction, UserInventory, Achievement, UnlockAchievement
 from .util.GachaEngine import GachaEngine
 from .util.AchievementEngine import AchievementEngine
+from .util.AchievementQueue import AchievementQueue
+from .util.Cache import CacheNamespace, ModelCodec
+from .util.ImagePack import ImagePack
+from .util.Metrics import REGISTRY, ACHIEVEMENT_EVALUATION_SECONDS, ENGINE_BUILD_SECONDS, IMAGE_BYTES_SERVED, PULLS, PULL_SECONDS
+from .util.SpriteAtlas import SpriteAtlas
 
 CACHE_IMAGE_TIMEOUT = 300 # 5 minutes 
+MAX_BATCH_IMAGES = 40 # Enough for a 10-pull reveal with portraits and artworks
+
+# Cached data, by namespace (see CacheNamespace). Not-found images are cached as None for a minute.
+DASHBOARD_PULLS = CacheNamespace(
+    'user_dashboard_data', timeout=10, codec=ModelCodec(GachaTransaction, related=('student_id', 'banner_id'))
+)
+USER_PODIUM = CacheNamespace(
+    'user_podium', timeout=10, codec=ModelCodec(Student, related=('school_id', 'version_id'), attrs=('count', 'first_obtained'))
+)
+BANNER_IMAGES = CacheNamespace('banner_image', timeout=3600)
+ACHIEVEMENT_IMAGES = CacheNamespace('achievement_image', timeout=60)
+STUDENT_IMAGES = CacheNamespace('student_image', timeout=CACHE_IMAGE_TIMEOUT)
+
+# Which ImageAsset fields hold each student image type, and its WebP variant.
+STUDENT_IMAGE_FIELDS = {
+    'portrait': 'asset_portrait_data',
+    'artwork': 'asset_artwork_data',
+}
+STUDENT_WEBP_FIELDS = {
+    'portrait': 'asset_portrait_webp',
+    'artwork': 'asset_artwork_webp',
+}
 
 def _process_students_for_template(students_queryset):
     """Helper function to group students and prepare their data for the template."""
@@ -52,33 +82,24 @@ def _process_students_for_template(students_queryset):
 def get_user_pull_data(user):
     """
     This is the core of the optimization. It fetches all of a user's pull data
-    once, caches it, and is reused by all widget views.
+    once, caches it, and is reused by all widget views. Concurrent widget
+    requests share one computation (see CacheNamespace.get_or_set).
     """
-    # Define a unique cache key for this user's data.
-    cache_key = f"user_dashboard_data:{user.id}"
-    
-    # Try to get the data from the cache first.
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        print(f"CACHE HIT for user {user.id}")
-        return cached_data
-
-    print(f"CACHE MISS for user {user.id}. Fetching from DB.")
-    
-    # If not in cache, perform the expensive query ONCE.
-    all_pulls = list(
+    all_pulls = DASHBOARD_PULLS.get_or_set(user.id, compute=lambda: list(
         GachaTransaction.objects.filter(transaction_user=user).select_related(
             'student_id', 'banner_id'
-        ).order_by('transaction_create_on')
-    )
-    
-    # Store the result in a simple dictionary.
-    data_to_cache = {'all_pulls': all_pulls}
-    
-    # Set the data in the cache. A short timeout (e.g., 10 seconds) is good for dashboards.
-    cache.set(cache_key, data_to_cache, timeout=10)
-    
-    return data_to_cache
+        ).defer('banner_id__banner_image').order_by('transaction_create_on', 'transaction_id')
+    ))
+    return {'all_pulls': all_pulls}
+
+def _get_top_students(user, rarity: int):
+    """The user's 3 most-pulled students of a rarity, with the school and version their cards show."""
+    return USER_PODIUM.get_or_set(user.id, rarity, compute=lambda: list(
+        Student.objects.filter(gachatransaction__transaction_user=user, student_rarity=rarity)
+        .select_related('school_id', 'version_id').defer('school_id__school_image')
+        .annotate(count=Count('pk'), first_obtained=Min('gachatransaction__transaction_create_on'))
+        .order_by('-count', 'first_obtained')[:3]
+    ))
 
 #######################################
 #####        HTTPRESPONSE         #####
@@ -146,16 +167,19 @@ def banner_details(request, banner_id):
     Fetches and prepares all data for the banner details modal using the
     NEW inclusion-based logic.
     """
+    # The template shows names and versions and only checks that an image exists, so no image blobs are loaded.
     banner = get_object_or_404(
-        GachaBanner.objects.select_related('preset_id').prefetch_related('banner_pickup__asset_id', 'banner_include_version'), 
+        GachaBanner.objects.select_related('preset_id').defer('banner_image').prefetch_related(
+            Prefetch('banner_pickup', queryset=Student.objects.select_related('version_id')), 'banner_include_version'
+        ),
         pk=banner_id
     )
     
-    # --- Step 1: Get all available students
-    pickup_students = banner.pickup_students
-    r3_regulars = banner.r3_students.prefetch_related('asset_id')
-    r2_regulars = banner.r2_students.prefetch_related('asset_id')
-    r1_regulars = banner.r1_students.prefetch_related('asset_id')
+    # --- Step 1: Get all available students (evaluated once; the counts below reuse the lists)
+    pickup_students = list(banner.pickup_students)
+    r3_regulars = list(banner.r3_students.select_related('version_id'))
+    r2_regulars = list(banner.r2_students.select_related('version_id'))
+    r1_regulars = list(banner.r1_students.select_related('version_id'))
     
     # --- Step 6: Prepare the rate calculations (same logic as before, but with new pools) ---
     rates = {}
@@ -169,10 +193,10 @@ def banner_details(request, banner_id):
             'r1_rate': banner.r1_rate,
             
             # Individual student rates are calculated here.
-            'pickup_student_rate': (banner.pickup_r3_rate / pickup_students.count()) if pickup_students.exists() else Decimal('0.0'),
-            'r3_regular_student_rate': (banner.non_pickup_r3_rate / r3_regulars.count()) if r3_regulars.exists() else Decimal('0.0'),
-            'r2_regular_student_rate': (banner.r2_rate / r2_regulars.count()) if r2_regulars.exists() else Decimal('0.0'),
-            'r1_regular_student_rate': (banner.r1_rate / r1_regulars.count()) if r1_regulars.exists() else Decimal('0.0'),
+            'pickup_student_rate': (banner.pickup_r3_rate / len(pickup_students)) if pickup_students else Decimal('0.0'),
+            'r3_regular_student_rate': (banner.non_pickup_r3_rate / len(r3_regulars)) if r3_regulars else Decimal('0.0'),
+            'r2_regular_student_rate': (banner.r2_rate / len(r2_regulars)) if r2_regulars else Decimal('0.0'),
+            'r1_regular_student_rate': (banner.r1_rate / len(r1_regulars)) if r1_regulars else Decimal('0.0'),
         })
         
     context = {
@@ -202,7 +226,9 @@ def gacha_results(request: HttpRequest) -> HttpResponse:
         
         # Fetch the full student objects.
         unique_student_ids = set(student_ids)
-        students_queryset = Student.objects.filter(pk__in=unique_student_ids)
+        students_queryset = Student.objects.filter(pk__in=unique_student_ids).annotate(
+            portrait_placeholder=F('asset_id__asset_portrait_placeholder')
+        )
         student_map = {student.pk: student for student in students_queryset}
 
         # Re-assemble the list, now adding the flags from the original pull.
@@ -256,13 +282,7 @@ def dashboard_widget_top_students(request: HttpRequest) -> HttpResponse:
     Renders the HTML shell for the 'Top Students' podium widget, including
     the tabs. The initial podium content (for 3-stars) is also pre-rendered.
     """
-    top_r3_students = (
-        Student.objects.filter(gachatransaction__transaction_user=request.user, student_rarity=3)
-        .annotate(count=Count('pk'), first_obtained=Min('gachatransaction__transaction_create_on'))
-        .order_by('-count', 'first_obtained')[:3]
-    )
-
-    context = {'top_r3_students': top_r3_students}
+    context = {'top_r3_students': _get_top_students(request.user, 3)}
     
     return render(request, 'app_web/components/widgets/top_students.html', context)
 
@@ -274,21 +294,8 @@ def get_top_students_by_rarity(request: HttpRequest, rarity: int) -> HttpRespons
     """
     user = request.user
 
-    cache_key = f"user_podium:{user}:{rarity}"
-    top_students = cache.get(cache_key)
-
-    if top_students is None:
-        print(f"CACHE MISS for key: {cache_key}")
-        # Fetch the top 3 students for the requested rarity.
-        top_students = (
-            Student.objects.filter(gachatransaction__transaction_user=user, student_rarity=rarity)
-            .annotate(count=Count('pk'), first_obtained=Min('gachatransaction__transaction_create_on'))
-            .order_by( '-count', 'first_obtained')[:3]
-        )
-        cache.set(cache_key, top_students, timeout=10)
-
     context = {
-        'top_students': top_students,
+        'top_students': _get_top_students(user, rarity),
         'rarity': rarity, # Pass the rarity for styling in the template
     }
     # Render a NEW partial template just for the podium.
@@ -528,8 +535,8 @@ def get_dashboard_content(request: HttpRequest, tab_name: str) -> JsonResponse:
         # 1. Get the full, ordered list of all transactions for the user.
         # We pre-fetch related data for high performance.
         transaction_list = GachaTransaction.objects.filter(transaction_user=user).select_related(
-            'banner_id', 'student_id'
-        ).order_by('-transaction_create_on')
+            'banner_id', 'student_id__version_id'
+        ).defer('banner_id__banner_image').order_by('-transaction_create_on', '-transaction_id')
         
         # 2. Get the requested page number from the URL query (e.g., ?page=2). Default to page 1.
         page_number = request.GET.get('page', 1)
@@ -553,7 +560,9 @@ def get_dashboard_content(request: HttpRequest, tab_name: str) -> JsonResponse:
         )
 
         # 2. Fetch ALL students in the game, efficiently pre-loading related data.
-        all_students = Student.objects.order_by('-student_rarity', 'student_name')
+        all_students = Student.objects.select_related('school_id', 'version_id').defer('school_id__school_image').order_by(
+            '-student_rarity', 'student_name'
+        )
 
         # 3. Augment the student objects with the 'is_obtained' flag in Python.
         # This is extremely fast and keeps the database logic simple.
@@ -580,22 +589,16 @@ def get_dashboard_content(request: HttpRequest, tab_name: str) -> JsonResponse:
     elif tab_name == 'achievements':
         # --- LOGIC FOR THE ACHIEVEMENTS TAB ---
 
-        # 1. Get a set of the IDs of all achievements the user has unlocked.
-        # MODIFIED: Query the renamed 'UnlockAchievement' model
-        unlocked_achievement_ids = set(
-            UnlockAchievement.objects.filter(unlock_user=user).values_list('achievement_id', flat=True)
-        )
+        # 1. Get the user's unlocks (achievement ID -> unlock date) in one query.
+        user_unlocks = dict(UnlockAchievement.objects.filter(unlock_user=user).values_list('achievement_id', 'unlock_on'))
 
         # 2. Fetch ALL achievement definitions.
         all_achievements = Achievement.objects.all().order_by('achievement_category', 'achievement_name')
 
         # 3. Augment the achievement objects.
-        # MODIFIED: Query the renamed 'UnlockAchievement' model
-        user_unlocks = {ua.achievement_id: ua.unlock_on for ua in UnlockAchievement.objects.filter(unlock_user=user)}
-
         for ach in all_achievements:
-            ach.is_unlocked = ach.achievement_id in unlocked_achievement_ids
-            ach.unlocked_on = user_unlocks.get(ach)
+            ach.is_unlocked = ach.achievement_id in user_unlocks
+            ach.unlocked_on = user_unlocks.get(ach.achievement_id)
 
         context['all_achievements'] = all_achievements
         template_name = 'app_web/components/dashboard_achievement.html'
@@ -660,14 +663,17 @@ def get_students_by_school(request: HttpRequest, school_id: int) -> JsonResponse
     students = Student.objects.filter(
         school_id=school_id,
         version_id=original_version
-    ).order_by('student_name')
+    ).annotate(portrait_placeholder=F('asset_id__asset_portrait_placeholder')).order_by('student_name')
 
     # Convert the QuerySet into a list of simple dictionaries for JSON serialization.
-    # The frontend only needs the ID (for the image URL) and the name.
+    # The frontend only needs the ID (for the image URL), the name and, when the
+    # atlas is built, the position of the portrait in this school's sprite sheet.
     students_data = [
         {
             'id': student.student_id,
-            'name': student.student_name
+            'name': student.student_name,
+            'sprite': SpriteAtlas.sprite(student.student_id, 'school'),
+            'placeholder': student.portrait_placeholder,
         }
         for student in students
     ]
@@ -682,7 +688,7 @@ def _perform_gacha_pull(request: HttpRequest, banner_id: int, pull_count: int) -
     - For guests, it does NOT save anything.
     - It returns the list of pulled student IDs.
     """
-    banner = get_object_or_404(GachaBanner.objects.prefetch_related('banner_pickup'), pk=banner_id)
+    banner = get_object_or_404(GachaBanner.objects.defer('banner_image').prefetch_related('banner_pickup'), pk=banner_id)
     user = request.user
 
     # --- Step 1: Get the user's state BEFORE the pull ---
@@ -693,18 +699,20 @@ def _perform_gacha_pull(request: HttpRequest, banner_id: int, pull_count: int) -
         )
 
     # --- Step 2: Initialize the engine and perform the pulls ---
-    engine = GachaEngine(banner)
+    with ENGINE_BUILD_SECONDS.time():
+        engine = GachaEngine(banner)
 
     if pull_count == 1:     pulled_students = engine.draw_1() # Return List of Student object in model
     elif pull_count == 10:  pulled_students = engine.draw_10() # Return List of Student object in model
     else:                   return JsonResponse({'success': False, 'error': 'Invalid pull count'}, status=400)
+    PULLS.inc(len(pulled_students), draw='one' if pull_count == 1 else 'ten')
     
     # --- Step 3: Augment, Save, and Prepare JSON ---
     results_json = []
     seen_in_this_pull = set()
     transactions_to_create = []
     
-    pickup_student_ids = set(banner.banner_pickup.values_list('pk', flat=True))
+    pickup_student_ids = {student.student_id for student in banner.banner_pickup.all()}
 
     for student in pulled_students:
         is_new = (student.student_id not in owned_student_ids_before_pull) and \
@@ -724,35 +732,41 @@ def _perform_gacha_pull(request: HttpRequest, banner_id: int, pull_count: int) -
     # --- Step 4: Save to the database if the user is logged in ---
     # This list will hold all achievements unlocked during this transaction.
     unlocked_achievements = []
+    achievements_pending = False
 
     if user.is_authenticated:
+        # Which students are new, so only their collections are checked.
+        new_student_ids = [result['id'] for result in results_json if result['is_new']]
+        achievements_pending = settings.ACHIEVEMENTS_ASYNC
+        pulled_at = timezone.now()
 
         with transaction.atomic():
             GachaTransaction.objects.bulk_create(transactions_to_create)
-            for student in pulled_students:
-                inventory_item, created = UserInventory.objects.get_or_create(inventory_user=user, student_id=student)
-                if not created:
-                    inventory_item.inventory_num_obtained += 1
-                    inventory_item.save()
+            # One insert for the missing inventory rows (a concurrent pull may have added some, hence
+            # ignore_conflicts and the zero start), then one update incrementing each by its count.
+            obtained = Counter(student.student_id for student in pulled_students)
+            UserInventory.objects.bulk_create(
+                [UserInventory(inventory_user=user, student_id_id=student_id, inventory_num_obtained=0)
+                 for student_id in obtained if student_id not in owned_student_ids_before_pull],
+                ignore_conflicts=True,
+            )
+            UserInventory.objects.filter(inventory_user=user, student_id__in=obtained).update(
+                inventory_num_obtained=F('inventory_num_obtained') + Case(
+                    *(When(student_id=student_id, then=Value(count)) for student_id, count in obtained.items()),
+                    output_field=IntegerField(),
+                )
+            )
+
+            if achievements_pending:
+                # Queued with the pull itself, so the worker never sees one without the other.
+                AchievementQueue.enqueue(user, pulled_students, new_student_ids)
 
         # --- Achievement Checks ---
-        # 1. Initialize the service for this user.
-        achievement_services = AchievementEngine(user)
-        # 2. Check for luck achievements based on THIS pull's results.
-        unlocked_achievements.extend(achievement_services.check_luck_achievements(pulled_students))
-        
-        
-        # --- THE FIX: The view is now much cleaner ---
-        # 3. Tell the service that new pulls have been made.
-        #    The view doesn't know or care about *how* the cache works.
-        achievement_services.increment_pull_count(pull_count)
-        
-        # 4. Tell the service to check milestones with the new, updated count.
-        unlocked_achievements.extend(achievement_services.check_milestone_achievements())
-
-        
-        # 5. Tell the service to check collection with the new, updated count.
-        unlocked_achievements.extend(achievement_services.check_collection_achievements())
+        # Every rule (pull, counter, streak, collection), written in one insert. In async mode
+        # the worker runs them and the page polls `achievement_unlocks` instead.
+        if not achievements_pending:
+            with ACHIEVEMENT_EVALUATION_SECONDS.time(mode='sync'):
+                unlocked_achievements = AchievementEngine(user).evaluate_pull(pulled_students, new_student_ids)
 
     achievements_json = [
         {
@@ -766,22 +780,97 @@ def _perform_gacha_pull(request: HttpRequest, banner_id: int, pull_count: int) -
         'success': True, 
         'results': results_json,
         'unlocked_achievements': achievements_json,
+        'achievements_pending': achievements_pending,
+        # Poll `achievement_unlocks` with this to get the worker's unlocks for this pull.
+        'achievements_since': pulled_at.isoformat() if achievements_pending else None,
     }    
 
     return JsonResponse(data_response)
 
+@login_required
+@require_GET
+def achievement_unlocks(request: HttpRequest) -> JsonResponse:
+    """
+    Achievements the user unlocked after `since` (an ISO timestamp), and whether
+    pulls are still queued for evaluation. Polled by the gacha page in async mode.
+    """
+    try:
+        since = parse_datetime(request.GET.get('since', ''))
+    except ValueError: # well formed, but not a real date
+        since = None
+    if since is None:
+        return JsonResponse({'success': False, 'error': 'Invalid since timestamp'}, status=400)
+
+    unlocks = (
+        UnlockAchievement.objects.filter(unlock_user=request.user, unlock_on__gt=since)
+        .order_by('unlock_on').values('achievement_id', 'achievement_id__achievement_name', 'unlock_on')
+    )
+    return JsonResponse({
+        'success': True,
+        'unlocked_achievements': [
+            {'id': unlock['achievement_id'], 'name': unlock['achievement_id__achievement_name'], 'unlock_on': unlock['unlock_on'].isoformat()}
+            for unlock in unlocks
+        ],
+        'pending': AchievementQueue.pending(request.user),
+    })
+
 @require_POST
 def draw_one_gacha(request: HttpRequest, banner_id: int) -> JsonResponse:
-    return _perform_gacha_pull(request, banner_id, pull_count=1)
+    with PULL_SECONDS.time(draw='one'):
+        return _perform_gacha_pull(request, banner_id, pull_count=1)
 
 @require_POST
 def draw_ten_gacha(request: HttpRequest, banner_id: int) -> JsonResponse:
-    return _perform_gacha_pull(request, banner_id, pull_count=10)
+    with PULL_SECONDS.time(draw='ten'):
+        return _perform_gacha_pull(request, banner_id, pull_count=10)
+
+@require_GET
+def metrics(request: HttpRequest) -> HttpResponse:
+    """
+    The cache, pull, achievement and image metrics of every worker process in
+    the Prometheus text format (see MetricsRegistry). Staff only.
+    """
+    if not request.user.is_staff:
+        return HttpResponseForbidden("Staff only.")
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 #######################################
 #####   REQUEST -> FILERESPONSE   #####
 #######################################
+def _counts_image_bytes(kind: str):
+    """Decorator: adds the size of the view's successful responses to IMAGE_BYTES_SERVED."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                size = int(response.get('Content-Length', 0)) if response.streaming else len(response.content)
+                IMAGE_BYTES_SERVED.inc(size, kind=kind)
+            return response
+        return wrapper
+    return decorator
+
+def _packed_image_response(key: str):
+    """
+    Serves an image straight from the memory-mapped ImagePack shared by all
+    workers. Returns None when there is no pack or the image is not in it, so
+    the caller can fall back to the cache/database path.
+    """
+    pack = ImagePack.default()
+    image = pack.get(key) if pack else None
+    if image is None:
+        return None
+
+    response = HttpResponse(image.data, content_type=image.content_type)
+    response['Content-Disposition'] = f'inline; filename="{image.filename}"'
+    return response
+
+@_counts_image_bytes('school')
 def serve_school_image(request: HttpRequest, school_id: int):
+    packed_response = _packed_image_response(ImagePack.school_key(school_id))
+    if packed_response:
+        return packed_response
+
     try:
         # Fetch the necessary fields in one go to reduce DB hits
         school_obj = School.objects.values('school_name', 'school_image').get(school_id=school_id)
@@ -832,41 +921,29 @@ def serve_school_image_OLD(request:HttpRequest, school_id:int):
 
     return response
 
+def _load_banner_image(banner_id: int):
+    """The banner's name and raw image bytes, or None (cached as "not found") when it has no image."""
+    # Query the database for only the necessary fields.
+    row = GachaBanner.objects.filter(pk=banner_id).values('banner_name', 'banner_image').first()
+    if not row or not row['banner_image']:
+        return None
+    return {'name': row['banner_name'], 'image_bytes': bytes(row['banner_image'])}
+
+@_counts_image_bytes('banner')
 def serve_banner_image(request: HttpRequest, banner_id: int) -> HttpResponse:
     """
     Serves the banner_image for a given GachaBanner, using an efficient
     caching strategy that stores raw data.
     """
-    cache_key = f"banner_image:{banner_id}"
-    image_data = cache.get(cache_key)
+    packed_response = _packed_image_response(ImagePack.banner_key(banner_id))
+    if packed_response:
+        return packed_response
 
-    if image_data is None:
-        print(f"CACHE MISS for key: {cache_key}")
-        try:
-            # Query the database for only the necessary fields.
-            banner = GachaBanner.objects.values('banner_name', 'banner_image').get(pk=banner_id)
-            
-            if not banner['banner_image']:
-                raise GachaBanner.DoesNotExist
-
-            # Create a lightweight dictionary with the raw data to cache.
-            image_data = {
-                'name': banner['banner_name'],
-                'image_bytes': bytes(banner['banner_image']),
-            }
-            # Cache this dictionary for one hour.
-            cache.set(cache_key, image_data, timeout=3600)
-
-        except GachaBanner.DoesNotExist:
-            # Cache a "not found" marker to prevent repeated invalid queries.
-            image_data = "NOT_FOUND"
-            cache.set(cache_key, image_data, timeout=60)
-    else:
-        print(f"CACHE HIT for key: {cache_key}")
+    image_data = BANNER_IMAGES.get_or_set(banner_id, compute=lambda: _load_banner_image(banner_id))
 
     # --- Serve the response based on the retrieved data ---
 
-    if image_data == "NOT_FOUND":
+    if image_data is None:
         # If the image doesn't exist, serve a static fallback image.
         fallback_path = finders.find("icon/website/portrait_404.png")
         if fallback_path:
@@ -880,41 +957,29 @@ def serve_banner_image(request: HttpRequest, banner_id: int) -> HttpResponse:
     
     return response
 
+def _load_achievement_image(achievement_id: int):
+    """The achievement's name and raw image bytes, or None (cached as "not found") when it has no image."""
+    # Query the database for only the necessary fields.
+    row = Achievement.objects.filter(pk=achievement_id).values('achievement_name', 'achievement_image').first()
+    if not row or not row['achievement_image']:
+        return None
+    return {'name': row['achievement_name'], 'image_bytes': bytes(row['achievement_image'])}
+
+@_counts_image_bytes('achievement')
 def serve_achievement_image(request: HttpRequest, achievement_id: int) -> HttpResponse:
     """
     Serves the achievement_image for a given Achievement, using an efficient
     caching strategy that stores raw data.
     """
-    cache_key = f"achievement_image:{achievement_id}"
-    image_data = cache.get(cache_key)
-
-    if image_data is None:
-        print(f"CACHE MISS for key: {cache_key}")
-        try:
-            # Query the database for only the necessary fields.
-            achievement = Achievement.objects.values('achievement_name', 'achievement_image').get(pk=achievement_id)
-            
-            if not achievement['achievement_image']:
-                raise Achievement.DoesNotExist
-
-            # Create a lightweight dictionary to cache.
-            image_data = {
-                'name': achievement['achievement_name'],
-                'image_bytes': bytes(achievement['achievement_image']),
-            }
-            # Cache the dictionary.
-            cache.set(cache_key, image_data, timeout=60)
+    packed_response = _packed_image_response(ImagePack.achievement_key(achievement_id))
+    if packed_response:
+        return packed_response
 
-        except Achievement.DoesNotExist:
-            # Cache a "not found" marker to prevent repeated invalid queries.
-            image_data = "NOT_FOUND"
-            cache.set(cache_key, image_data, timeout=60)
-    else:
-        print(f"CACHE HIT for key: {cache_key}")
+    image_data = ACHIEVEMENT_IMAGES.get_or_set(achievement_id, compute=lambda: _load_achievement_image(achievement_id))
 
     # --- Serve the response based on the retrieved data ---
     
-    if image_data == "NOT_FOUND":
+    if image_data is None:
         # If the image doesn't exist, serve a static fallback image.
         fallback_path = finders.find("icon/website/portrait_404.png")
         if fallback_path:
@@ -928,57 +993,98 @@ def serve_achievement_image(request: HttpRequest, achievement_id: int) -> HttpRe
     
     return response
 
-def serve_student_image(request: HttpRequest, student_id: int, image_type: str):
+def _accepts_webp(request: HttpRequest) -> bool:
+    return 'image/webp' in request.META.get('HTTP_ACCEPT', '')
+
+def _get_student_images(requested_images, webp=False):
     """
-    Serves a student image (portrait or artwork) with a robust caching strategy
-    and correct model logic.
+    Resolves many (student_id, image_type) pairs at once and returns a dict
+    mapping each pair to either {'image_bytes', 'filename', 'content_type'}
+    or "NOT_FOUND". With `webp`, the lossy WebP variant is preferred wherever
+    one was generated at import time.
+
+    Lookups go through the same layers as a single image, but in bulk:
+    1. The shared ImagePack.
+    2. The cache, with one get_many() for everything not in the pack.
+    3. The database, with one query for everything not in the cache.
     """
-    cache_key = f"student_image:{student_id}:{image_type}"
-    image_data = cache.get(cache_key)
-
-    if image_data is None:  # CACHE MISS
-        print(f"CACHE MISS for key: {cache_key}")
+    results = {}
+
+    # --- Layer 1: The memory-mapped image pack ---
+    pack = ImagePack.default()
+    if pack:
+        for student_id, image_type in requested_images:
+            image = (webp and pack.get(ImagePack.student_key(student_id, image_type, webp=True))) \
+                or pack.get(ImagePack.student_key(student_id, image_type))
+            if image:
+                results[(student_id, image_type)] = {
+                    'image_bytes': image.data,
+                    'filename': image.filename,
+                    'content_type': image.content_type,
+                }
+
+    # --- Layer 2: The cache ---
+    image_format = "webp" if webp else "png"
+    wanted = [(student_id, image_type, image_format) for student_id, image_type in requested_images if (student_id, image_type) not in results]
+    if not wanted:
+        return results
+
+    for (student_id, image_type, _), image_data in STUDENT_IMAGES.get_many(wanted).items():
+        # None is a cached "not found".
+        results[(student_id, image_type)] = image_data if image_data is not None else "NOT_FOUND"
+
+    # --- Layer 3: The database, one query for every remaining image ---
+    missing_pairs = [(student_id, image_type) for student_id, image_type, _ in wanted if (student_id, image_type) not in results]
+    if not missing_pairs:
+        return results
+
+    missing_types = {image_type for _, image_type in missing_pairs}
+    image_fields = [f"asset_id__{STUDENT_IMAGE_FIELDS[image_type]}" for image_type in missing_types]
+    if webp:
+        image_fields += [f"asset_id__{STUDENT_WEBP_FIELDS[image_type]}" for image_type in missing_types]
+    students = {
+        row['student_id']: row
+        for row in Student.objects.filter(
+            student_id__in={student_id for student_id, _ in missing_pairs}
+        ).values('student_id', 'student_name', 'version_id__version_name', *image_fields)
+    }
 
-        # Define the correct field names on the ImageAsset model
-        allowed_image_fields = {
-            'portrait': 'asset_portrait_data',
-            'artwork': 'asset_artwork_data'
+    loaded_images = {}
+    for student_id, image_type in missing_pairs:
+        row = students.get(student_id)
+        webp_bytes = webp and row and row[f"asset_id__{STUDENT_WEBP_FIELDS[image_type]}"]
+        image_bytes = webp_bytes or (row and row[f"asset_id__{STUDENT_IMAGE_FIELDS[image_type]}"])
+
+        if not image_bytes:
+            print(f"Data not found for student image {student_id}:{image_type}")
+            results[(student_id, image_type)] = "NOT_FOUND"
+            loaded_images[(student_id, image_type, image_format)] = None
+            continue
+
+        extension = 'webp' if webp_bytes else 'png'
+        image_data = {
+            'image_bytes': bytes(image_bytes), # call bytes() in case use with PostgreSQL
+            'filename': f"{row['student_name']}_{row['version_id__version_name']}_{image_type}.{extension}",
+            'content_type': f"image/{extension}",
         }
-        field_name = allowed_image_fields.get(image_type)
-
-        if not field_name:
-            return HttpResponseNotFound("Invalid image type specified.")
-
-        try:
-            # Use select_related to fetch the student and its related asset in one DB query
-            student_obj = Student.objects.select_related('asset_id', 'version_id').get(student_id=student_id)
+        results[(student_id, image_type)] = image_data
+        loaded_images[(student_id, image_type, image_format)] = image_data
 
-            # Check if the student has an asset assigned
-            if not student_obj.asset_id:
-                raise Student.DoesNotExist("Student has no linked ImageAsset.")
+    # Found images are cached for CACHE_IMAGE_TIMEOUT and "not found" markers for 1 minute.
+    STUDENT_IMAGES.set_many(loaded_images)
 
-            # CORRECTLY get the image bytes from the related ImageAsset model
-            image_bytes = getattr(student_obj.asset_id, field_name)
+    return results
 
-            if not image_bytes:
-                raise Student.DoesNotExist("ImageAsset has no data for this image type.")
-
-            # Prepare data for caching
-            image_data = {
-                'image_bytes': bytes(image_bytes), # call bytes() in case use with PostgreSQL
-                'filename': f"{student_obj.student_name}_{student_obj.version_id.version_name}_{image_type}.png"
-            }
-            # Use a longer, more sensible timeout
-            cache.set(cache_key, image_data, timeout=CACHE_IMAGE_TIMEOUT) # Cache for 1 hour
-
-        except Student.DoesNotExist as e:
-            print(f"Data not found for {cache_key}: {e}")
-            # Cache the "not found" result to prevent future DB hits
-            image_data = "NOT_FOUND"
-            cache.set(cache_key, image_data, timeout=60) # Cache "not found" for 1 minute
+@_counts_image_bytes('student')
+def serve_student_image(request: HttpRequest, student_id: int, image_type: str):
+    """
+    Serves a student image (portrait or artwork) with a robust caching strategy
+    and correct model logic. Browsers that accept WebP get the smaller variant.
+    """
+    if image_type not in STUDENT_IMAGE_FIELDS:
+        return HttpResponseNotFound("Invalid image type specified.")
 
-    else:
-        print(f"CACHE HIT for key: {cache_key}")
+    image_data = _get_student_images([(student_id, image_type)], webp=_accepts_webp(request))[(student_id, image_type)]
 
     # --- SERVE THE RESPONSE ---
     if image_data == "NOT_FOUND":
@@ -988,6 +1094,71 @@ def serve_student_image(request: HttpRequest, student_id: int, image_type: str):
         return FileResponse(open(fallback_path, "rb"), content_type="image/png")
     
     # We have valid image data
-    response = HttpResponse(image_data['image_bytes'], content_type='image/png')
+    response = HttpResponse(image_data['image_bytes'], content_type=image_data.get('content_type', 'image/png'))
     response['Content-Disposition'] = f"inline; filename=\"{image_data['filename']}\""
+    response['Vary'] = 'Accept'
+    return response
+
+@require_GET
+@_counts_image_bytes('batch')
+def serve_student_image_batch(request: HttpRequest) -> HttpResponse:
+    """
+    Serves several student images in one response, e.g. every card of a
+    10-pull reveal: `?ids=12,40,7&types=portrait,artwork`.
+
+    The body is a packed bundle: a 4-byte big-endian length, a JSON index of
+    `{"key", "offset", "length", "filename", "content_type"}` entries (offsets
+    relative to the end of the index), then the image bytes back to back.
+    Images that don't exist are left out of the index so the client can fall
+    back to the single-image URL.
+    """
+    try:
+        student_ids = list(dict.fromkeys(int(i) for i in request.GET.get('ids', '').split(',') if i))
+        image_types = list(dict.fromkeys(t for t in request.GET.get('types', 'portrait').split(',') if t))
+    except ValueError:
+        return HttpResponseBadRequest("ids must be a comma-separated list of integers.")
+
+    if not student_ids or any(t not in STUDENT_IMAGE_FIELDS for t in image_types):
+        return HttpResponseBadRequest("Invalid ids or image types.")
+    if len(student_ids) * len(image_types) > MAX_BATCH_IMAGES:
+        return HttpResponseBadRequest(f"At most {MAX_BATCH_IMAGES} images per request.")
+
+    requested_images = [(student_id, image_type) for student_id in student_ids for image_type in image_types]
+    images = _get_student_images(requested_images, webp=_accepts_webp(request))
+
+    # --- Build the index and the blob section ---
+    index, blobs, offset = [], [], 0
+    for student_id, image_type in requested_images:
+        image_data = images[(student_id, image_type)]
+        if image_data == "NOT_FOUND":
+            continue
+        length = len(image_data['image_bytes'])
+        index.append({
+            'key': ImagePack.student_key(student_id, image_type),
+            'offset': offset,
+            'length': length,
+            'filename': image_data['filename'],
+            'content_type': image_data.get('content_type', 'image/png'),
+        })
+        blobs.append(image_data['image_bytes'])
+        offset += length
+
+    index_bytes = json.dumps(index).encode()
+    body = b''.join([len(index_bytes).to_bytes(4, 'big'), index_bytes, *blobs])
+    response = HttpResponse(body, content_type='application/octet-stream')
+    response['Vary'] = 'Accept'
+    return response
+
+@_counts_image_bytes('atlas')
+def serve_atlas_image(request: HttpRequest, filename: str) -> HttpResponse:
+    """
+    Serves a sprite sheet built by SpriteAtlas. Sheet filenames contain a hash
+    of their content, so browsers may cache them forever.
+    """
+    sheet_path = SpriteAtlas.sheet_path(filename)
+    if not sheet_path:
+        return HttpResponseNotFound("Sprite sheet not found.")
+
+    response = FileResponse(open(sheet_path, 'rb'), content_type='image/webp')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
     return response
@@ -0,0 +1,13 @@
+"""
+Gunicorn settings, read from the working directory by the `gunicorn` command
+in the Dockerfile and docker-compose.yml. Command-line options still apply.
+"""
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Blue_Archive_Gacha_Simulator.settings')
+
+def on_starting(server):
+    # In the master, before any worker forks: the metric snapshots of the previous run
+    # would otherwise be added to this run's totals (see app_web/util/Metrics.py).
+    from app_web.util.Metrics import REGISTRY
+    REGISTRY.clear()
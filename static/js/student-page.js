@@ -124,6 +124,25 @@ document.addEventListener('DOMContentLoaded', () => {
     // --- SECTION 3: DYNAMIC DATA LOADING & RENDERING                     ---
     // --- =============================================================== ---
 
+    /**
+     * Draws the portrait from the school's sprite sheet when the server sent
+     * sprite coordinates, otherwise falls back to one image request per student.
+     */
+    function portraitHTML(student) {
+        if (student.sprite) {
+            return `
+                <div class="w-full h-full relative overflow-hidden rounded-lg">
+                    <div role="img" aria-label="${student.name}" style="position: absolute; top: 0; left: 50%; height: 100%; transform: translateX(-50%); ${student.sprite.style}"></div>
+                </div>
+            `;
+        }
+        // The placeholder is a tiny blurred preview painted until the portrait arrives.
+        const placeholder = student.placeholder
+            ? ` style="background: url('${student.placeholder}') center / cover;" onload="this.style.background = 'none';"`
+            : '';
+        return `<img src="/image/student/${student.id}/portrait" alt="${student.name}" class="w-full h-full object-cover rounded-lg"${placeholder}>`;
+    }
+
     /**
      * Creates the HTML string for a new carousel from student data.
      */
@@ -139,7 +158,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const studentCardsHTML = students.map(student => `
             <div class="character-card flex-shrink-0 w-[300px] h-[85%] mx-4 transition-all duration-500 ease-in-out" data-real-index="${student.id}">
                  <div class="relative w-full h-full group">
-                    <img src="/image/student/${student.id}/portrait" alt="${student.name}" class="w-full h-full object-cover rounded-lg">
+                    ${portraitHTML(student)}
                      <div class="character-name absolute bottom-[20px] left-[70px] opacity-0 transition-all duration-500 ease-in-out transform -translate-x-8">
                          <h2 class="text-5xl font-black text-white uppercase tracking-widest origin-bottom-left transform -rotate-90" style="text-shadow: 2px 2px 10px rgba(0, 0, 0, 0.7);">${student.name}</h2>
                      </div>